@@ -0,0 +1,140 @@
+'''
+Cold start and warm invocation benchmark of the Lambda entry point
+(``hub_cep.serverless``). Every run starts a fresh interpreter that imports
+the handler, initializes it and serves ``--count`` invocations against the
+local stub providers:
+
+    python -m benchmarks.coldstart --runs 5 --output coldstart.json
+'''
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from argparse import SUPPRESS, ArgumentParser
+
+from __version__ import version
+
+# Nothing importing hub_cep at module level: the child process measures it.
+
+
+PHASES = ('process', 'import', 'init', 'first')
+
+
+def child(args) -> dict:
+    '''
+    One container: timings of its phases and of its warm invocations.
+    '''
+    started = time.perf_counter()
+    from hub_cep import serverless
+    imported = time.perf_counter()
+
+    from hub_cep.providers import Cepaberto, Postmon, Viacep
+
+    urls = json.loads(args.child)
+
+    for provider in (Viacep, Postmon, Cepaberto):
+        provider.API_URL = urls[provider.NAME]
+
+    serverless.init(warm=args.prewarm)
+    initialized = time.perf_counter()
+
+    from .run import zipcodes
+
+    latencies, statuses = [], []
+
+    for zipcode in zipcodes(args.count, args.unique):
+        invoked = time.perf_counter()
+        result = serverless.get_address({'path': {'cep': zipcode}}, None)
+        latencies.append(time.perf_counter() - invoked)
+        statuses.append(result['statusCode'])
+
+    return {
+        'import': imported - started,
+        'init': initialized - imported,
+        'first': latencies[0],
+        'warm': latencies[1:],
+        'statuses': statuses[1:],
+    }
+
+
+def cold_start(urls: dict, count: int, unique: int, prewarm: bool) -> dict:
+    command = [
+        sys.executable, '-m', 'benchmarks.coldstart',
+        '--child', json.dumps(urls), '--count', str(count), '--unique', str(unique),
+    ]
+
+    if prewarm:
+        command.append('--prewarm')
+
+    started = time.perf_counter()
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    result = json.loads(output)
+    # Interpreter start up to the end of init, what a cold invocation waits for.
+    result['process'] = time.perf_counter() - started - sum(result['warm']) - result['first']
+
+    return result
+
+
+def bench_mode(urls: dict, runs: int, count: int, unique: int, prewarm: bool) -> dict:
+    from .run import summarize
+
+    results = [cold_start(urls, count, unique, prewarm) for _ in range(runs)]
+
+    report = {phase: statistics.median(result[phase] for result in results) for phase in PHASES}
+    report['cold'] = report['process'] + report['first']
+
+    warm = [latency for result in results for latency in result['warm']]
+    statuses = [status for result in results for status in result['statuses']]
+    report['warm'] = summarize(warm, statuses, sum(warm))
+
+    return report
+
+
+def parse_args(argv: list = None):
+    parser = ArgumentParser(prog='python -m benchmarks.coldstart', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per mode')
+    parser.add_argument('--count', type=int, default=100, help='invocations per interpreter')
+    parser.add_argument('--unique', type=int, default=50, help='distinct zip codes among the invocations')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--child', help=SUPPRESS)
+    parser.add_argument('--prewarm', action='store_true', help=SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None):
+    args = parse_args(argv)
+
+    if args.child:
+        print(json.dumps(child(args)))
+        return 0
+
+    report = {
+        'version': version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'runs': args.runs, 'count': args.count, 'unique': args.unique},
+        'results': {},
+    }
+
+    from .stub_server import PROVIDERS, StubServer
+
+    with StubServer(process=True) as server:
+        urls = {name: server.url + path for name, (_, path, _) in PROVIDERS.items()}
+
+        for name, prewarm in (('lazy', False), ('prewarm', True)):
+            report['results'][name] = bench_mode(urls, args.runs, args.count, args.unique, prewarm)
+
+    output = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+'''
+Throughput and latency benchmarks of hub-cep against the local stub
+providers. Results are written as JSON so runs can be compared across
+releases:
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --compare bench.json
+'''
+import asyncio
+import json
+import math
+import platform
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+from __version__ import version
+from hub_cep.zipcode import ZipCode
+
+from .stub_server import PROVIDERS, ProviderBehavior, StubServer
+
+
+def percentile(values: list, fraction: float) -> float:
+    '''
+    Nearest-rank percentile of sorted ``values``.
+    '''
+    if not values:
+        return 0.0
+
+    index = min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+def summarize(latencies: list, statuses: list, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    count = len(statuses)
+
+    return {
+        'count': count,
+        'errors': sum(1 for status in statuses if status != 200),
+        'elapsed': elapsed,
+        'throughput': count / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1] if latencies else 0.0,
+    }
+
+
+def zipcodes(count: int, unique: int):
+    for index in range(count):
+        yield str(78000000 + index % unique)
+
+
+def bench_search(count: int, unique: int, concurrency: int, deadline: float = None, **options) -> dict:
+    '''
+    ``ZipCode(...).search()`` from ``concurrency`` threads.
+    '''
+    def lookup(zipcode):
+        started = time.perf_counter()
+        status_code, _ = ZipCode(zipcode, **options).search(deadline=deadline)
+        return time.perf_counter() - started, status_code
+
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lookup, zipcodes(count, unique)))
+
+    elapsed = time.perf_counter() - started
+    return summarize([latency for latency, _ in results], [status for _, status in results], elapsed)
+
+
+def bench_search_many(count: int, unique: int, concurrency: int, **options) -> dict:
+    '''
+    ``ZipCode.search_many`` over ``count`` zip codes. A request's latency
+    runs from the moment ``search_many`` reads it to its result. Repeated
+    zip codes, which the bulk API answers once, count with the latency of
+    that answer, or none once it is known.
+    '''
+    latencies, statuses = [], []
+    waiting: dict = {}
+    answered: dict = {}
+
+    def requests():
+        for zipcode in zipcodes(count, unique):
+            if zipcode in answered:
+                latencies.append(0.0)
+                statuses.append(answered[zipcode])
+            else:
+                waiting.setdefault(zipcode, []).append(time.perf_counter())
+
+            yield zipcode
+
+    started = time.perf_counter()
+
+    for zipcode, status_code, _ in ZipCode.search_many(requests(), concurrency=concurrency, **options):
+        now = time.perf_counter()
+        answered[zipcode] = status_code
+
+        for read_at in waiting.pop(zipcode, ()):
+            latencies.append(now - read_at)
+            statuses.append(status_code)
+
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+def bench_async_search(count: int, unique: int, concurrency: int, **options) -> dict:
+    from hub_cep.aio import AsyncZipCode, default_async_pool
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def lookup(zipcode):
+            async with semaphore:
+                started = time.perf_counter()
+                status_code, _ = await AsyncZipCode(zipcode, **options).search()
+                return time.perf_counter() - started, status_code
+
+        try:
+            return await asyncio.gather(*(lookup(zipcode) for zipcode in zipcodes(count, unique)))
+        finally:
+            await default_async_pool.close()
+
+    loop = asyncio.new_event_loop()
+    started = time.perf_counter()
+
+    try:
+        results = loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+    elapsed = time.perf_counter() - started
+
+    return summarize([latency for latency, _ in results], [status for _, status in results], elapsed)
+
+
+def scenarios(args) -> dict:
+    '''
+    Name -> callable of every benchmark scenario.
+    '''
+    common = {'count': args.count, 'unique': args.unique, 'concurrency': args.concurrency}
+
+    benches = {
+        'search.sequential': lambda: bench_search(deadline=args.deadline, **common),
+        'search.hedge': lambda: bench_search(deadline=args.deadline, strategy='hedge',
+                                             hedge_delay=args.hedge_delay, **common),
+        'search.race': lambda: bench_search(deadline=args.deadline, strategy='race', **common),
+        'search_many': lambda: bench_search_many(**common),
+    }
+
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        benches['async.search'] = lambda: bench_async_search(**common)
+
+    return benches
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    '''
+    Relative change of every metric against a previous run.
+    '''
+    report = {}
+
+    for name, metrics in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+
+        if not previous:
+            continue
+
+        report[name] = {
+            metric: (value - previous[metric]) / previous[metric] if previous.get(metric) else None
+            for metric, value in metrics.items()
+            if metric in ('throughput', 'p50', 'p95', 'p99')
+        }
+
+    return report
+
+
+def parse_args(argv: list = None):
+    parser = ArgumentParser(prog='python -m benchmarks.run', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=500, help='lookups per scenario')
+    parser.add_argument('--unique', type=int, default=500, help='distinct zip codes among the lookups')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--scenario', action='append', help='run only these scenarios')
+    parser.add_argument('--deadline', type=float, default=None, help='search budget in seconds')
+    parser.add_argument('--hedge-delay', type=float, default=0.05)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--compare', help='previous JSON report to compare with')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--in-process', action='store_true', help='run the stub server in a thread of this process')
+
+    for name in PROVIDERS:
+        parser.add_argument(f'--{name}-latency', type=float, default=0.005)
+        parser.add_argument(f'--{name}-jitter', type=float, default=0.005)
+        parser.add_argument(f'--{name}-error-rate', type=float, default=0.0)
+        parser.add_argument(f'--{name}-timeout-rate', type=float, default=0.0)
+        parser.add_argument(f'--{name}-not-found-rate', type=float, default=0.0)
+
+    return parser.parse_args(argv)
+
+
+def run(args) -> dict:
+    behaviors = {
+        name: ProviderBehavior(
+            latency=getattr(args, f'{name}_latency'),
+            jitter=getattr(args, f'{name}_jitter'),
+            error_rate=getattr(args, f'{name}_error_rate'),
+            timeout_rate=getattr(args, f'{name}_timeout_rate'),
+            not_found_rate=getattr(args, f'{name}_not_found_rate'),
+        )
+        for name in PROVIDERS
+    }
+
+    report = {
+        'version': version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'count': args.count,
+            'unique': args.unique,
+            'concurrency': args.concurrency,
+            'deadline': args.deadline,
+            'providers': {name: behavior.to_dict() for name, behavior in behaviors.items()},
+        },
+        'results': {},
+    }
+
+    with StubServer(behaviors, seed=args.seed, process=not args.in_process) as server:
+        for name, bench in scenarios(args).items():
+            if args.scenario and name not in args.scenario:
+                continue
+
+            report['results'][name] = bench()
+
+        report['hits'] = server.hits
+
+    return report
+
+
+def main(argv: list = None):
+    args = parse_args(argv)
+    report = run(args)
+
+    if args.compare:
+        with open(args.compare) as f:
+            report['comparison'] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
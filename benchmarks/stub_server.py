@@ -0,0 +1,279 @@
+'''
+Local HTTP server emulating the Viacep, Postmon and Cepaberto endpoints,
+used by the benchmarks to exercise the real socket and connection path.
+'''
+import json
+import random
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Thread
+from urllib.parse import parse_qs, urlsplit
+
+from hub_cep.providers import Cepaberto, Postmon, Viacep
+
+
+class ProviderBehavior:
+    '''
+    How one emulated provider answers: ``latency`` seconds plus up to
+    ``jitter`` seconds, ``error_rate`` of 503 answers, ``timeout_rate`` of
+    requests hanging for ``hang`` seconds and ``not_found_rate`` of 404s.
+    '''
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        not_found_rate: float = 0.0,
+        hang: float = 5.0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.not_found_rate = not_found_rate
+        self.hang = hang
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def viacep_payload(zipcode: str) -> dict:
+    return {
+        'cep': f'{zipcode[:5]}-{zipcode[5:]}',
+        'logradouro': 'Avenida Miguel Sutil',
+        'complemento': '',
+        'bairro': 'Alvorada',
+        'localidade': 'Cuiabá',
+        'uf': 'MT',
+        'ibge': '5103403',
+    }
+
+
+def postmon_payload(zipcode: str) -> dict:
+    return {
+        'cep': zipcode,
+        'logradouro': 'Avenida Miguel Sutil',
+        'bairro': 'Alvorada',
+        'cidade': 'Cuiabá',
+        'estado': 'MT',
+        'estado_info': {'nome': 'Mato Grosso'},
+        'cidade_info': {'codigo_ibge': '5103403'},
+    }
+
+
+def cepaberto_payload(zipcode: str) -> dict:
+    return {
+        'cep': zipcode,
+        'logradouro': 'Avenida Miguel Sutil',
+        'bairro': 'Alvorada',
+        'cidade': {'nome': 'Cuiabá', 'ddd': 65, 'ibge': '5103403'},
+        'estado': {'sigla': 'MT'},
+        'latitude': '-15.6',
+        'longitude': '-56.1',
+    }
+
+
+PROVIDERS = {
+    'viacep': (Viacep, '/viacep/ws/{}/json/unicode/', viacep_payload),
+    'postmon': (Postmon, '/postmon/v1/cep/', postmon_payload),
+    'cepaberto': (Cepaberto, '/cepaberto/api/v3/cep?cep={}', cepaberto_payload),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body in one segment, avoiding delayed ACK stalls on keep-alive.
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024
+
+    def log_message(self, *args):
+        pass
+
+    def route(self):
+        parts = urlsplit(self.path)
+        segments = [segment for segment in parts.path.split('/') if segment]
+
+        if not segments or segments[0] not in PROVIDERS:
+            return None, None
+
+        name = segments[0]
+
+        if name == 'cepaberto':
+            zipcode = parse_qs(parts.query).get('cep', [''])[0]
+        elif name == 'viacep':
+            zipcode = segments[2] if len(segments) > 2 else ''
+        else:
+            zipcode = segments[-1]
+
+        return name, zipcode
+
+    def send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        name, zipcode = self.route()
+
+        if name is None:
+            return self.send(404, {})
+
+        behavior = self.server.behaviors[name]
+        rng = self.server.rng
+        self.server.hits[name] += 1
+
+        time.sleep(behavior.latency + rng.random() * behavior.jitter)
+        draw = rng.random()
+
+        if draw < behavior.timeout_rate:
+            time.sleep(behavior.hang)
+            return self.send(503, {})
+
+        draw -= behavior.timeout_rate
+
+        if draw < behavior.error_rate:
+            return self.send(503, {})
+
+        draw -= behavior.error_rate
+
+        if draw < behavior.not_found_rate:
+            return self.send(404, {})
+
+        self.send(200, PROVIDERS[name][2](zipcode))
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    # http.server has its own only since Python 3.7.
+    daemon_threads = True
+
+
+def serve(behaviors: dict, seed: int = 0, port: int = 0) -> ThreadingHTTPServer:
+    httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    httpd.behaviors = behaviors
+    httpd.rng = random.Random(seed)
+    httpd.hits = {name: 0 for name in PROVIDERS}
+    return httpd
+
+
+class StubServer:
+    '''
+    Runs the emulated providers on ``127.0.0.1``, in a background thread or,
+    with ``process=True``, in a child process so the server does not compete
+    with the measured client for the GIL. Use as a context manager;
+    ``patch_providers`` points the provider classes to it until it stops.
+    '''
+
+    def __init__(self, behaviors: dict = None, seed: int = 0, process: bool = False):
+        self.behaviors = {name: ProviderBehavior() for name in PROVIDERS}
+        self.behaviors.update(behaviors or {})
+        self.seed = seed
+        self.process = process
+
+        self.httpd = None
+        self.child = None
+        self._url = ''
+        self._urls: dict = {}
+
+    def start(self):
+        if self.process:
+            config = json.dumps({name: behavior.to_dict() for name, behavior in self.behaviors.items()})
+            self.child = subprocess.Popen(
+                [sys.executable, '-m', 'benchmarks.stub_server', '--config', config, '--seed', str(self.seed)],
+                stdout=subprocess.PIPE, stdin=subprocess.PIPE, universal_newlines=True
+            )
+            self._url = self.child.stdout.readline().strip()
+            return self
+
+        self.httpd = serve(self.behaviors, self.seed)
+        host, port = self.httpd.server_address
+        self._url = f'http://{host}:{port}'
+
+        self.thread = Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self.thread.start()
+        return self
+
+    @property
+    def url(self) -> str:
+        return self._url
+
+    @property
+    def hits(self) -> dict:
+        if self.child is not None:
+            self.child.stdin.write('hits\n')
+            self.child.stdin.flush()
+            return json.loads(self.child.stdout.readline())
+
+        return dict(self.httpd.hits)
+
+    def patch_providers(self):
+        for name, (provider, path, _) in PROVIDERS.items():
+            self._urls[provider] = provider.__dict__.get('API_URL')
+            provider.API_URL = self.url + path
+
+    def restore_providers(self):
+        for provider, url in self._urls.items():
+            provider.API_URL = url
+
+        self._urls = {}
+
+    def stop(self):
+        self.restore_providers()
+
+        if self.child is not None:
+            self.child.stdin.close()
+            self.child.wait()
+            self.child = None
+            return
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        self.patch_providers()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main(argv: list = None):
+    '''
+    Serves until stdin is closed. Prints the base url, then answers each
+    ``hits`` line read from stdin with the request counters as JSON.
+    '''
+    parser = ArgumentParser(prog='python -m benchmarks.stub_server')
+    parser.add_argument('--config', default='{}', help='JSON object of provider behaviors')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--port', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    behaviors = {name: ProviderBehavior() for name in PROVIDERS}
+    behaviors.update({name: ProviderBehavior(**options) for name, options in json.loads(args.config).items()})
+
+    httpd = serve(behaviors, args.seed, args.port)
+    Thread(target=httpd.serve_forever, daemon=True).start()
+
+    host, port = httpd.server_address
+    print(f'http://{host}:{port}', flush=True)
+
+    for line in sys.stdin:
+        if line.strip() == 'hits':
+            print(json.dumps(httpd.hits), flush=True)
+
+    httpd.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,11 @@
-from hub_cep.zipcode import ZipCode
+from hub_cep.consts import LAMBDA_PREWARM
+from hub_cep.serverless import get_address, init
 
 
-def get_address(event, context):
+# Runs once per container, during the init phase: builds the shared client
+# and opens the provider connections before the first invocation arrives.
+if LAMBDA_PREWARM:
+    init()
 
-    zipcode = event['path']['cep']
 
-    client = ZipCode(zipcode)
-    status_code, body = client.search()
-
-    response = {
-        "statusCode": status_code,
-        "body": body
-    }
-
-    return response
+__all__ = ['get_address']
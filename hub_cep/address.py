@@ -0,0 +1,71 @@
+from sys import intern
+from typing import NamedTuple
+
+from .messages import Messages
+
+
+def _intern(value):
+    return intern(value) if type(value) is str else value
+
+
+class Address(NamedTuple):
+    '''
+    Compact form of a found address, for holding many results in memory.
+    ``number``, ``info`` and ``country`` are the same for every provider and
+    live on the class. State and city names are interned, so repeated values
+    share one string. ``to_dict`` and ``to_body`` give back the dict forms.
+    '''
+
+    zip_code: str
+    address: str
+    district: str
+    city: str
+    state: str
+
+    number = ''
+    info = ''
+    country = 'BRA'
+
+    @classmethod
+    def create(cls, zip_code: str, address: str, district: str, city: str, state: str) -> 'Address':
+        return cls(zip_code, address, district, _intern(city), _intern(state))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Address':
+        '''
+        From the ``data`` dict of a search result.
+        '''
+        return cls.create(data.get('zip_code'), data.get('address'), data.get('district'),
+                          data.get('city'), data.get('state'))
+
+    @classmethod
+    def from_body(cls, body: dict) -> 'Address':
+        '''
+        From a successful search body, ``None`` when ``body`` holds anything
+        the compact form would lose.
+        '''
+        data = body.get('data')
+
+        if body.get('error') is not False or body.get('message') != Messages.SUCCESS.value:
+            return None
+
+        if not isinstance(data, dict) or len(body) != 3:
+            return None
+
+        address = cls.from_dict(data)
+        return address if address.to_dict() == data else None
+
+    def to_dict(self) -> dict:
+        return {
+            'zip_code': self.zip_code,
+            'address': self.address,
+            'number': self.number,
+            'info': self.info,
+            'district': self.district,
+            'city': self.city,
+            'state': self.state,
+            'country': self.country
+        }
+
+    def to_body(self) -> dict:
+        return {'error': False, 'message': Messages.SUCCESS.value, 'data': self.to_dict()}
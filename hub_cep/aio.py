@@ -0,0 +1,491 @@
+'''
+Asyncio counterpart of the providers and ``ZipCode``. Requires ``aiohttp``
+(``pip install hub-cep[async]``).
+'''
+import asyncio
+from time import monotonic
+from typing import Any
+from weakref import WeakKeyDictionary
+
+import aiohttp
+
+from .address import Address
+from .consts import (
+    ASYNC_POOL_LIMIT,
+    ASYNC_POOL_LIMIT_PER_HOST,
+    BULK_CONCURRENCY,
+    BULK_DEDUP_SIZE,
+    CACHE_BATCH_SIZE,
+    KEEPALIVE_TIMEOUT,
+    TIMEOUT
+)
+from .deadline import Deadline
+from .exceptions import RateLimitError, ZipcodeError
+from .fastjson import loads
+from .instrumentation import CACHE, NETWORK, OFFLINE, SHARED, STALE, instruments
+from .messages import Messages
+from .providers import Viacep, Postmon, Cepaberto
+from .registry import ProviderRegistry, default_async_registry
+from .singleflight import AsyncSingleFlight
+from .validators import is_valid, normalize
+from .cache import AbstractCache, is_cacheable, replaces_stale
+from .zipcode import HEDGE, RACE, SKIPPED, Deduplicator, ZipCode, deadline_exceeded, invalid_result
+
+
+class Response:
+
+    __slots__ = ('status_code', 'content')
+
+    def __init__(self, status_code: int, content: bytes):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self):
+        return loads(self.content)
+
+
+class AsyncSessionPool:
+    '''
+    One ``aiohttp.ClientSession`` per event loop, sharing a keep-alive
+    connector between every async provider. Call ``close`` on shutdown.
+    '''
+
+    def __init__(
+        self,
+        limit: int = ASYNC_POOL_LIMIT,
+        limit_per_host: int = ASYNC_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+
+        self._sessions: WeakKeyDictionary = WeakKeyDictionary()
+
+    def build_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            timeout=aiohttp.ClientTimeout(total=TIMEOUT)
+        )
+
+    def get(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_event_loop()
+        session = self._sessions.get(loop)
+
+        if session is None or session.closed:
+            session = self.build_session()
+            self._sessions[loop] = session
+
+        return session
+
+    async def close(self):
+        loop = asyncio.get_event_loop()
+        session = self._sessions.pop(loop, None)
+
+        if session is not None:
+            await session.close()
+
+
+default_async_pool = AsyncSessionPool()
+
+
+async def cache_call(cache: AbstractCache, function, *args):
+    '''
+    ``function(*args)``, a method of ``cache``, run in the default executor
+    of the loop when the cache blocks on a file or a server.
+    '''
+    if not cache.blocking:
+        return function(*args)
+
+    return await asyncio.get_event_loop().run_in_executor(None, function, *args)
+
+
+async def aiterate(iterable):
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+class AsyncProviderMixin:
+
+    pool: AsyncSessionPool = default_async_pool
+
+    RETRYABLE_EXCEPTIONS: tuple = (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+    FATAL_EXCEPTIONS: tuple = (aiohttp.ClientSSLError, aiohttp.ClientProxyConnectionError)
+    TIMEOUT_EXCEPTIONS: tuple = (asyncio.TimeoutError,)
+
+    async def call(self, url: str, headers: dict = {}, timeout=None):
+        error: bool = False
+        info: dict = {}
+        res: Any = None
+
+        options: dict = {}
+        self.status_code = None
+        self.exception = None
+
+        if isinstance(timeout, tuple):
+            options['timeout'] = aiohttp.ClientTimeout(total=max(timeout), sock_connect=timeout[0])
+        elif timeout is not None:
+            options['timeout'] = aiohttp.ClientTimeout(total=timeout)
+
+        try:
+            async with self.pool.get().get(url, headers=headers, **options) as response:
+                self.status_code = response.status
+                res = Response(response.status, await response.read())
+
+        except asyncio.TimeoutError as e:
+            error = True
+            self.exception = e
+            info = {'error': error, 'timeout': True, 'message': e.__str__() or Messages.NETWORK_ERROR.value}
+            return error, info, res
+
+        except aiohttp.ClientConnectionError as e:
+            error = True
+            self.exception = e
+            info = {'error': error, 'timeout': False, 'message': e.__str__() or Messages.NETWORK_ERROR.value}
+            return error, info, res
+
+        except aiohttp.ClientError as e:
+            error = True
+            self.exception = e
+            info = {'error': error, 'timeout': True, 'message': e.__str__()}
+            return error, info, res
+
+        except Exception as e:
+            error = True
+            self.exception = e
+            info = {'error': error, 'timeout': False, 'message': e.__str__()}
+            return error, info, res
+
+        else:
+            return False, {'error': error, 'timeout': False, 'message': Messages.SUCCESS.value}, res
+
+    async def search(self, timeout=None):
+        url = self.get_url()
+
+        error, info, res = await self.call(url, self.get_headers(), timeout)
+
+        if error:
+            return error, info
+
+        return self.handle(res.status_code, res.json)
+
+
+class AsyncPostmon(AsyncProviderMixin, Postmon):
+    pass
+
+
+class AsyncViacep(AsyncProviderMixin, Viacep):
+    pass
+
+
+class AsyncCepaberto(AsyncProviderMixin, Cepaberto):
+    pass
+
+
+class AsyncZipCode(ZipCode):
+
+    # The ``Async`` providers above, and the ``hub_cep.async_providers`` entry points.
+    registry: ProviderRegistry = default_async_registry
+
+    # Coalesces concurrent lookups of the same zip code, e.g. ``AsyncZipCode.flights = AsyncSingleFlight()``.
+    flights: AsyncSingleFlight = None
+
+    async def search(self, deadline: Deadline = None):
+        if instruments.active:
+            started = monotonic()
+            status_code, data = await self.resolve(deadline)
+            self.searched(status_code, monotonic() - started)
+        else:
+            status_code, data = await self.resolve(deadline)
+
+        if self.compact and status_code == 200:
+            return status_code, Address.from_dict(data['data'])
+
+        return status_code, data
+
+    async def resolve(self, deadline: Deadline = None):
+        self.deadline = Deadline.coerce(deadline)
+        cached = await self.from_cache()
+
+        if cached is not None:
+            self.source = STALE if self.stale else CACHE
+            return cached
+
+        found = self.from_offline()
+
+        if found is not None:
+            self.source = OFFLINE
+            return found
+
+        if self.flights is not None:
+            self.source = SHARED
+
+            try:
+                return await self.flights.do(self.zipcode, self.fetch, timeout=self.remaining())
+            except TimeoutError:
+                return deadline_exceeded()
+
+        return await self.fetch()
+
+    async def fetch(self):
+        self.source = NETWORK
+
+        try:
+            return await self.to_cache(*await self.lookup())
+        except RateLimitError as e:
+            return 422, {'error': True, 'message': str(e)}
+
+    async def from_cache(self):
+        if self.cache is None:
+            return None
+
+        return self.from_entry(await cache_call(self.cache, self.cache.get_entry, self.zipcode))
+
+    async def to_cache(self, status_code: int, data: dict):
+        if self.cache is not None and is_cacheable(status_code, data):
+            await cache_call(self.cache, self.cache.set, self.zipcode, status_code, data)
+
+        return status_code, data
+
+    def revalidate(self, stale_status_code: int) -> bool:
+        key = (id(self.cache), self.zipcode)
+        return self.revalidator.submit_async(key, lambda: self.refresher().refresh(stale_status_code))
+
+    async def refresh(self, stale_status_code: int) -> bool:
+        self.source = NETWORK
+
+        try:
+            status_code, data = await self.lookup()
+        except RateLimitError:
+            return False
+
+        return await self.keep(stale_status_code, status_code, data)
+
+    async def keep(self, stale_status_code: int, status_code: int, data: dict) -> bool:
+        if not replaces_stale(stale_status_code, status_code, data):
+            return False
+
+        await cache_call(self.cache, self.cache.set, self.zipcode, status_code, data)
+        return True
+
+    async def lookup(self):
+
+        if self.strategy == RACE:
+            return await self.search_concurrent(delay=None)
+
+        if self.strategy == HEDGE:
+            return await self.search_concurrent(delay=self.hedge_delay)
+
+        return await self.search_sequential()
+
+    async def call(self, provider, attempts: int = 1):
+        wait = self.throttle(provider)
+
+        if wait is None:
+            return True, {'error': True, 'message': Messages.RATE_LIMITED.value}
+
+        if wait:
+            await asyncio.sleep(wait)
+
+        timeout = self.timeout(provider, attempts)
+
+        if timeout is False:
+            return True, {'error': True, 'timeout': True, 'message': Messages.DEADLINE_EXCEEDED.value}
+
+        # Checked last: a half open probe handed out here must be recorded.
+        if not self.allow(provider):
+            return True, {'error': True, 'message': Messages.PROVIDER_UNAVAILABLE.value}
+
+        started = monotonic()
+        recorded = False
+
+        try:
+            error, data = await provider.search(timeout=timeout)
+            self.record(provider, error, data, monotonic() - started)
+            recorded = True
+        finally:
+            if not recorded:
+                self.release(provider)
+
+        return error, data
+
+    async def attempt(self, provider, attempts: int = 1):
+        error, data = await self.call(provider, attempts)
+        tries = 1
+
+        while error:
+            delay = self.backoff(provider, tries, error, data)
+
+            if delay is None:
+                break
+
+            await asyncio.sleep(delay)
+            retry = await self.call(provider, attempts)
+
+            if retry[1].get('message') in SKIPPED:
+                break
+
+            error, data = retry
+            tries += 1
+
+        return error, data
+
+    async def search_sequential(self):
+        providers = self.chain()
+        outcomes: dict = {}
+        data = None
+
+        for position, provider in enumerate(providers):
+            error, data = await self.attempt(provider, len(providers) - position)
+
+            if not error:
+                self.settle(outcomes, found=True)
+                return 200, data
+
+            outcomes[provider.NAME] = self.outcome(provider, error, data)
+
+        self.settle(outcomes, found=False)
+        return 422, data
+
+    async def search_concurrent(self, delay: float = None):
+        '''
+        Same semantics as ``ZipCode.search_concurrent`` using tasks on the
+        running loop. Losing tasks are cancelled.
+        '''
+        providers = self.chain()
+        outcomes: dict = {}
+
+        results: list = [None] * len(providers)
+        indexes: dict = {}
+        pending: set = set()
+
+        def launch():
+            index = len(indexes)
+            task = asyncio.ensure_future(self.attempt(providers[index]))
+            indexes[task] = index
+            pending.add(task)
+
+        launch()
+
+        while delay is None and len(indexes) < len(providers):
+            launch()
+
+        try:
+            while pending:
+                timeout = delay if len(indexes) < len(providers) else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    error, data = task.result()
+
+                    if not error:
+                        self.settle(outcomes, found=True)
+                        return 200, data
+
+                    results[indexes[task]] = data
+                    outcomes[providers[indexes[task]].NAME] = self.outcome(providers[indexes[task]], error, data)
+
+                if len(indexes) < len(providers):
+                    launch()
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+        self.settle(outcomes, found=False)
+        return 422, results[-1]
+
+    @classmethod
+    async def from_cache_many(cls, zipcodes: list, cache: AbstractCache = None, compact: bool = None) -> dict:
+        cache = cache if cache is not None else cls.cache
+
+        if cache is None or not zipcodes:
+            return {}
+
+        return cls.cached_answers(await cache_call(cache, cache.get_many, zipcodes), compact)
+
+    @classmethod
+    async def search_many(
+        cls,
+        zipcodes,
+        concurrency: int = BULK_CONCURRENCY,
+        dedup_size: int = BULK_DEDUP_SIZE,
+        **options
+    ):
+        '''
+        Async generator with the same contract as ``ZipCode.search_many``.
+        ``zipcodes`` may be a regular or an async iterable.
+        '''
+        async def lookup(zipcode):
+            try:
+                return (zipcode,) + await cls(zipcode, **options).search()
+            except ZipcodeError:
+                return (zipcode,) + invalid_result()
+
+        cache = options.get('cache')
+        cache = cls.cache if cache is None else cache
+        # Cached zip codes are answered by one get_many per batch.
+        batch_size = CACHE_BATCH_SIZE if cache is not None else 1
+        batch: list = []
+
+        deduplicator = Deduplicator(dedup_size)
+        pending: set = set()
+
+        async def resolve():
+            nonlocal pending
+            found = await cls.from_cache_many(batch, cache, options.get('compact'))
+
+            for zipcode in batch:
+                if zipcode in found:
+                    yield (zipcode,) + found[zipcode]
+                    continue
+
+                pending.add(asyncio.ensure_future(lookup(zipcode)))
+
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                    for task in done:
+                        yield task.result()
+
+            batch.clear()
+
+        try:
+            async for value in aiterate(zipcodes):
+                zipcode = normalize(value)
+
+                if not is_valid(zipcode):
+                    yield (value,) + invalid_result()
+                    continue
+
+                if deduplicator.seen(zipcode):
+                    continue
+
+                batch.append(zipcode)
+
+                if len(batch) >= batch_size:
+                    async for result in resolve():
+                        yield result
+
+            async for result in resolve():
+                yield result
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    yield task.result()
+
+        finally:
+            for task in pending:
+                task.cancel()
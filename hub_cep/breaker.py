@@ -0,0 +1,180 @@
+from collections import deque
+from threading import Lock
+from time import monotonic
+
+from .consts import (
+    BREAKER_COOLDOWN,
+    BREAKER_ERROR_RATE,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_MIN_CALLS,
+    BREAKER_PROBES,
+    BREAKER_WINDOW
+)
+from .messages import Outcome
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+FAILURES = (Outcome.TIMEOUT, Outcome.NETWORK_ERROR, Outcome.ERROR)
+
+
+class CircuitBreaker:
+    '''
+    Circuit breaker of one provider.
+
+    The circuit opens after ``failure_threshold`` consecutive failures or when
+    the error rate over the last ``window`` calls reaches ``error_rate`` (once
+    ``min_calls`` were seen). While open every call is refused. After
+    ``cooldown`` seconds up to ``probes`` calls go through (half open): a
+    success closes the circuit again, a failure reopens it.
+    '''
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        error_rate: float = BREAKER_ERROR_RATE,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        cooldown: float = BREAKER_COOLDOWN,
+        probes: int = BREAKER_PROBES,
+        clock=monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.probes = probes
+
+        self._clock = clock
+        self._lock = Lock()
+        self._state = CLOSED
+        self._calls: deque = deque(maxlen=window)
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probing = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._probing = 0
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._probing = 0
+
+    def _close(self):
+        self._state = CLOSED
+        self._calls.clear()
+        self._consecutive_failures = 0
+
+    def allow(self) -> bool:
+        '''
+        Whether a call may go through. Half open calls count as probes and
+        must be followed by ``record``, or ``release`` when they end without
+        an outcome.
+        '''
+        with self._lock:
+            self._refresh()
+
+            if self._state == CLOSED:
+                return True
+
+            if self._state == HALF_OPEN and self._probing < self.probes:
+                self._probing += 1
+                return True
+
+            return False
+
+    def release(self):
+        '''
+        Gives back the probe of a call that was cancelled or raised.
+        '''
+        with self._lock:
+            if self._state == HALF_OPEN and self._probing:
+                self._probing -= 1
+
+    def record(self, outcome: Outcome):
+        failed = outcome in FAILURES
+
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if failed:
+                    self._open()
+                else:
+                    self._close()
+                return
+
+            self._calls.append(failed)
+            self._consecutive_failures = self._consecutive_failures + 1 if failed else 0
+
+            if self._state == CLOSED and self._should_open():
+                self._open()
+
+    def _should_open(self) -> bool:
+        if self._consecutive_failures >= self.failure_threshold:
+            return True
+
+        calls = len(self._calls)
+        return calls >= self.min_calls and sum(self._calls) / calls >= self.error_rate
+
+    def reset(self):
+        with self._lock:
+            self._close()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._refresh()
+            calls = len(self._calls)
+
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'error_rate': sum(self._calls) / calls if calls else 0.0,
+                'calls': calls,
+            }
+
+
+class BreakerRegistry:
+    '''
+    One ``CircuitBreaker`` per provider name, created on first use.
+    ``options`` are the defaults of every breaker, ``configure`` overrides
+    them per provider.
+    '''
+
+    def __init__(self, **options):
+        self.options = options
+        self._overrides: dict = {}
+        self._breakers: dict = {}
+        self._lock = Lock()
+
+    def configure(self, name: str, **options):
+        with self._lock:
+            self._overrides.setdefault(name, {}).update(options)
+            self._breakers.pop(name, None)
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+
+                if breaker is None:
+                    options = dict(self.options, **self._overrides.get(name, {}))
+                    breaker = self._breakers[name] = CircuitBreaker(name, **options)
+
+        return breaker
+
+    def snapshot(self) -> dict:
+        return {name: breaker.snapshot() for name, breaker in list(self._breakers.items())}
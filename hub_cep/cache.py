@@ -0,0 +1,1035 @@
+import atexit
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock, Timer, local
+from time import monotonic, time
+from urllib.parse import parse_qs, unquote, urlsplit
+from weakref import WeakSet
+
+from .address import Address
+from .consts import (
+    CACHE_BATCH_SIZE,
+    CACHE_FLUSH_INTERVAL,
+    CACHE_MAXSIZE,
+    CACHE_NEGATIVE_TTL,
+    CACHE_RECONNECT_BACKOFF,
+    CACHE_REFRESH_BACKOFF,
+    CACHE_REFRESH_WORKERS,
+    CACHE_STALE_TTL,
+    CACHE_TTL
+)
+from .exceptions import CacheError
+from .fastjson import dumps, loads
+from .messages import Messages
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_cacheable(status_code: int, body: dict) -> bool:
+    '''
+    Only found addresses and definitive not found answers are cached,
+    transient errors (timeouts, network errors) never are.
+    '''
+    if status_code == 200:
+        return True
+
+    return body is not None and body.get('message') == Messages.ZIPCODE_NOT_FOUND.value
+
+
+def replaces_stale(stale_status_code: int, status_code: int, body: dict) -> bool:
+    '''
+    Whether a refreshed answer takes the place of a stale entry. Failures
+    never do, and a not found never replaces a found address.
+    '''
+    if status_code == 200:
+        return True
+
+    return stale_status_code != 200 and is_cacheable(status_code, body)
+
+
+class AbstractCache(ABC):
+    '''
+    Entries are fresh for ``ttl`` seconds (``negative_ttl`` for not found
+    answers), the soft ttl. With ``stale_ttl`` they are then kept that much
+    longer, up to the hard ttl, so a search can answer with the stale entry
+    while it is refreshed in the background.
+    '''
+
+    # Whether calls wait on a file or a server, ``AsyncZipCode`` runs them off the event loop.
+    blocking: bool = False
+
+    def __init__(
+        self,
+        ttl: float = CACHE_TTL,
+        negative_ttl: float = CACHE_NEGATIVE_TTL,
+        stale_ttl: float = CACHE_STALE_TTL
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+
+    def ttl_for(self, status_code: int) -> float:
+        return self.ttl if status_code == 200 else self.negative_ttl
+
+    def hard_ttl_for(self, status_code: int) -> float:
+        return self.ttl_for(status_code) + self.stale_ttl
+
+    def is_stale(self, stored_at: float, status_code: int, now: float = None) -> bool:
+        return (now or time()) - stored_at >= self.ttl_for(status_code)
+
+    def is_expired(self, stored_at: float, status_code: int, now: float = None) -> bool:
+        return (now or time()) - stored_at >= self.hard_ttl_for(status_code)
+
+    @abstractmethod
+    def get(self, key: str):
+        '''
+        Returns the cached ``(status_code, body)`` or ``None``. Stale entries
+        are returned too, until their hard ttl.
+        '''
+        raise NotImplementedError(Messages.NOT_IMPLEMENTED.value)
+
+    @abstractmethod
+    def set(self, key: str, status_code: int, body: dict, stored_at: float = None):
+        raise NotImplementedError(Messages.NOT_IMPLEMENTED.value)
+
+    def get_entry(self, key: str):
+        '''
+        Returns the cached ``(stored_at, status_code, body)`` or ``None``,
+        for callers that tell fresh from stale entries.
+        '''
+        entry = self.get(key)
+        return None if entry is None else (time(), *entry)
+
+    def get_many(self, keys) -> dict:
+        '''
+        Returns the cached ``(status_code, body)`` of the ``keys`` found, by
+        key. Backends override ``get_entries`` to answer in a single round trip.
+        '''
+        return {key: entry[1:] for key, entry in self.get_entries(keys).items()}
+
+    def get_entries(self, keys) -> dict:
+        '''
+        ``get_entry`` of the ``keys`` found, by key.
+        '''
+        found = {}
+
+        for key in keys:
+            entry = self.get_entry(key)
+
+            if entry is not None:
+                found[key] = entry
+
+        return found
+
+    def set_many(self, entries: dict, stored_at: float = None):
+        '''
+        Stores ``entries``, a dict of ``(status_code, body)`` by key.
+        '''
+        for key, (status_code, body) in entries.items():
+            self.set(key, status_code, body, stored_at)
+
+    def items(self):
+        '''
+        Yields ``(key, stored_at, status_code, body)`` of every entry not
+        expired yet, see ``hub_cep.snapshot``.
+        '''
+        raise NotImplementedError(Messages.NOT_IMPLEMENTED.value)
+
+
+class MemoryCache(AbstractCache):
+    '''
+    Bounded in-process cache with LRU eviction and separate ttls for found
+    and not found results. Cached bodies are shared between callers and must
+    not be mutated.
+
+    With ``compact`` found addresses are stored as ``Address`` tuples, a
+    fraction of the memory of the body dicts, and rebuilt on every hit.
+    '''
+
+    def __init__(
+        self,
+        maxsize: int = CACHE_MAXSIZE,
+        ttl: float = CACHE_TTL,
+        negative_ttl: float = CACHE_NEGATIVE_TTL,
+        compact: bool = False,
+        stale_ttl: float = CACHE_STALE_TTL
+    ):
+        super().__init__(ttl, negative_ttl, stale_ttl)
+        self.maxsize = maxsize
+        self.compact = compact
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    def lookup(self, key: str, now: float):
+        '''
+        Entry of ``key``, called with the lock held.
+        '''
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, status_code, body = entry
+
+        if self.is_expired(stored_at, status_code, now):
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        return entry
+
+    @staticmethod
+    def expand(body):
+        return body.to_body() if type(body) is Address else body
+
+    def get(self, key: str):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[1:]
+
+    def get_entry(self, key: str):
+        with self._lock:
+            entry = self.lookup(key, time())
+
+        if entry is None:
+            return None
+
+        stored_at, status_code, body = entry
+        return stored_at, status_code, self.expand(body)
+
+    def get_entries(self, keys) -> dict:
+        now = time()
+
+        with self._lock:
+            entries = {key: self.lookup(key, now) for key in keys}
+
+        return {
+            key: (entry[0], entry[1], self.expand(entry[2])) for key, entry in entries.items() if entry is not None
+        }
+
+    def store(self, key: str, status_code: int, body: dict, stored_at: float):
+        '''
+        Stores an entry, called with the lock held.
+        '''
+        if self.compact and status_code == 200:
+            body = Address.from_body(body) or body
+
+        self._entries[key] = (stored_at, status_code, body)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key: str, status_code: int, body: dict, stored_at: float = None):
+        with self._lock:
+            self.store(key, status_code, body, stored_at or time())
+
+    def set_many(self, entries: dict, stored_at: float = None):
+        stored_at = stored_at or time()
+
+        with self._lock:
+            for key, (status_code, body) in entries.items():
+                self.store(key, status_code, body, stored_at)
+
+    def items(self):
+        now = time()
+
+        with self._lock:
+            entries = list(self._entries.items())
+
+        for key, (stored_at, status_code, body) in entries:
+            if not self.is_expired(stored_at, status_code, now):
+                yield key, stored_at, status_code, self.expand(body)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: str):
+        return key in self._entries
+
+
+# SQLite caches not closed yet, their buffered writes are flushed at exit.
+_open_caches = WeakSet()
+
+
+@atexit.register
+def _flush_open_caches():
+    for cache in list(_open_caches):
+        cache.flush()
+
+
+class SQLiteCache(AbstractCache):
+    '''
+    Persistent cache stored in a local SQLite file, shared by every process
+    and thread on the box. The database runs in WAL mode so readers never
+    block, and writes are buffered and flushed in batches of ``batch_size``
+    or at most ``flush_interval`` seconds after they were made.
+    '''
+
+    blocking = True
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS zipcodes ('
+        ' key TEXT PRIMARY KEY,'
+        ' status_code INTEGER NOT NULL,'
+        ' body TEXT NOT NULL,'
+        ' stored_at REAL NOT NULL'
+        ') WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS zipcodes_stored_at ON zipcodes (stored_at)',
+    )
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = CACHE_TTL,
+        negative_ttl: float = CACHE_NEGATIVE_TTL,
+        batch_size: int = CACHE_BATCH_SIZE,
+        flush_interval: float = CACHE_FLUSH_INTERVAL,
+        timeout: float = 5,
+        stale_ttl: float = CACHE_STALE_TTL
+    ):
+        super().__init__(ttl, negative_ttl, stale_ttl)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+
+        self.hits = 0
+        self.misses = 0
+
+        self._pending: dict = {}
+        self._flushed_at = time()
+        self._timer = None
+        self._lock = Lock()
+        self._local = local()
+
+        with self.connection() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+        _open_caches.add(self)
+
+    def connection(self) -> sqlite3.Connection:
+        '''
+        One connection per thread, reopened after a fork.
+        '''
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
+
+    def get(self, key: str):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[1:]
+
+    def get_entry(self, key: str):
+        if self.flush_due():
+            self.flush()
+
+        entry = self._pending.get(key)
+
+        if entry is None:
+            row = self.connection().execute(
+                'SELECT stored_at, status_code, body FROM zipcodes WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is not None:
+                entry = (row[0], row[1], loads(row[2]))
+
+        if entry is None or self.is_expired(*entry[:2]):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    def get_entries(self, keys) -> dict:
+        if self.flush_due():
+            self.flush()
+
+        keys = list(keys)
+        entries = {key: self._pending[key] for key in keys if key in self._pending}
+        missing = [key for key in keys if key not in entries]
+        conn = self.connection()
+
+        # One query per SQLITE_MAX_VARIABLE_NUMBER keys, 999 on older builds.
+        for start in range(0, len(missing), 900):
+            chunk = missing[start:start + 900]
+            rows = conn.execute(
+                'SELECT key, stored_at, status_code, body FROM zipcodes WHERE key IN ({})'.format(
+                    ','.join('?' * len(chunk))
+                ),
+                chunk
+            )
+
+            for key, stored_at, status_code, body in rows:
+                entries[key] = (stored_at, status_code, loads(body))
+
+        now = time()
+        found = {
+            key: entry for key, entry in entries.items() if not self.is_expired(entry[0], entry[1], now)
+        }
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, status_code: int, body: dict, stored_at: float = None):
+        self.set_many({key: (status_code, body)}, stored_at)
+
+    def set_many(self, entries: dict, stored_at: float = None):
+        stored_at = stored_at or time()
+
+        with self._lock:
+            for key, (status_code, body) in entries.items():
+                self._pending[key] = (stored_at, status_code, body)
+
+            full = len(self._pending) >= self.batch_size
+
+        if full or self.flush_due():
+            self.flush()
+        else:
+            self.schedule_flush()
+
+    def flush_due(self) -> bool:
+        return bool(self._pending) and time() - self._flushed_at >= self.flush_interval
+
+    def schedule_flush(self):
+        '''
+        Flushes the buffered writes ``flush_interval`` seconds from now, in
+        case no other call comes to flush them.
+        '''
+        if self.flush_interval == float('inf'):
+            return
+
+        with self._lock:
+            # Timers do not survive a fork.
+            if self._pending and (self._timer is None or not self._timer.is_alive()):
+                self._timer = Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            timer, self._timer = self._timer, None
+            self._flushed_at = time()
+
+        if timer is not None:
+            timer.cancel()
+
+        if not pending:
+            return
+
+        rows = [
+            (key, status_code, dumps(body), stored_at)
+            for key, (stored_at, status_code, body) in pending.items()
+        ]
+
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'INSERT OR REPLACE INTO zipcodes (key, status_code, body, stored_at) VALUES (?, ?, ?, ?)', rows
+            )
+
+    def items(self):
+        self.flush()
+        now = time()
+        rows = self.connection().execute('SELECT key, stored_at, status_code, body FROM zipcodes ORDER BY key')
+
+        for key, stored_at, status_code, body in rows:
+            if not self.is_expired(stored_at, status_code, now):
+                yield key, stored_at, status_code, loads(body)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pending.pop(key, None)
+
+        self.connection().execute('DELETE FROM zipcodes WHERE key = ?', (key,))
+
+    def compact(self) -> int:
+        '''
+        Removes expired entries, reclaims disk space and truncates the WAL.
+        Returns the number of removed entries.
+        '''
+        self.flush()
+        now = time()
+
+        conn = self.connection()
+        removed = conn.execute(
+            'DELETE FROM zipcodes'
+            ' WHERE (status_code = 200 AND stored_at <= ?) OR (status_code != 200 AND stored_at <= ?)',
+            (now - self.ttl - self.stale_ttl, now - self.negative_ttl - self.stale_ttl)
+        ).rowcount
+        conn.execute('VACUUM')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+        return removed
+
+    def close(self):
+        self.flush()
+        _open_caches.discard(self)
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def stats(self) -> dict:
+        self.flush()
+        size = self.connection().execute('SELECT COUNT(*) FROM zipcodes').fetchone()[0]
+
+        return {'size': size, 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self):
+        return self.stats()['size']
+
+
+class RespConnection:
+    '''
+    Minimal client of the Redis serialization protocol (RESP) over a socket.
+    '''
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+
+    @staticmethod
+    def encode(*args) -> bytes:
+        parts = [b'*%d\r\n' % len(args)]
+
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+
+        return b''.join(parts)
+
+    def read(self):
+        line = self.reader.readline()
+
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('Connection closed by the cache server.')
+
+        kind, value = line[:1], line[1:-2]
+
+        if kind == b'+':
+            return value.decode('utf-8')
+
+        if kind == b'-':
+            raise CacheError(value.decode('utf-8'))
+
+        if kind == b':':
+            return int(value)
+
+        if kind == b'$':
+            size = int(value)
+
+            if size < 0:
+                return None
+
+            data = self.reader.read(size + 2)
+
+            if len(data) != size + 2:
+                raise ConnectionError('Connection closed by the cache server.')
+
+            return data[:-2]
+
+        if kind == b'*':
+            size = int(value)
+            return None if size < 0 else [self.read() for _ in range(size)]
+
+        raise CacheError(f'Unexpected reply from the cache server: {line!r}')
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+    def pipeline(self, commands: list) -> list:
+        '''
+        Sends every command at once and reads their replies, one round trip.
+        '''
+        self.sock.sendall(b''.join(self.encode(*args) for args in commands))
+        return [self.read() for _ in commands]
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+class RedisCache(AbstractCache):
+    '''
+    Cache shared by every node, kept on a Redis server or anything speaking
+    its protocol, e.g. ``redis://:password@cache.internal:6379/0``. Entries
+    expire on the server after their ttl, ``get_many`` is a single ``MGET``
+    and ``set_many`` a single pipeline.
+
+    One connection per thread, reopened after a fork. The cache fails open:
+    when the server cannot be reached lookups just miss it, without trying
+    to connect again for ``retry_after`` seconds.
+    '''
+
+    blocking = True
+
+    def __init__(
+        self,
+        url: str = 'redis://localhost:6379/0',
+        ttl: float = CACHE_TTL,
+        negative_ttl: float = CACHE_NEGATIVE_TTL,
+        prefix: str = 'hub_cep:',
+        timeout: float = 1,
+        stale_ttl: float = CACHE_STALE_TTL,
+        retry_after: float = CACHE_RECONNECT_BACKOFF
+    ):
+        super().__init__(ttl, negative_ttl, stale_ttl)
+        parts = urlsplit(url)
+
+        if parts.scheme != 'redis':
+            raise ValueError(f'Unsupported cache url: {url}')
+
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.strip('/') or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self.retry_after = retry_after
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        self._local = local()
+        self._down_until = 0.0
+
+    def connection(self) -> RespConnection:
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None or self._local.pid != os.getpid():
+            conn = RespConnection(self.host, self.port, self.timeout)
+            setup = []
+
+            if self.password:
+                setup.append(('AUTH', self.password))
+
+            if self.db:
+                setup.append(('SELECT', self.db))
+
+            if setup:
+                conn.pipeline(setup)
+
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
+
+    def run(self, commands: list):
+        '''
+        Replies of ``commands``, ``None`` when the server cannot be reached
+        or failed less than ``retry_after`` seconds ago.
+        '''
+        if self._down_until and monotonic() < self._down_until:
+            return None
+
+        try:
+            return self.connection().pipeline(commands)
+        except (OSError, CacheError):
+            self.errors += 1
+            self.disconnect()
+            self._down_until = monotonic() + self.retry_after
+            return None
+
+    def disconnect(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def get(self, key: str):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[1:]
+
+    def get_entry(self, key: str):
+        return self.get_entries([key]).get(key)
+
+    def get_entries(self, keys) -> dict:
+        keys = list(keys)
+
+        if not keys:
+            return {}
+
+        replies = self.run([['MGET', *(self.prefix + key for key in keys)]])
+        values = replies[0] if replies else [None] * len(keys)
+        found = {}
+
+        for key, value in zip(keys, values):
+            if value is not None:
+                status_code, body, stored_at = loads(value)
+                found[key] = (stored_at, status_code, body)
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, status_code: int, body: dict, stored_at: float = None):
+        self.set_many({key: (status_code, body)}, stored_at)
+
+    def set_many(self, entries: dict, stored_at: float = None):
+        stored_at = stored_at or time()
+        age = time() - stored_at
+        commands = []
+
+        for key, (status_code, body) in entries.items():
+            # Expires on the server at the hard ttl.
+            expires = int((self.hard_ttl_for(status_code) - age) * 1000)
+
+            if expires > 0:
+                commands.append(('SET', self.prefix + key, dumps([status_code, body, stored_at]), 'PX', expires))
+
+        if commands:
+            self.run(commands)
+
+    def items(self):
+        '''
+        Walks the keyspace with ``SCAN``. Unlike lookups it does not fail
+        open, a snapshot of an unreachable server is an error.
+        '''
+        conn = self.connection()
+        cursor = b'0'
+        start = len(self.prefix)
+
+        while True:
+            cursor, names = conn.execute('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 1000)
+
+            if names:
+                for name, value in zip(names, conn.execute('MGET', *names)):
+                    if value is not None:
+                        status_code, body, stored_at = loads(value)
+                        yield name[start:].decode('utf-8'), stored_at, status_code, body
+
+            if cursor in (b'0', '0'):
+                return
+
+    def delete(self, key: str):
+        self.run([('DEL', self.prefix + key)])
+
+    def close(self):
+        self.disconnect()
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+
+
+class TieredCache(AbstractCache):
+    '''
+    A local LRU in front of a shared cache. Hits of the shared cache are
+    copied to the local one and writes go to both, so each node keeps its
+    hot zip codes in memory and only asks the shared store for the others.
+    A ``local`` of ``None`` is a default ``MemoryCache``.
+    '''
+
+    def __init__(self, local: AbstractCache, shared: AbstractCache):
+        self.local = local if local is not None else MemoryCache()
+        self.shared = shared
+        self.blocking = self.local.blocking or self.shared.blocking
+        super().__init__(self.shared.ttl, self.shared.negative_ttl, self.shared.stale_ttl)
+
+    def get(self, key: str):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[1:]
+
+    def get_entry(self, key: str):
+        return self.get_entries([key]).get(key)
+
+    def get_entries(self, keys) -> dict:
+        keys = list(keys)
+        found = self.local.get_entries(keys)
+        missing = [key for key in keys if key not in found]
+
+        if missing:
+            shared = self.shared.get_entries(missing)
+
+            # Copied with their age, so they turn stale in both tiers at once.
+            for key, (stored_at, status_code, body) in shared.items():
+                self.local.set(key, status_code, body, stored_at)
+
+            found.update(shared)
+
+        return found
+
+    def set(self, key: str, status_code: int, body: dict, stored_at: float = None):
+        self.local.set(key, status_code, body, stored_at)
+        self.shared.set(key, status_code, body, stored_at)
+
+    def set_many(self, entries: dict, stored_at: float = None):
+        self.local.set_many(entries, stored_at)
+        self.shared.set_many(entries, stored_at)
+
+    def items(self):
+        '''
+        Entries of both tiers, the local one first as it may be newer.
+        '''
+        seen = set()
+
+        for entry in self.local.items():
+            seen.add(entry[0])
+            yield entry
+
+        for entry in self.shared.items():
+            if entry[0] not in seen:
+                yield entry
+
+    def close(self):
+        for cache in (self.local, self.shared):
+            if hasattr(cache, 'close'):
+                cache.close()
+
+    def stats(self) -> dict:
+        return {'local': self.local.stats(), 'shared': self.shared.stats()}
+
+
+class Revalidator:
+    '''
+    Runs the background refreshes of stale cache entries in ``workers``
+    threads (or event loop tasks), at most one per key at a time. After a
+    failed refresh the key is not refreshed again for ``backoff`` seconds,
+    its stale entry keeps being served meanwhile.
+    '''
+
+    # Keys remembered after a failed refresh.
+    MAX_FAILED = 10000
+
+    def __init__(self, workers: int = CACHE_REFRESH_WORKERS, backoff: float = CACHE_REFRESH_BACKOFF, clock=monotonic):
+        self.workers = workers
+        self.backoff = backoff
+        self.clock = clock
+
+        self.refreshes = 0
+        self.failures = 0
+
+        self._running: set = set()
+        self._failed: OrderedDict = OrderedDict()
+        self._futures: set = set()
+        self._executor = None
+        self._lock = Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='hub-cep-refresh')
+
+        return self._executor
+
+    def claim(self, key) -> bool:
+        with self._lock:
+            if key in self._running:
+                return False
+
+            failed_at = self._failed.get(key)
+
+            if failed_at is not None and self.clock() - failed_at < self.backoff:
+                return False
+
+            self._running.add(key)
+            return True
+
+    def done(self, key, refreshed: bool):
+        with self._lock:
+            self._running.discard(key)
+            self.refreshes += 1
+
+            if refreshed:
+                self._failed.pop(key, None)
+                return
+
+            self.failures += 1
+            self._failed[key] = self.clock()
+            self._failed.move_to_end(key)
+
+            if len(self._failed) > self.MAX_FAILED:
+                self._failed.popitem(last=False)
+
+    def submit(self, key, function) -> bool:
+        '''
+        Runs ``function`` in the background unless ``key`` is already being
+        refreshed or backing off. ``function`` returns whether it refreshed.
+        '''
+        if not self.claim(key):
+            return False
+
+        def run():
+            refreshed = False
+
+            try:
+                refreshed = function()
+            except Exception:
+                logger.exception('Refresh of %r failed', key)
+            finally:
+                self.done(key, refreshed)
+
+        future = self.executor.submit(run)
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        return True
+
+    def submit_async(self, key, function) -> bool:
+        '''
+        ``submit`` for a coroutine function, run as a task of the running loop.
+        '''
+        import asyncio
+
+        if not self.claim(key):
+            return False
+
+        async def run():
+            refreshed = False
+
+            try:
+                refreshed = await function()
+            except Exception:
+                logger.exception('Refresh of %r failed', key)
+            finally:
+                self.done(key, refreshed)
+
+        task = asyncio.ensure_future(run())
+        self._futures.add(task)
+        task.add_done_callback(self._futures.discard)
+        return True
+
+    def join(self, timeout: float = None):
+        '''
+        Waits for the refreshes running in threads.
+        '''
+        wait([future for future in list(self._futures) if not hasattr(future, 'get_loop')], timeout=timeout)
+
+    async def drain(self):
+        '''
+        Waits for the refreshes running as tasks of the current loop.
+        '''
+        import asyncio
+
+        tasks = [task for task in list(self._futures) if hasattr(task, 'get_loop')]
+
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def stats(self) -> dict:
+        return {'running': len(self._running), 'refreshes': self.refreshes, 'failures': self.failures}
+
+
+default_revalidator = Revalidator()
+
+
+def from_url(url: str) -> AbstractCache:
+    '''
+    Cache described by ``url``: empty for a ``MemoryCache``, ``redis://...``
+    for a ``RedisCache`` or the path of a ``SQLiteCache`` file. A ``local``
+    query parameter, e.g. ``redis://cache:6379/0?local=100000``, puts a
+    local LRU of that size in front of the shared cache. A ``snapshot``
+    one, e.g. ``?snapshot=ceps.snap``, answers the misses from a cache
+    snapshot, see ``hub_cep.snapshot``.
+    '''
+    url, _, query = url.partition('?')
+    params = parse_qs(query)
+    local_maxsize = int(params.get('local', ['0'])[0])
+    snapshot = params.get('snapshot', [''])[0]
+
+    if not url:
+        cache = MemoryCache()
+    elif url.startswith('redis://'):
+        cache = RedisCache(url)
+    else:
+        cache = SQLiteCache(url)
+
+    if snapshot:
+        from .snapshot import SnapshotCache
+
+        cache = TieredCache(cache, SnapshotCache(snapshot))
+
+    if local_maxsize:
+        return TieredCache(MemoryCache(maxsize=local_maxsize), cache)
+
+    return cache
+
+
+def main(argv: list = None):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(prog='python -m hub_cep.cache', description='Maintenance of the SQLite zip code cache.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    compact = commands.add_parser('compact', help='remove expired entries and reclaim disk space')
+    compact.add_argument('path')
+    compact.add_argument('--ttl', type=float, default=CACHE_TTL)
+    compact.add_argument('--negative-ttl', type=float, default=CACHE_NEGATIVE_TTL)
+
+    stats = commands.add_parser('stats', help='show the number of cached entries')
+    stats.add_argument('path')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'compact':
+        cache = SQLiteCache(args.path, ttl=args.ttl, negative_ttl=args.negative_ttl)
+        print(f'{cache.compact()} expired entries removed.')
+
+    elif args.command == 'stats':
+        cache = SQLiteCache(args.path)
+        print(json.dumps(cache.stats()))
+
+    cache.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,340 @@
+'''
+Enriches a stream of zip codes with their addresses:
+
+    hub-cep customers.csv --column cep --output-format csv > enriched.csv
+    cat orders.jsonl | hub-cep --format jsonl --field shipping_cep
+    hub-cep nightly.csv --processes 8 --cache ceps.sqlite > enriched.csv
+
+Rows are read lazily and written in input order as soon as they are ready,
+with at most ``--window`` rows buffered.
+'''
+import csv
+import json
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from os import getenv
+from time import monotonic
+
+from .cache import from_url
+from .consts import BATCH_CHUNK_SIZE
+from .exceptions import ZipcodeError
+from .parallel import ProcessBatch
+from .ratelimit import POLICIES, WAIT, RateLimiterRegistry
+from .singleflight import SingleFlight
+from .zipcode import STRATEGIES, ZipCode, invalid_result
+
+
+FORMATS = ('csv', 'jsonl')
+
+FIELDS = ('zip_code', 'address', 'number', 'info', 'district', 'city', 'state', 'country')
+
+
+def ordered_map(function, items, concurrency: int, window: int):
+    '''
+    Yields ``(item, function(item))`` in input order, running up to
+    ``concurrency`` calls at once. At most ``window`` items are read ahead,
+    so a slow lookup holds back the output but never the memory.
+    '''
+    pending: deque = deque()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='hub-cep-cli') as executor:
+        try:
+            for item in items:
+                pending.append((item, executor.submit(function, item)))
+
+                if len(pending) >= window:
+                    item, future = pending.popleft()
+                    yield item, future.result()
+
+            while pending:
+                item, future = pending.popleft()
+                yield item, future.result()
+
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def read_csv(stream, column: str, delimiter: str = ','):
+    reader = csv.DictReader(stream, delimiter=delimiter)
+
+    if reader.fieldnames is None:
+        return
+
+    if column not in reader.fieldnames:
+        raise SystemExit(f'hub-cep: column {column!r} not found in the CSV header.')
+
+    for row in reader:
+        yield row, row[column]
+
+
+def read_jsonl(stream, field: str):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise SystemExit(f'hub-cep: line {number} is not valid JSON: {e}.') from None
+
+        if not isinstance(record, dict):
+            raise SystemExit(f'hub-cep: line {number} is not a JSON object.')
+
+        yield record, record.get(field)
+
+
+def enrich(record: dict, status_code: int, body: dict, prefix: str = '') -> dict:
+    body = body or {}
+    data = body.get('data') if status_code == 200 else None
+
+    enriched = dict(record)
+    enriched[f'{prefix}status'] = status_code
+    enriched[f'{prefix}message'] = body.get('message', '')
+
+    for name in FIELDS:
+        enriched[f'{prefix}{name}'] = data.get(name) if data else None
+
+    return enriched
+
+
+class CSVWriter:
+    '''
+    Writes the columns of the first record followed by the enrichment columns.
+    '''
+
+    def __init__(self, stream, prefix: str = '', delimiter: str = ','):
+        self.stream = stream
+        self.prefix = prefix
+        self.delimiter = delimiter
+        self.writer = None
+
+    def write(self, record: dict, enriched: dict):
+        if self.writer is None:
+            extra = [f'{self.prefix}{name}' for name in ('status', 'message') + FIELDS]
+            columns = [name for name in record if name not in extra] + extra
+
+            self.writer = csv.DictWriter(
+                self.stream, columns, delimiter=self.delimiter, restval='', extrasaction='ignore', lineterminator='\n'
+            )
+            self.writer.writeheader()
+
+        self.writer.writerow({name: '' if value is None else value for name, value in enriched.items()})
+
+
+class JSONLWriter:
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, record: dict, enriched: dict):
+        self.stream.write(json.dumps(enriched, ensure_ascii=False))
+        self.stream.write('\n')
+
+
+class Progress:
+    '''
+    Reports processed rows and throughput to ``stream`` every ``interval``
+    seconds, and a summary at the end. ``output``, where the rows are
+    written, is flushed before each report.
+    '''
+
+    def __init__(self, stream, interval: float = 1.0, clock=monotonic, output=None):
+        self.stream = stream
+        self.interval = interval
+        self.clock = clock
+        self.output = output
+
+        self.started = self.reported = clock()
+        self.rows = 0
+        self.found = 0
+
+    def update(self, status_code: int):
+        self.rows += 1
+        self.found += status_code == 200
+
+        if self.clock() - self.reported >= self.interval:
+            self.report()
+
+    def rate(self) -> float:
+        elapsed = self.clock() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+    def report(self, final: bool = False):
+        self.reported = self.clock()
+        prefix = 'done: ' if final else ''
+
+        if self.output is not None:
+            self.output.flush()
+
+        self.stream.write(
+            f'{prefix}{self.rows} rows, {self.found} found, {self.rows - self.found} failed, '
+            f'{self.rate():.1f} rows/s, {self.reported - self.started:.1f}s\n'
+        )
+        self.stream.flush()
+
+
+def build_cache(url: str):
+    return from_url(url or '')
+
+
+def parse_args(argv: list = None):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(prog='hub-cep', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('input', nargs='?', default='-', help='CSV or JSONL file, stdin when omitted or -')
+    parser.add_argument('--format', choices=FORMATS, help='input format, from the file extension by default')
+    parser.add_argument('--column', '--field', dest='column', default='cep', help='CSV column or JSONL field')
+    parser.add_argument('--output-format', choices=FORMATS, help='same as the input by default')
+    parser.add_argument('--prefix', default='', help='prefix of the added columns')
+    parser.add_argument('--delimiter', default=',', help='CSV delimiter')
+    parser.add_argument('--concurrency', type=int, default=8, help='lookups in flight, per process with --processes')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='worker processes for very large inputs, the lookups run in threads otherwise')
+    parser.add_argument('--chunk-size', type=int, default=BATCH_CHUNK_SIZE, help='zip codes sent to a worker at once')
+    parser.add_argument('--window', type=int, help='rows buffered to keep the order, 4x concurrency by default')
+    parser.add_argument('--cache', help='SQLite cache file or redis:// url, an in-memory (or temporary with '
+                        '--processes) cache otherwise')
+    parser.add_argument('--providers', help='comma separated providers to use, in order')
+    parser.add_argument('--strategy', choices=STRATEGIES, default='sequential')
+    parser.add_argument('--deadline', type=float, help='budget of each lookup in seconds')
+    parser.add_argument('--progress', action='store_true', help='report throughput to stderr')
+    parser.add_argument('--progress-interval', type=float, default=1.0)
+    parser.add_argument('--rate-limit', action='append', default=[], metavar='PROVIDER=RATE[:BURST]',
+                        help='requests per second allowed to a provider, may be repeated')
+    parser.add_argument('--rate-limit-policy', choices=POLICIES, default=WAIT,
+                        help='when a provider is over its limit: wait, skip it or fail the row')
+
+    args = parser.parse_args(argv)
+
+    if args.format is None:
+        args.format = 'jsonl' if args.input.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+    args.output_format = args.output_format or args.format
+    args.window = args.window or args.concurrency * 4
+
+    if args.concurrency < 1 or args.window < args.concurrency:
+        parser.error('--concurrency must be positive and --window at least --concurrency.')
+
+    if args.processes < 0 or args.chunk_size < 1:
+        parser.error('--processes must not be negative and --chunk-size must be positive.')
+
+    if args.providers:
+        args.providers = tuple(name.strip() for name in args.providers.split(',') if name.strip())
+        unknown = {name for name in args.providers if name not in ZipCode.registry}
+
+        if unknown:
+            parser.error(f'unknown providers: {", ".join(sorted(unknown))}')
+
+        if args.providers == ('cepaberto',) and not getenv('CEPABERTO_TOKEN'):
+            parser.error('cepaberto requires the CEPABERTO_TOKEN environment variable.')
+
+    args.rate_limits = {}
+
+    for value in args.rate_limit:
+        name, _, limit = value.partition('=')
+        rate, _, burst = limit.partition(':')
+
+        try:
+            args.rate_limits[name.strip()] = {'rate': float(rate), 'burst': float(burst or 0)}
+        except ValueError:
+            parser.error(f'invalid --rate-limit: {value}')
+
+    return args
+
+
+def build_limiters(limits: dict, policy: str):
+    if not limits:
+        return None
+
+    limiters = RateLimiterRegistry(policy=policy)
+
+    for name, options in limits.items():
+        limiters.configure(name, **options)
+
+    return limiters
+
+
+def main(argv: list = None, stdin=None, stdout=None, stderr=None):
+    args = parse_args(argv)
+
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+
+    source = stdin if args.input == '-' else open(args.input, newline='', encoding='utf-8')
+
+    if args.format == 'csv':
+        rows = read_csv(source, args.column, args.delimiter)
+    else:
+        rows = read_jsonl(source, args.column)
+
+    if args.output_format == 'csv':
+        writer = CSVWriter(stdout, args.prefix, args.delimiter)
+    else:
+        writer = JSONLWriter(stdout)
+
+    progress = Progress(stderr, args.progress_interval, output=stdout) if args.progress else None
+    cache = batch = None
+
+    if args.processes:
+        batch = ProcessBatch(
+            processes=args.processes,
+            chunk_size=args.chunk_size,
+            concurrency=args.concurrency,
+            cache_path=args.cache,
+            rate_limits=args.rate_limits,
+            rate_limit_policy=args.rate_limit_policy,
+            provider_names=args.providers or None,
+            deadline=args.deadline,
+            strategy=args.strategy
+        )
+        results = ((row, result) for row, *result in batch.search(rows, key=itemgetter(1)))
+
+    else:
+        cache = build_cache(args.cache)
+        client = type('ZipCode', (ZipCode,), {
+            'cache': cache,
+            'flights': SingleFlight(),
+            'provider_names': args.providers or None,
+            'limiters': build_limiters(args.rate_limits, args.rate_limit_policy),
+        })
+
+        def lookup(row):
+            try:
+                return client(row[1], strategy=args.strategy).search(deadline=args.deadline)
+            except ZipcodeError:
+                return invalid_result()
+
+        results = ordered_map(lookup, rows, args.concurrency, args.window)
+
+    try:
+        for (record, _), (status_code, body) in results:
+            # Flushed by the progress reports and at the end, not row by row.
+            writer.write(record, enrich(record, status_code, body, args.prefix))
+
+            if progress is not None:
+                progress.update(status_code)
+
+    finally:
+        stdout.flush()
+
+        if source is not stdin:
+            source.close()
+
+        if hasattr(cache, 'close'):
+            cache.close()
+
+        if batch is not None:
+            batch.close()
+
+    if progress is not None:
+        progress.report(final=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
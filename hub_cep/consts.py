@@ -0,0 +1,87 @@
+from os import getenv
+
+
+# Network settings are read once at import time instead of on every call.
+TIMEOUT: float = float(getenv('TIMEOUT', default=3))
+CONNECT_TIMEOUT: float = float(getenv('CONNECT_TIMEOUT', default=TIMEOUT))
+
+POOL_CONNECTIONS: int = int(getenv('POOL_CONNECTIONS', default=1))
+POOL_MAXSIZE: int = int(getenv('POOL_MAXSIZE', default=10))
+POOL_BLOCK: bool = getenv('POOL_BLOCK', default='').lower() in ('1', 'true', 'yes')
+# urllib3 retries under each call, on top of the provider retry_policy (hub_cep.retry).
+POOL_MAX_RETRIES: int = int(getenv('POOL_MAX_RETRIES', default=0))
+
+# ZipCode.search strategy: 'sequential', 'race' or 'hedge'.
+SEARCH_STRATEGY: str = getenv('SEARCH_STRATEGY', default='sequential')
+HEDGE_DELAY: float = float(getenv('HEDGE_DELAY', default=0.5))
+SEARCH_WORKERS: int = int(getenv('SEARCH_WORKERS', default=32))
+
+# Providers tried by ZipCode.search, in order (hub_cep.registry).
+PROVIDERS: tuple = tuple(
+    name.strip() for name in getenv('PROVIDERS', default='viacep,postmon,cepaberto').split(',') if name.strip()
+)
+
+# Connection pool of the asyncio client (hub_cep.aio).
+ASYNC_POOL_LIMIT: int = int(getenv('ASYNC_POOL_LIMIT', default=100))
+ASYNC_POOL_LIMIT_PER_HOST: int = int(getenv('ASYNC_POOL_LIMIT_PER_HOST', default=0))
+KEEPALIVE_TIMEOUT: float = float(getenv('KEEPALIVE_TIMEOUT', default=30))
+
+# Result cache in front of ZipCode.search, ttls in seconds.
+CACHE_MAXSIZE: int = int(getenv('CACHE_MAXSIZE', default=500000))
+CACHE_TTL: float = float(getenv('CACHE_TTL', default=30 * 24 * 60 * 60))
+CACHE_NEGATIVE_TTL: float = float(getenv('CACHE_NEGATIVE_TTL', default=60 * 60))
+# Served stale, and refreshed in the background, up to this long past the ttl.
+CACHE_STALE_TTL: float = float(getenv('CACHE_STALE_TTL', default=0))
+CACHE_REFRESH_WORKERS: int = int(getenv('CACHE_REFRESH_WORKERS', default=4))
+CACHE_REFRESH_BACKOFF: float = float(getenv('CACHE_REFRESH_BACKOFF', default=60))
+CACHE_BATCH_SIZE: int = int(getenv('CACHE_BATCH_SIZE', default=100))
+CACHE_FLUSH_INTERVAL: float = float(getenv('CACHE_FLUSH_INTERVAL', default=1))
+# Seconds a shared cache that could not be reached is left alone before reconnecting.
+CACHE_RECONNECT_BACKOFF: float = float(getenv('CACHE_RECONNECT_BACKOFF', default=1))
+# Binary cache snapshot answering the misses of the serverless cache (hub_cep.snapshot).
+CACHE_SNAPSHOT: str = getenv('CACHE_SNAPSHOT', default='')
+
+# ZipCode.search_many
+BULK_CONCURRENCY: int = int(getenv('BULK_CONCURRENCY', default=8))
+BULK_DEDUP_SIZE: int = int(getenv('BULK_DEDUP_SIZE', default=100000))
+# Threads shared by every search_many call, the cap of their concurrency.
+BULK_WORKERS: int = int(getenv('BULK_WORKERS', default=64))
+
+# Process pool batches (hub_cep.parallel), 0 processes is one per core.
+BATCH_PROCESSES: int = int(getenv('BATCH_PROCESSES', default=0))
+BATCH_CHUNK_SIZE: int = int(getenv('BATCH_CHUNK_SIZE', default=500))
+
+# Adaptive provider ordering (hub_cep.scheduler).
+SCHEDULER_ALPHA: float = float(getenv('SCHEDULER_ALPHA', default=0.2))
+SCHEDULER_EXPLORATION: float = float(getenv('SCHEDULER_EXPLORATION', default=0.05))
+
+# Circuit breaker per provider (hub_cep.breaker).
+BREAKER_FAILURE_THRESHOLD: int = int(getenv('BREAKER_FAILURE_THRESHOLD', default=5))
+BREAKER_ERROR_RATE: float = float(getenv('BREAKER_ERROR_RATE', default=0.5))
+BREAKER_WINDOW: int = int(getenv('BREAKER_WINDOW', default=20))
+BREAKER_MIN_CALLS: int = int(getenv('BREAKER_MIN_CALLS', default=10))
+BREAKER_COOLDOWN: float = float(getenv('BREAKER_COOLDOWN', default=30))
+BREAKER_PROBES: int = int(getenv('BREAKER_PROBES', default=1))
+
+# Deadline aware search (hub_cep.deadline).
+MIN_ATTEMPT_TIMEOUT: float = float(getenv('MIN_ATTEMPT_TIMEOUT', default=0.05))
+LAMBDA_MARGIN: float = float(getenv('LAMBDA_MARGIN', default=0.2))
+
+# Serverless entry point (hub_cep.serverless).
+LAMBDA_PREWARM: bool = getenv('LAMBDA_PREWARM', default='true').lower() in ('1', 'true', 'yes')
+
+# HTTP lookup service (hub_cep.service).
+SERVICE_BATCH_LIMIT: int = int(getenv('SERVICE_BATCH_LIMIT', default=100))
+SERVICE_CONCURRENCY: int = int(getenv('SERVICE_CONCURRENCY', default=16))
+SERVICE_CACHE: str = getenv('SERVICE_CACHE', default='')
+
+# Client side rate limit per provider (hub_cep.ratelimit), 0 requests per second is unlimited.
+RATE_LIMIT: float = float(getenv('RATE_LIMIT', default=0))
+RATE_BURST: float = float(getenv('RATE_BURST', default=0))
+RATE_LIMIT_POLICY: str = getenv('RATE_LIMIT_POLICY', default='wait')
+RATE_LIMIT_MAX_WAIT: float = float(getenv('RATE_LIMIT_MAX_WAIT', default=1))
+
+# Retries of failed provider calls (hub_cep.retry), attempts includes the first call.
+RETRY_ATTEMPTS: int = int(getenv('RETRY_ATTEMPTS', default=2))
+RETRY_BACKOFF: float = float(getenv('RETRY_BACKOFF', default=0.05))
+RETRY_MAX_BACKOFF: float = float(getenv('RETRY_MAX_BACKOFF', default=1))
@@ -0,0 +1,51 @@
+from time import monotonic
+
+from .consts import CONNECT_TIMEOUT, LAMBDA_MARGIN, MIN_ATTEMPT_TIMEOUT, TIMEOUT
+
+
+class Deadline:
+    '''
+    Total time budget of one search, shared by every provider attempt.
+    '''
+
+    def __init__(self, budget: float, clock=monotonic):
+        self.budget = budget
+        self._clock = clock
+        self.expires_at = clock() + budget
+
+    @classmethod
+    def from_lambda_context(cls, context, margin: float = LAMBDA_MARGIN):
+        '''
+        Budget from the remaining time of an AWS Lambda invocation, keeping
+        ``margin`` seconds to build the response.
+        '''
+        return cls(max(context.get_remaining_time_in_millis() / 1000 - margin, 0))
+
+    @classmethod
+    def coerce(cls, deadline):
+        if deadline is None or isinstance(deadline, cls):
+            return deadline
+
+        return cls(float(deadline))
+
+    def remaining(self) -> float:
+        return max(self.expires_at - self._clock(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, attempts: int = 1, connect: float = CONNECT_TIMEOUT, read: float = TIMEOUT):
+        '''
+        ``(connect, read)`` timeout of the next attempt when ``attempts``
+        providers are still to be tried, or ``None`` when there is not enough
+        time left for one more attempt.
+        '''
+        remaining = self.remaining()
+
+        if remaining < MIN_ATTEMPT_TIMEOUT:
+            return None
+
+        share = min(max(remaining / max(attempts, 1), MIN_ATTEMPT_TIMEOUT), remaining)
+
+        return min(connect, share), min(read, share)
@@ -7,3 +7,13 @@ class TokenError(Exception):
 class ZipcodeError(Exception):
     def __init__(self, message):
         super().__init__(message)
+
+
+class RateLimitError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class CacheError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
@@ -0,0 +1,30 @@
+'''
+JSON decoding and encoding through ``orjson`` when it is installed
+(``pip install hub-cep[fast]``), the standard library otherwise.
+'''
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def loads(data):
+    '''
+    Decodes a ``bytes`` or ``str`` document.
+    '''
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+def dumps(obj) -> str:
+    '''
+    Compact utf-8 document, non ascii characters are kept as they are.
+    '''
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
@@ -0,0 +1,281 @@
+import logging
+from bisect import bisect_left
+from threading import Lock
+from urllib.parse import urlsplit
+
+from .messages import Outcome
+
+
+logger = logging.getLogger(__name__)
+
+CACHE = 'cache'
+OFFLINE = 'offline'
+NETWORK = 'network'
+SHARED = 'shared'
+STALE = 'stale'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class AttemptEvent:
+    '''
+    One provider call made by a search.
+    '''
+
+    __slots__ = ('provider', 'host', 'status_code', 'duration', 'outcome', 'message')
+
+    def __init__(self, provider: str, host: str, status_code: int, duration: float, outcome: Outcome, message: str):
+        self.provider = provider
+        self.host = host
+        self.status_code = status_code
+        self.duration = duration
+        self.outcome = outcome
+        self.message = message
+
+    def to_dict(self) -> dict:
+        return {
+            'provider': self.provider,
+            'host': self.host,
+            'status_code': self.status_code,
+            'duration': self.duration,
+            'outcome': self.outcome.value,
+            'message': self.message
+        }
+
+
+class SearchEvent:
+    '''
+    One ``ZipCode.search``. ``source`` tells where the answer came from:
+    the cache, a stale cache entry being refreshed, the offline index, the
+    network or a lookup already in flight (shared). ``provider`` is the provider that found the address, if any.
+    '''
+
+    __slots__ = ('zipcode', 'status_code', 'duration', 'attempts', 'provider', 'source')
+
+    def __init__(self, zipcode: str, status_code: int, duration: float, attempts: int, provider: str, source: str):
+        self.zipcode = zipcode
+        self.status_code = status_code
+        self.duration = duration
+        self.attempts = attempts
+        self.provider = provider
+        self.source = source
+
+    def to_dict(self) -> dict:
+        return {
+            'zipcode': self.zipcode,
+            'status_code': self.status_code,
+            'duration': self.duration,
+            'attempts': self.attempts,
+            'provider': self.provider,
+            'source': self.source
+        }
+
+
+def host(provider) -> str:
+    get_url = getattr(provider, 'get_url', None)
+    return urlsplit(get_url()).netloc if get_url else ''
+
+
+class Instrument:
+    '''
+    Receives search events, override the hooks you need. Hooks run in the
+    thread (or event loop) doing the lookup, so keep them fast.
+    '''
+
+    def on_attempt(self, event: AttemptEvent):
+        pass
+
+    def on_search(self, event: SearchEvent):
+        pass
+
+
+class Instruments:
+    '''
+    Registered instruments. Searches only build events while ``active`` is
+    set, so instrumentation costs nothing when no instrument is registered.
+    '''
+
+    def __init__(self):
+        self.active = False
+
+        self._instruments: tuple = ()
+        self._lock = Lock()
+
+    def add(self, instrument: Instrument) -> Instrument:
+        with self._lock:
+            self._instruments = self._instruments + (instrument,)
+            self.active = True
+
+        return instrument
+
+    def remove(self, instrument: Instrument):
+        with self._lock:
+            self._instruments = tuple(item for item in self._instruments if item is not instrument)
+            self.active = bool(self._instruments)
+
+    def clear(self):
+        with self._lock:
+            self._instruments = ()
+            self.active = False
+
+    def __len__(self):
+        return len(self._instruments)
+
+    def emit(self, hook: str, event):
+        for instrument in self._instruments:
+            try:
+                getattr(instrument, hook)(event)
+            except Exception:
+                # A broken instrument must never break a lookup.
+                logger.exception('Instrument %r failed on %s', instrument, hook)
+
+    def attempt(self, event: AttemptEvent):
+        self.emit('on_attempt', event)
+
+    def search(self, event: SearchEvent):
+        self.emit('on_search', event)
+
+
+instruments = Instruments()
+
+
+class Histogram:
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        total = 0
+        result = []
+
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+
+        return result
+
+
+def format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return f'{{{pairs}}}'
+
+
+def format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class MemoryCollector(Instrument):
+    '''
+    Keeps counters and latency histograms in memory. ``render`` returns them
+    in the Prometheus text exposition format, ready to be scraped.
+    '''
+
+    COUNTERS = {
+        'hub_cep_attempts_total': 'Provider calls by provider and outcome.',
+        'hub_cep_searches_total': 'Searches by answer source, winning provider and status code.',
+        'hub_cep_search_attempts_total': 'Provider calls made by searches.',
+    }
+
+    HISTOGRAMS = {
+        'hub_cep_attempt_duration_seconds': 'Provider call latency by provider.',
+        'hub_cep_search_duration_seconds': 'Search latency by answer source.',
+    }
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+
+        self._lock = Lock()
+        self._counters: dict = {name: {} for name in self.COUNTERS}
+        self._histograms: dict = {name: {} for name in self.HISTOGRAMS}
+
+    def increment(self, name: str, labels: tuple, amount: int = 1):
+        counter = self._counters[name]
+        counter[labels] = counter.get(labels, 0) + amount
+
+    def observe(self, name: str, labels: tuple, value: float):
+        histogram = self._histograms[name].get(labels)
+
+        if histogram is None:
+            histogram = self._histograms[name][labels] = Histogram(self.buckets)
+
+        histogram.observe(value)
+
+    def on_attempt(self, event: AttemptEvent):
+        with self._lock:
+            self.increment('hub_cep_attempts_total', (('provider', event.provider), ('outcome', event.outcome.value)))
+            self.observe('hub_cep_attempt_duration_seconds', (('provider', event.provider),), event.duration)
+
+    def on_search(self, event: SearchEvent):
+        labels = (('source', event.source), ('provider', event.provider or ''), ('status_code', event.status_code))
+
+        with self._lock:
+            self.increment('hub_cep_searches_total', labels)
+            self.increment('hub_cep_search_attempts_total', (), event.attempts)
+            self.observe('hub_cep_search_duration_seconds', (('source', event.source),), event.duration)
+
+    def counter(self, name: str, **labels) -> int:
+        '''
+        Sum of the counter ``name`` over the series matching ``labels``.
+        '''
+        wanted = {key: str(value) for key, value in labels.items()}
+
+        with self._lock:
+            return sum(
+                value for key, value in self._counters[name].items()
+                if all(str(dict(key).get(label)) == value for label, value in wanted.items())
+            )
+
+    def histogram(self, name: str, **labels) -> dict:
+        with self._lock:
+            histogram = self._histograms[name].get(tuple(labels.items()))
+
+            if histogram is None:
+                return {'count': 0, 'sum': 0.0, 'buckets': []}
+
+            return {'count': histogram.count, 'sum': histogram.sum, 'buckets': histogram.cumulative()}
+
+    def reset(self):
+        with self._lock:
+            for series in (*self._counters.values(), *self._histograms.values()):
+                series.clear()
+
+    def render(self) -> str:
+        lines = []
+
+        with self._lock:
+            for name, description in self.COUNTERS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} counter')
+
+                for labels, value in sorted(self._counters[name].items(), key=lambda item: str(item[0])):
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+
+            for name, description in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+
+                for labels, histogram in sorted(self._histograms[name].items(), key=lambda item: str(item[0])):
+                    for bound, count in histogram.cumulative():
+                        bucket = format_labels(labels + (('le', format_bound(bound)),))
+                        lines.append(f'{name}_bucket{bucket} {count}')
+
+                    lines.append(f'{name}_sum{format_labels(labels)} {histogram.sum}')
+                    lines.append(f'{name}_count{format_labels(labels)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
@@ -2,10 +2,47 @@ from enum import Enum
 
 
 class Messages(Enum):
+    BATCH_TOO_LARGE: str = 'Too many zip codes.'
+    DEADLINE_EXCEEDED: str = 'Deadline exceeded.'
+    INVALID_REQUEST: str = 'Invalid request.'
+    METHOD_NOT_ALLOWED: str = 'Method not allowed.'
     NETWORK_ERROR: str = 'Network error.'
     NOT_IMPLEMENTED: str = 'Should implement.'
+    PROVIDER_UNAVAILABLE: str = 'Provider unavailable.'
+    RATE_LIMITED: str = 'Rate limited.'
+    ROUTE_NOT_FOUND: str = 'Route not found.'
     STRANGE_ERROR: str = 'An error ocurred.'
     SUCCESS: str = 'Success.'
     TOKEN_INVALID: str = 'Token invalid.'
     ZIPCODE_INVALID: str = 'Zipcode invalid.'
     ZIPCODE_NOT_FOUND: str = 'Zip code not found.'
+
+
+class Outcome(Enum):
+    SUCCESS: str = 'success'
+    NOT_FOUND: str = 'not_found'
+    TIMEOUT: str = 'timeout'
+    NETWORK_ERROR: str = 'network_error'
+    ERROR: str = 'error'
+
+
+def classify(error: bool, info: dict, timed_out: bool = None) -> Outcome:
+    '''
+    Outcome of a provider ``search`` result. Transport failures are the only
+    results carrying the ``timeout`` flag. It is also set for TLS, proxy and
+    other request errors, so ``timed_out``, from the exception the provider
+    caught, decides between a timeout and a network error when known.
+    '''
+    if not error:
+        return Outcome.SUCCESS
+
+    if info.get('message') == Messages.ZIPCODE_NOT_FOUND.value:
+        return Outcome.NOT_FOUND
+
+    if 'timeout' in info:
+        if timed_out is None:
+            timed_out = info['timeout'] is True
+
+        return Outcome.TIMEOUT if timed_out else Outcome.NETWORK_ERROR
+
+    return Outcome.ERROR
@@ -0,0 +1,167 @@
+'''
+Offline zip code dataset. A CEP dump (e.g. the Correios DNE base exported
+to CSV) is compiled once into a compact binary index:
+
+    header   magic, version, record count, string count
+    records  sorted fixed width rows: cep, address, district, city, state
+    offsets  string table offsets
+    strings  deduplicated utf-8 strings
+
+Lookups binary search the records through ``mmap``, so the file is paged in
+on demand and almost nothing stays resident, see ``hub_cep.table``.
+'''
+import csv
+import struct
+import sys
+
+from .messages import Messages
+from .providers import AbstractProvider
+from .table import SortedTable, write_table
+from .validators import normalize
+
+
+MAGIC = b'HCEP'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHHII')
+RECORD = struct.Struct('<IIIII')
+
+FIELDS = ('address', 'district', 'city', 'state')
+
+COLUMNS = {
+    'cep': 'cep',
+    'address': 'logradouro',
+    'district': 'bairro',
+    'city': 'cidade',
+    'state': 'uf',
+}
+
+
+def build_index(source: str, path: str, columns: dict = None, delimiter: str = ',', encoding: str = 'utf-8') -> int:
+    '''
+    Compiles a CSV dump into the binary index at ``path``. ``columns`` maps
+    the index fields to the CSV header names. Returns the number of records.
+    '''
+    columns = dict(COLUMNS, **(columns or {}))
+    strings: dict = {'': 0}
+    records: dict = {}
+
+    def intern(value):
+        value = (value or '').strip()
+        index = strings.get(value)
+
+        if index is None:
+            index = strings[value] = len(strings)
+
+        return index
+
+    with open(source, newline='', encoding=encoding) as f:
+        for row in csv.DictReader(f, delimiter=delimiter):
+            zipcode = normalize(row.get(columns['cep']))
+
+            if not zipcode:
+                continue
+
+            records[int(zipcode)] = tuple(intern(row.get(columns[field])) for field in FIELDS)
+
+    rows = (RECORD.pack(zipcode, *records[zipcode]) for zipcode in sorted(records))
+    write_table(path, HEADER.pack(MAGIC, VERSION, 0, len(records), len(strings)), rows, strings)
+
+    return len(records)
+
+
+class OfflineIndex(SortedTable):
+
+    MAGIC = MAGIC
+    VERSION = VERSION
+    HEADER = HEADER
+    RECORD = RECORD
+    KIND = 'offline index'
+
+    def __init__(self, path: str):
+        self.path = path
+        self.open(path)
+
+    def lookup(self, zipcode: str):
+        '''
+        Returns the raw record for ``zipcode`` as a dict or ``None``.
+        '''
+        zipcode = normalize(zipcode)
+
+        if not zipcode:
+            return None
+
+        position = self.find(int(zipcode))
+
+        if position < 0:
+            return None
+
+        _, *indexes = self.row(position)
+        record = {field: self.string(index) for field, index in zip(FIELDS, indexes)}
+        record['cep'] = f'{zipcode[:5]}-{zipcode[5:]}'
+
+        return record
+
+    def __contains__(self, zipcode: str):
+        return self.lookup(zipcode) is not None
+
+
+class Offline(AbstractProvider):
+    '''
+    Provider answering from an ``OfflineIndex`` instead of the network.
+    '''
+
+    NAME: str = 'offline'
+
+    def __init__(self, zipcode: str, index: OfflineIndex):
+        super().__init__(zipcode)
+        self.index = index
+
+    def get_url(self):
+        return f'file://{self.index.path}'
+
+    def search(self, timeout=None):
+        record = self.index.lookup(self.zipcode)
+
+        if record is None:
+            return True, {'error': True, 'message': Messages.ZIPCODE_NOT_FOUND.value}
+
+        return False, {'error': False, 'message': Messages.SUCCESS.value, 'data': self.translate(record)}
+
+    def translate(self, info: dict):
+
+        return {
+            'zip_code': info.get('cep'),
+            'address': info.get('address'),
+            'number': '',
+            'info': '',
+            'district': info.get('district'),
+            'city': info.get('city'),
+            'state': info.get('state'),
+            'country': 'BRA'
+        }
+
+
+def main(argv: list = None):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(prog='python -m hub_cep.offline', description='Builds the offline zip code index.')
+    parser.add_argument('source', help='CSV dump with one zip code per row')
+    parser.add_argument('path', help='index file to write')
+    parser.add_argument('--delimiter', default=',')
+    parser.add_argument('--encoding', default='utf-8')
+
+    for field, column in COLUMNS.items():
+        parser.add_argument(f'--{field}-column', dest=field, default=column)
+
+    args = parser.parse_args(argv)
+    columns = {field: getattr(args, field) for field in COLUMNS}
+
+    count = build_index(args.source, args.path, columns, args.delimiter, args.encoding)
+    print(f'{count} zip codes written to {args.path}.')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+'''
+Batch lookups spread over worker processes, for inputs large enough that a
+single interpreter is CPU bound decoding responses:
+
+    with ProcessBatch(processes=8, cache_path='ceps.sqlite') as batch:
+        for zipcode, status_code, body in batch.search(zipcodes):
+            ...
+
+The parent reads the input, deduplicates it and sends chunks of distinct zip
+codes to the workers. Each worker has its own connection pool, search
+threads and share of the provider rate limits, and every result goes to a
+SQLite cache shared by all of them, so a zip code resolved by one worker is
+never fetched again by another.
+'''
+import os
+import shutil
+import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+
+from .cache import SQLiteCache, from_url
+from .consts import BATCH_CHUNK_SIZE, BATCH_PROCESSES, BULK_CONCURRENCY, BULK_DEDUP_SIZE, PROVIDERS
+from .exceptions import ZipcodeError
+from .ratelimit import WAIT, RateLimiterRegistry
+from .singleflight import SingleFlight
+from .validators import is_valid, normalize
+from .zipcode import ZipCode, invalid_result
+
+
+def share_limits(limits: dict, processes: int) -> dict:
+    '''
+    Rate limits of one worker, so all of them together stay under ``limits``.
+    '''
+    return {
+        name: {'rate': options['rate'] / processes, 'burst': options.get('burst', 0) / processes}
+        for name, options in limits.items()
+    }
+
+
+def open_cache(url: str, chunk_size: int):
+    if url.startswith('redis://'):
+        return from_url(url)
+
+    # Flushed after every chunk, so the other workers see the results.
+    return SQLiteCache(url, flush_interval=float('inf'), batch_size=chunk_size)
+
+
+# State of a worker process, built once by ``init_worker``.
+_client = None
+_executor = None
+_deadline = None
+_options: dict = {}
+
+
+def init_worker(config: dict):
+    global _client, _executor, _deadline, _options
+
+    ZipCode.registry.restore(config['registry'])
+
+    for name, url in config['urls'].items():
+        ZipCode.registry.configure(name, API_URL=url)
+
+    limiters = None
+
+    if config['rate_limits']:
+        limiters = RateLimiterRegistry(policy=config['rate_limit_policy'])
+
+        for name, options in config['rate_limits'].items():
+            limiters.configure(name, **options)
+
+    _client = type('ZipCode', (ZipCode,), {
+        'cache': open_cache(config['cache_path'], config['chunk_size']),
+        'flights': SingleFlight(),
+        'provider_names': config['provider_names'],
+        'limiters': limiters,
+    })
+    _executor = ThreadPoolExecutor(max_workers=config['concurrency'], thread_name_prefix='hub-cep-worker')
+    _deadline = config['deadline']
+    _options = config['options']
+
+
+def lookup(zipcode: str):
+    try:
+        return _client(zipcode, **_options).search(deadline=_deadline)
+    except ZipcodeError:
+        return invalid_result()
+
+
+def search_chunk(zipcodes: list) -> list:
+    '''
+    ``(status_code, body)`` of each zip code of the chunk, in order.
+    '''
+    cache = _client.cache
+    found = _client.from_cache_many(zipcodes, compact=_options.get('compact'))
+    missing = [zipcode for zipcode in zipcodes if zipcode not in found]
+
+    try:
+        found.update(zip(missing, _executor.map(lookup, missing)))
+    finally:
+        if hasattr(cache, 'flush'):
+            cache.flush()
+
+    return [found[zipcode] for zipcode in zipcodes]
+
+
+class ProcessBatch:
+    '''
+    Pool of worker processes answering chunks of ``chunk_size`` distinct zip
+    codes, each with ``concurrency`` search threads. ``rate_limits`` maps
+    provider names to ``{'rate', 'burst'}`` for the whole pool, every worker
+    gets an equal share. ``deadline`` is the budget of each lookup and
+    ``options`` are passed to the ``ZipCode`` constructor. Without
+    ``cache_path`` the shared cache is a temporary file removed by ``close``,
+    it may also be a ``redis://`` url.
+
+    Workers are spawned, never forked: they inherit no open connections,
+    threads or locks from the parent. Providers registered or configured
+    in the parent, and their urls, are applied in the workers.
+    '''
+
+    def __init__(
+        self,
+        processes: int = BATCH_PROCESSES,
+        chunk_size: int = BATCH_CHUNK_SIZE,
+        concurrency: int = BULK_CONCURRENCY,
+        cache_path: str = None,
+        rate_limits: dict = None,
+        rate_limit_policy: str = WAIT,
+        provider_names: tuple = None,
+        dedup_size: int = BULK_DEDUP_SIZE,
+        deadline: float = None,
+        **options
+    ):
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.dedup_size = dedup_size
+        # Chunks in flight: enough to keep every worker busy while results are merged.
+        self.max_chunks = self.processes * 2
+
+        self._tempdir = None
+
+        if cache_path is None:
+            self._tempdir = tempfile.mkdtemp(prefix='hub-cep-')
+            cache_path = os.path.join(self._tempdir, 'cache.sqlite')
+
+        self.cache_path = cache_path
+
+        if not cache_path.startswith('redis://'):
+            # Creates the schema once, before the workers race to do it.
+            SQLiteCache(cache_path).close()
+
+        self.config = {
+            'registry': ZipCode.registry.state(),
+            'urls': {
+                name: ZipCode.registry.get(name).API_URL for name in provider_names or PROVIDERS
+            },
+            'cache_path': cache_path,
+            'chunk_size': chunk_size,
+            'concurrency': concurrency,
+            'rate_limits': share_limits(rate_limits or {}, self.processes),
+            'rate_limit_policy': rate_limit_policy,
+            'provider_names': provider_names,
+            'deadline': deadline,
+            'options': options,
+        }
+
+        self._pool = None
+
+    @property
+    def pool(self):
+        # A multiprocessing pool, ProcessPoolExecutor takes no initializer before Python 3.7.
+        if self._pool is None:
+            self._pool = get_context('spawn').Pool(self.processes, initializer=init_worker, initargs=(self.config,))
+
+        return self._pool
+
+    def search(self, items, key=None):
+        '''
+        Yields ``(item, status_code, body)`` for every item, in input order.
+        ``key`` extracts the zip code of an item, the item itself by default.
+        The input is consumed lazily, a zip code seen among the last
+        ``dedup_size`` distinct ones is never sent to the workers again.
+        '''
+        rows: deque = deque()
+        recent: OrderedDict = OrderedDict()
+        waiting: dict = {}
+        chunks: deque = deque()
+        chunk: list = []
+        window = self.max_chunks * self.chunk_size
+
+        def submit():
+            chunks.append((chunk[:], self.pool.apply_async(search_chunk, (chunk[:],))))
+            chunk.clear()
+
+        def ready():
+            while rows and rows[0][1] is not None:
+                item, result = rows.popleft()
+                yield (item, *result)
+
+        def merge():
+            zipcodes, pending = chunks.popleft()
+
+            for zipcode, result in zip(zipcodes, pending.get()):
+                for row in waiting.pop(zipcode):
+                    row[1] = result
+
+                recent[zipcode] = result
+
+                if len(recent) > self.dedup_size:
+                    recent.popitem(last=False)
+
+        for item in items:
+            zipcode = normalize(item if key is None else key(item))
+            row = [item, None]
+            rows.append(row)
+
+            if not is_valid(zipcode):
+                row[1] = invalid_result()
+
+            elif zipcode in recent:
+                recent.move_to_end(zipcode)
+                row[1] = recent[zipcode]
+
+            elif zipcode in waiting:
+                waiting[zipcode].append(row)
+
+            else:
+                waiting[zipcode] = [row]
+                chunk.append(zipcode)
+
+                if len(chunk) >= self.chunk_size:
+                    submit()
+
+            # A full window may be held back by the chunk being filled.
+            if len(rows) >= window and chunk and not chunks:
+                submit()
+
+            while chunks and (len(chunks) >= self.max_chunks or len(rows) >= window):
+                merge()
+
+            yield from ready()
+
+        if chunk:
+            submit()
+
+        while chunks:
+            merge()
+            yield from ready()
+
+    def close(self):
+        if self._pool is not None:
+            # Chunks still queued or running are dropped with their workers.
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+        if self._tempdir is not None:
+            shutil.rmtree(self._tempdir, ignore_errors=True)
+            self._tempdir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,5 +1,6 @@
-from os import getenv
 from abc import ABC, abstractmethod
+from functools import partial
+from os import getenv
 from typing import Any
 import requests
 from requests.exceptions import (
@@ -14,19 +15,38 @@ from requests.exceptions import (
     TooManyRedirects
 )
 
-from .exceptions import ZipcodeError, TokenError
+from .consts import CONNECT_TIMEOUT, TIMEOUT
+from .exceptions import TokenError
+from .fastjson import loads
 from .messages import Messages
+from .retry import RetryPolicy, default_retry_policy
+from .sessions import SessionPool, default_pool
+from .validators import validate
 
 
 class AbstractProvider(ABC):
 
+    NAME = ''
     API_URL = ''
+    NOT_FOUND_STATUS_CODES: tuple = (requests.codes.not_found,)
 
-    def __init__(self, zipcode):
-        if zipcode is None or not zipcode:
-            raise ZipcodeError(Messages.ZIPCODE_INVALID.value)
+    # Shared by every provider instance, one keep-alive session per host.
+    pool: SessionPool = default_pool
 
-        self._zipcode = zipcode
+    # Retries of failed calls, ``None`` disables them for the provider.
+    retry_policy: RetryPolicy = default_retry_policy
+
+    # Transport failures worth a new try: dropped connections and timeouts.
+    RETRYABLE_EXCEPTIONS: tuple = (ConnectionError, Timeout)
+    FATAL_EXCEPTIONS: tuple = (ProxyError, SSLError)
+    TIMEOUT_EXCEPTIONS: tuple = (Timeout,)
+
+    # HTTP status and transport exception of the last call.
+    status_code: int = None
+    exception: Exception = None
+
+    def __init__(self, zipcode):
+        self._zipcode = validate(zipcode)
 
     @property
     def zipcode(self):
@@ -36,32 +56,42 @@ class AbstractProvider(ABC):
     def zipcode(self, zipcode: str):
         self._zipcode = zipcode
 
-    def call(self, url: str, headers: dict = {}):
+    def call(self, url: str, headers: dict = {}, timeout=None):
+        '''
+        ``timeout`` is a float or a ``(connect, read)`` tuple in seconds.
+        '''
         error: bool = False
         info: dict = {}
         res: Any = None
+        self.status_code = None
+        self.exception = None
 
         try:
-            res = requests.get(url, headers=headers, timeout=int(getenv('TIMEOUT', default=3)))
+            res = self.pool.get(url).get(url, headers=headers, timeout=timeout or (CONNECT_TIMEOUT, TIMEOUT))
+            self.status_code = res.status_code
 
         except (
             HTTPError, ProxyError, SSLError, Timeout,
             ConnectTimeout, ReadTimeout, TooManyRedirects, ContentDecodingError
         ) as e:
             error = True
+            self.exception = e
             info = {'error': error, 'timeout': True, 'message': e.__str__()}
             return error, info, res
 
         except ConnectionError as e:
             error = True
+            self.exception = e
 
-            message = e.args[0].reason.message if e.args else Messages.NETWORK_ERROR.value
+            reason = getattr(e.args[0], 'reason', None) if e.args else None
+            message = getattr(reason, 'message', None) or str(reason or '') or Messages.NETWORK_ERROR.value
 
             info = {'error': error, 'timeout': False, 'message': message}
             return error, info, res
 
         except Exception as e:
             error = True
+            self.exception = e
             info = {'error': error, 'timeout': False, 'message': e.__str__()}
             return error, info, res
 
@@ -69,6 +99,54 @@ class AbstractProvider(ABC):
             res.close()
             return False, {'error': error, 'timeout': False, 'message': Messages.SUCCESS.value}, res
 
+    @classmethod
+    def arguments(cls, client):
+        '''
+        Constructor arguments, besides the zip code, of the provider for a
+        search of ``client`` (a ``ZipCode``). ``None`` when the provider
+        cannot answer it, e.g. it lacks a token.
+        '''
+        return {}
+
+    def get_headers(self):
+        return {}
+
+    def timed_out(self) -> bool:
+        '''
+        Whether the last call failed on a timeout, ``None`` when it raised nothing.
+        '''
+        if self.exception is None:
+            return None
+
+        return isinstance(self.exception, self.TIMEOUT_EXCEPTIONS)
+
+    def retryable(self) -> bool:
+        '''
+        Whether the last call failed in a way a new try may fix: a dropped
+        connection, a timeout or a 5xx answer other than a not found one.
+        '''
+        if self.exception is not None:
+            return isinstance(self.exception, self.RETRYABLE_EXCEPTIONS) and \
+                not isinstance(self.exception, self.FATAL_EXCEPTIONS)
+
+        return self.status_code is not None and 500 <= self.status_code < 600 and \
+            self.status_code not in self.NOT_FOUND_STATUS_CODES
+
+    def handle(self, status_code: int, payload):
+        '''
+        Turns a provider response into the ``(error, info)`` search result.
+        ``payload`` is a callable returning the decoded json body, so sync and
+        async clients share the same translation.
+        '''
+        if status_code == requests.codes.ok:
+            data = self.translate(payload())
+            return False, {'error': False, 'message': Messages.SUCCESS.value, 'data': data}
+
+        if status_code in self.NOT_FOUND_STATUS_CODES:
+            return True, {'error': True, 'message': Messages.ZIPCODE_NOT_FOUND.value}
+
+        return True, {'error': True, 'message': Messages.STRANGE_ERROR.value}
+
     @abstractmethod
     def search():
         raise NotImplementedError(Messages.NOT_IMPLEMENTED.value)
@@ -80,42 +158,25 @@ class AbstractProvider(ABC):
 
 class Postmon(AbstractProvider):
 
+    NAME: str = 'postmon'
     API_URL: str = 'http://api.postmon.com.br/v1/cep/'
+    NOT_FOUND_STATUS_CODES: tuple = (requests.codes.not_found, requests.codes.not_allowed)
 
     def get_url(self):
         return f'{self.API_URL}{self.zipcode}'
 
-    def search(self):
+    def search(self, timeout=None):
         '''
         This is a method to get address info from an API
         '''
-        error = True
-        info = {'error': error, 'timeout': False, 'message': Messages.STRANGE_ERROR.value}
-
         url = self.get_url()
 
-        error, info, res = self.call(url)
+        error, info, res = self.call(url, timeout=timeout)
 
         if error:
             return error, info
 
-        if res.status_code == requests.codes.ok:
-            data = self.translate(res.json())
-            info = {'error': error, 'message': Messages.SUCCESS.value, 'data': data}
-            return error, info
-
-        elif (
-            res.status_code == requests.codes.not_found
-            or res.status_code == requests.codes.not_allowed
-        ):
-            error = True
-            info = {'error': error, 'message': Messages.ZIPCODE_NOT_FOUND.value}
-            return error, info
-
-        else:
-            error = True
-            info = {'error': error, 'message': Messages.STRANGE_ERROR.value}
-            return error, info
+        return self.handle(res.status_code, partial(loads, res.content))
 
     def translate(self, info: dict):
 
@@ -133,39 +194,22 @@ class Postmon(AbstractProvider):
 
 class Viacep(AbstractProvider):
 
+    NAME: str = 'viacep'
     API_URL: str = 'http://viacep.com.br/ws/{}/json/unicode/'
+    NOT_FOUND_STATUS_CODES: tuple = (requests.codes.not_found, requests.codes.bad)
 
     def get_url(self):
         return self.API_URL.format(self.zipcode)
 
-    def search(self):
-        error = True
-        info = {'error': error, 'message': Messages.STRANGE_ERROR.value}
-
+    def search(self, timeout=None):
         url = self.get_url()
 
-        error, info, res = self.call(url)
+        error, info, res = self.call(url, timeout=timeout)
 
         if error:
             return error, info
 
-        if res.status_code == requests.codes.ok:
-            data = self.translate(res.json())
-            info = {'error': error, 'message': Messages.SUCCESS.value, 'data': data}
-            return error, info
-
-        elif (
-            res.status_code == requests.codes.not_found
-            or res.status_code == requests.codes.bad
-        ):
-            error = True
-            info = {'error': error, 'message': Messages.ZIPCODE_NOT_FOUND.value}
-            return error, info
-
-        else:
-            error = True
-            info = {'error': error, 'message': Messages.STRANGE_ERROR.value}
-            return error, info
+        return self.handle(res.status_code, partial(loads, res.content))
 
     def translate(self, info: dict):
 
@@ -183,7 +227,9 @@ class Viacep(AbstractProvider):
 
 class Cepaberto(AbstractProvider):
 
+    NAME: str = 'cepaberto'
     API_URL = 'http://www.cepaberto.com/api/v3/cep?cep={}'
+    NOT_FOUND_STATUS_CODES: tuple = (requests.codes.not_found, requests.codes.server_error)
 
     def __init__(self, zipcode: str, token: str):
         super().__init__(zipcode)
@@ -193,6 +239,16 @@ class Cepaberto(AbstractProvider):
 
         self._token = token
 
+    @classmethod
+    def arguments(cls, client):
+        # Read from ``CEPABERTO_TOKEN`` on every lookup when the client has none.
+        token = client.cepaberto_token
+
+        if token is None:
+            token = getenv('CEPABERTO_TOKEN', default='')
+
+        return {'token': token} if token else None
+
     @property
     def token(self):
         return self._token
@@ -207,34 +263,15 @@ class Cepaberto(AbstractProvider):
     def get_headers(self):
         return {'Authorization': f'Token token={self.token}'}
 
-    def search(self):
-        error = True
-        info = {'error': error, 'message': Messages.STRANGE_ERROR.value}
-
+    def search(self, timeout=None):
         url = self.get_url()
 
-        error, info, res = self.call(url, self.get_headers())
+        error, info, res = self.call(url, self.get_headers(), timeout)
 
         if error:
             return error, info
 
-        if res.status_code == requests.codes.ok:
-            data = self.translate(res.json())
-            info = {'error': error, 'message': Messages.SUCCESS.value, 'data': data}
-            return error, info
-
-        elif (
-            res.status_code == requests.codes.not_found
-            or res.status_code == requests.codes.server_error
-        ):
-            error = True
-            info = {'error': error, 'message': Messages.ZIPCODE_NOT_FOUND.value}
-            return error, info
-
-        else:
-            error = True
-            info = {'error': error, 'message': Messages.STRANGE_ERROR.value}
-            return error, info
+        return self.handle(res.status_code, partial(loads, res.content))
 
     def translate(self, info: dict):
 
@@ -0,0 +1,148 @@
+from threading import Lock
+from time import monotonic, sleep
+
+from .consts import RATE_BURST, RATE_LIMIT, RATE_LIMIT_MAX_WAIT, RATE_LIMIT_POLICY
+
+
+WAIT = 'wait'
+SKIP = 'skip'
+FAIL = 'fail'
+
+POLICIES = (WAIT, SKIP, FAIL)
+
+
+class RateLimiter:
+    '''
+    Token bucket of one provider: ``rate`` requests per second on average,
+    up to ``burst`` at once. A ``rate`` of 0 disables the limit.
+
+    ``policy`` says what a search does when the bucket is empty: ``wait``
+    up to ``max_wait`` seconds for a token, ``skip`` to the next provider,
+    or ``fail`` the whole search. Waiters reserve their token up front, so
+    they are served in order and sustained traffic stays at ``rate``.
+    '''
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = RATE_LIMIT,
+        burst: float = RATE_BURST,
+        policy: str = RATE_LIMIT_POLICY,
+        max_wait: float = RATE_LIMIT_MAX_WAIT,
+        clock=monotonic
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown rate limit policy: {policy}')
+
+        self.name = name
+        self.rate = rate
+        self.burst = max(1.0, burst or rate)
+        self.policy = policy
+        self.max_wait = max_wait if policy == WAIT else 0.0
+
+        self._clock = clock
+        self._lock = Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float = None) -> float:
+        '''
+        Takes a token and returns how long to wait before using it, or
+        ``None`` (taking nothing) when that would be longer than ``max_wait``.
+        '''
+        if not self.rate:
+            return 0.0
+
+        if max_wait is None:
+            max_wait = self.max_wait
+
+        with self._lock:
+            self._refill()
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+
+            wait = (1 - self._tokens) / self.rate
+
+            if wait > max_wait:
+                return None
+
+            self._tokens -= 1
+            return wait
+
+    def acquire(self, max_wait: float = None) -> bool:
+        wait = self.reserve(max_wait)
+
+        if wait is None:
+            return False
+
+        if wait:
+            sleep(wait)
+
+        return True
+
+    async def acquire_async(self, max_wait: float = None) -> bool:
+        import asyncio
+
+        wait = self.reserve(max_wait)
+
+        if wait is None:
+            return False
+
+        if wait:
+            await asyncio.sleep(wait)
+
+        return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._refill()
+
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'policy': self.policy,
+                'tokens': self._tokens,
+            }
+
+
+class RateLimiterRegistry:
+    '''
+    One ``RateLimiter`` per provider name, created on first use and shared
+    by every thread and task. ``options`` are the defaults of every limiter,
+    ``configure`` overrides them per provider, e.g.
+    ``limiters.configure('viacep', rate=5, burst=10)``.
+    '''
+
+    def __init__(self, **options):
+        self.options = options
+        self._overrides: dict = {}
+        self._limiters: dict = {}
+        self._lock = Lock()
+
+    def configure(self, name: str, **options):
+        with self._lock:
+            self._overrides.setdefault(name, {}).update(options)
+            self._limiters.pop(name, None)
+
+    def get(self, name: str) -> RateLimiter:
+        limiter = self._limiters.get(name)
+
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(name)
+
+                if limiter is None:
+                    options = dict(self.options, **self._overrides.get(name, {}))
+                    limiter = self._limiters[name] = RateLimiter(name, **options)
+
+        return limiter
+
+    def snapshot(self) -> dict:
+        return {name: limiter.snapshot() for name, limiter in list(self._limiters.items())}
@@ -0,0 +1,196 @@
+'''
+Providers by name. The built-in providers and the ones other packages
+declare under the ``hub_cep.providers`` entry point group are imported on
+first use, so a deployment only loads the providers its chain runs:
+
+    # setup.py of an in-house package
+    entry_points={'hub_cep.providers': ['correios = acme.cep:Correios']}
+
+    from hub_cep.registry import default_registry
+
+    default_registry.configure('viacep', API_URL='https://viacep.internal/ws/{}/json/')
+    ZipCode.provider_names = ('correios', 'viacep')
+
+A provider is an ``AbstractProvider`` subclass. Its class is resolved and
+configured once, then every search builds the instances it calls.
+'''
+from importlib import import_module
+from threading import Lock
+
+
+ENTRY_POINT_GROUP = 'hub_cep.providers'
+ASYNC_ENTRY_POINT_GROUP = 'hub_cep.async_providers'
+
+BUILTIN = {
+    'viacep': 'hub_cep.providers:Viacep',
+    'postmon': 'hub_cep.providers:Postmon',
+    'cepaberto': 'hub_cep.providers:Cepaberto',
+}
+
+ASYNC_BUILTIN = {
+    'viacep': 'hub_cep.aio:AsyncViacep',
+    'postmon': 'hub_cep.aio:AsyncPostmon',
+    'cepaberto': 'hub_cep.aio:AsyncCepaberto',
+}
+
+
+def load(target):
+    '''
+    The object ``target`` names, e.g. ``'hub_cep.providers:Viacep'``, or
+    ``target`` itself when it is not a string.
+    '''
+    if not isinstance(target, str):
+        return target
+
+    module, _, attribute = target.partition(':')
+    value = import_module(module)
+
+    for name in attribute.split('.') if attribute else ():
+        value = getattr(value, name)
+
+    return value
+
+
+def entry_points(group: str) -> dict:
+    try:
+        from importlib.metadata import entry_points as find
+    except ImportError:
+        # Python 3.6 and 3.7
+        from importlib_metadata import entry_points as find
+
+    found = find()
+    selected = found.select(group=group) if hasattr(found, 'select') else found.get(group, ())
+
+    return {entry_point.name: entry_point for entry_point in selected}
+
+
+class ProviderRegistry:
+    '''
+    Provider classes by name: registered ones first, then ``builtin``, then
+    the ``group`` entry points. ``configure`` sets class attributes of a
+    provider, e.g. ``API_URL``, ``retry_policy`` or ``pool``, on a subclass
+    built once on first use.
+    '''
+
+    def __init__(self, builtin: dict = None, group: str = ENTRY_POINT_GROUP):
+        self.builtin = dict(builtin or {})
+        self.group = group
+
+        self._targets: dict = {}
+        self._options: dict = {}
+        self._classes: dict = {}
+        self._entry_points: dict = None
+        self._lock = Lock()
+
+    def register(self, name: str, target, **options):
+        '''
+        Adds or replaces provider ``name``, a class or its ``'module:Class'``
+        path, with the ``options`` of ``configure``.
+        '''
+        with self._lock:
+            self._targets[name] = target
+            self._options[name] = dict(options)
+            self._classes.pop(name, None)
+
+    def configure(self, name: str, **options):
+        with self._lock:
+            self._options.setdefault(name, {}).update(options)
+            self._classes.pop(name, None)
+
+    def discovered(self) -> dict:
+        '''
+        Entry points of the ``group``, looked up once.
+        '''
+        if self._entry_points is None:
+            self._entry_points = entry_points(self.group) if self.group else {}
+
+        return self._entry_points
+
+    def target(self, name: str):
+        '''
+        What provider ``name`` is loaded from: a class, its path or an entry point.
+        '''
+        if name in self._targets:
+            return self._targets[name]
+
+        if name in self.builtin:
+            return self.builtin[name]
+
+        entry_point = self.discovered().get(name)
+
+        if entry_point is None:
+            raise ValueError(f'Unknown provider: {name}')
+
+        return entry_point
+
+    def resolve(self, name: str):
+        target = self.target(name)
+        provider = target.load() if hasattr(target, 'load') else load(target)
+        options = self._options.get(name)
+
+        if options:
+            provider = type(provider.__name__, (provider,), dict(options, __module__=provider.__module__))
+
+        return provider
+
+    def get(self, name: str):
+        '''
+        Provider class ``name``, with its options. Raises ``ValueError`` when
+        no provider has that name.
+        '''
+        provider = self._classes.get(name)
+
+        if provider is None:
+            with self._lock:
+                provider = self._classes.get(name)
+
+                if provider is None:
+                    provider = self._classes[name] = self.resolve(name)
+
+        return provider
+
+    def names(self) -> tuple:
+        '''
+        Every known provider name, the built-in ones first. Scans the entry
+        points but imports nothing.
+        '''
+        names = list(self.builtin)
+        names += [name for name in self._targets if name not in names]
+        names += sorted(name for name in self.discovered() if name not in names)
+
+        return tuple(names)
+
+    def state(self) -> dict:
+        '''
+        Registered providers and options, to rebuild this registry in
+        another process with ``restore``. Pickled as they are: classes by
+        reference, so they must be importable there.
+        '''
+        with self._lock:
+            return {
+                'targets': dict(self._targets),
+                'options': {name: dict(options) for name, options in self._options.items()},
+            }
+
+    def restore(self, state: dict):
+        with self._lock:
+            self._targets.update(state['targets'])
+
+            for name, options in state['options'].items():
+                self._options.setdefault(name, {}).update(options)
+
+            self._classes.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            name: {'class': f'{provider.__module__}.{provider.__qualname__}', 'options': self._options.get(name, {})}
+            for name, provider in list(self._classes.items())
+        }
+
+    def __contains__(self, name: str):
+        return name in self._targets or name in self.builtin or name in self.discovered()
+
+
+default_registry = ProviderRegistry(BUILTIN, ENTRY_POINT_GROUP)
+
+default_async_registry = ProviderRegistry(ASYNC_BUILTIN, ASYNC_ENTRY_POINT_GROUP)
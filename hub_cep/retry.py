@@ -0,0 +1,42 @@
+import random
+
+from .consts import RETRY_ATTEMPTS, RETRY_BACKOFF, RETRY_MAX_BACKOFF
+from .messages import Outcome
+
+
+class RetryPolicy:
+    '''
+    How a failed provider call is retried: at most ``attempts`` calls in
+    total, waiting a random time between 0 and ``backoff * multiplier ** n``
+    (capped at ``max_backoff``) before the n-th retry. Only failures the
+    provider reports as retryable are retried, never a not found answer.
+    '''
+
+    def __init__(
+        self,
+        attempts: int = RETRY_ATTEMPTS,
+        backoff: float = RETRY_BACKOFF,
+        max_backoff: float = RETRY_MAX_BACKOFF,
+        multiplier: float = 2.0,
+        rng: random.Random = None
+    ):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.rng = rng or random.Random()
+
+    def delay(self, retry: int) -> float:
+        '''
+        Full jitter backoff before the ``retry``-th retry, starting at 1.
+        '''
+        return self.rng.uniform(0, min(self.max_backoff, self.backoff * self.multiplier ** (retry - 1)))
+
+    def should_retry(self, provider, tries: int, outcome: Outcome) -> bool:
+        if tries >= self.attempts or outcome in (Outcome.SUCCESS, Outcome.NOT_FOUND):
+            return False
+
+        return provider.retryable()
+
+
+default_retry_policy = RetryPolicy()
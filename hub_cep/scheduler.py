@@ -0,0 +1,109 @@
+import random
+from threading import Lock
+
+from .consts import SCHEDULER_ALPHA, SCHEDULER_EXPLORATION, TIMEOUT
+from .messages import Outcome
+
+
+class ProviderStats:
+    '''
+    Exponentially weighted statistics of one provider.
+
+    ``availability`` counts definitive answers (found or not found),
+    ``agreement`` drops when the provider says not found and another one
+    finds the address afterwards.
+    '''
+
+    __slots__ = ('latency', 'availability', 'agreement', 'samples')
+
+    def __init__(self):
+        self.latency = 0.0
+        self.availability = 1.0
+        self.agreement = 1.0
+        self.samples = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'latency': self.latency,
+            'availability': self.availability,
+            'agreement': self.agreement,
+            'samples': self.samples,
+        }
+
+
+class ProviderScheduler:
+    '''
+    Orders the providers tried by ``ZipCode.search`` by the expected time to a
+    definitive answer. A fraction of the searches (``exploration``) picks a
+    random provider first, so the statistics of the others stay fresh.
+    Providers without samples go after the measured ones, in their
+    configured order.
+    '''
+
+    def __init__(
+        self,
+        alpha: float = SCHEDULER_ALPHA,
+        exploration: float = SCHEDULER_EXPLORATION,
+        penalty: float = TIMEOUT,
+        rng: random.Random = None
+    ):
+        self.alpha = alpha
+        self.exploration = exploration
+        self.penalty = penalty
+
+        self._rng = rng or random.Random()
+        self._stats: dict = {}
+        self._lock = Lock()
+
+    def stats_for(self, name: str) -> ProviderStats:
+        stats = self._stats.get(name)
+
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(name, ProviderStats())
+
+        return stats
+
+    def score(self, name: str) -> float:
+        '''
+        Expected cost of trying ``name`` first, lower is better.
+        '''
+        stats = self._stats.get(name)
+
+        if stats is None or not stats.samples:
+            return float('inf')
+
+        reliability = stats.availability * stats.agreement
+        return stats.latency + (1 - reliability) * self.penalty
+
+    def order(self, providers: list) -> list:
+        ranked = sorted(providers, key=lambda provider: self.score(provider.NAME))
+
+        if len(ranked) > 1 and self._rng.random() < self.exploration:
+            ranked.insert(0, ranked.pop(self._rng.randrange(1, len(ranked))))
+
+        return ranked
+
+    def record(self, name: str, outcome: Outcome, duration: float):
+        stats = self.stats_for(name)
+        available = 0.0 if outcome in (Outcome.TIMEOUT, Outcome.NETWORK_ERROR, Outcome.ERROR) else 1.0
+
+        with self._lock:
+            if stats.samples:
+                stats.latency += self.alpha * (duration - stats.latency)
+                stats.availability += self.alpha * (available - stats.availability)
+            else:
+                stats.latency = duration
+                stats.availability = available
+
+            stats.samples += 1
+
+    def record_agreement(self, name: str, agreed: bool):
+        stats = self.stats_for(name)
+
+        with self._lock:
+            stats.agreement += self.alpha * ((1.0 if agreed else 0.0) - stats.agreement)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
@@ -0,0 +1,118 @@
+'''
+AWS Lambda entry point tuned for cold starts.
+
+State lives at module level, so it survives between invocations of a warm
+container: the zip code class with its memory cache and circuit breakers,
+the Cepaberto token and the keep-alive connections of the session pool.
+Importing this module is cheap, the HTTP stack is only loaded by ``init``
+(meant to run during the container init phase) or by the first lookup.
+'''
+from .consts import CACHE_SNAPSHOT, CONNECT_TIMEOUT
+from .deadline import Deadline
+from .messages import Messages
+from .validators import is_valid, normalize
+
+
+def build_cache():
+    '''
+    Memory cache, in front of the snapshot baked into the deployment
+    artifact when ``CACHE_SNAPSHOT`` is set.
+    '''
+    from .cache import MemoryCache, TieredCache
+
+    if not CACHE_SNAPSHOT:
+        return MemoryCache()
+
+    from .snapshot import SnapshotCache
+
+    return TieredCache(MemoryCache(), SnapshotCache(CACHE_SNAPSHOT))
+
+
+class Client:
+    '''
+    Looks up zip codes with state shared by every invocation.
+    '''
+
+    def __init__(self, cache=None, breakers=None, token: str = None):
+        from os import getenv
+
+        from .breaker import BreakerRegistry
+        from .zipcode import ZipCode
+
+        self.zipcode_class = type('ZipCode', (ZipCode,), {
+            'cache': cache if cache is not None else build_cache(),
+            'breakers': breakers if breakers is not None else BreakerRegistry(),
+            'cepaberto_token': token if token is not None else getenv('CEPABERTO_TOKEN', default=''),
+        })
+
+    @property
+    def cache(self):
+        return self.zipcode_class.cache
+
+    @property
+    def provider_classes(self) -> list:
+        zipcode_class = self.zipcode_class
+
+        return [
+            provider for provider in zipcode_class.provider_classes()
+            if provider.arguments(zipcode_class) is not None
+        ]
+
+    def warm(self, timeout: float = CONNECT_TIMEOUT) -> int:
+        '''
+        Opens the provider connections ahead of the first lookup.
+        '''
+        pools: dict = {}
+
+        for provider in self.provider_classes:
+            pools.setdefault(id(provider.pool), (provider.pool, []))[1].append(provider.API_URL)
+
+        return sum(pool.warm(urls, timeout) for pool, urls in pools.values())
+
+    def search(self, zipcode: str, deadline: Deadline = None):
+        return self.zipcode_class(zipcode).search(deadline=deadline)
+
+
+_client: Client = None
+
+
+def get_client() -> Client:
+    global _client
+
+    if _client is None:
+        _client = Client()
+
+    return _client
+
+
+def init(warm: bool = True) -> Client:
+    '''
+    Builds the shared client and, with ``warm``, opens the provider
+    connections. Call it at module level of the Lambda handler file.
+    '''
+    client = get_client()
+
+    if warm:
+        client.warm()
+
+    return client
+
+
+def response(status_code: int, body: dict) -> dict:
+    return {
+        'statusCode': status_code,
+        'body': body
+    }
+
+
+def get_address(event, context):
+    zipcode = normalize(event['path']['cep'])
+
+    # Invalid input is answered without loading the HTTP stack.
+    if not is_valid(zipcode):
+        return response(422, {'error': True, 'message': Messages.ZIPCODE_INVALID.value})
+
+    # Never run past the invocation timeout: the lookup gets what is left of it.
+    deadline = Deadline.from_lambda_context(context) if context else None
+
+    return response(*get_client().search(zipcode, deadline=deadline))
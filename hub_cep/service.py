@@ -0,0 +1,268 @@
+'''
+HTTP lookup service, with no web framework required:
+
+    GET  /cep/{cep}    status and body of ``ZipCode.search`` (200 or 422)
+    POST /cep/batch    ``{"ceps": [...]}``, looked up concurrently
+
+``app`` is the WSGI application and ``asgi_app`` the ASGI one, e.g.
+``gunicorn hub_cep.service:app`` or ``uvicorn hub_cep.service:asgi_app``.
+Each worker process keeps one cache and one connection pool shared by all
+its requests. ``python -m hub_cep.service`` serves it for development.
+'''
+import sys
+from http import HTTPStatus
+
+from .cache import AbstractCache, from_url
+from .consts import SERVICE_BATCH_LIMIT, SERVICE_CACHE, SERVICE_CONCURRENCY
+from .exceptions import ZipcodeError
+from .fastjson import dumps, loads
+from .messages import Messages
+from .singleflight import SingleFlight
+from .validators import is_valid, normalize
+from .zipcode import ZipCode, invalid_result
+
+
+HEADERS = [('Content-Type', 'application/json; charset=utf-8')]
+
+# Largest request body accepted, about 64 bytes per zip code of a full batch.
+MAX_BODY_PER_ZIPCODE = 64
+
+
+def error(status_code: int, message: Messages):
+    return status_code, {'error': True, 'message': message.value}
+
+
+class Service:
+    '''
+    Routes requests to a ``ZipCode`` class bound to the service cache.
+    ``handle`` is shared by the WSGI and ASGI entry points.
+    '''
+
+    def __init__(
+        self,
+        cache: AbstractCache = None,
+        batch_limit: int = SERVICE_BATCH_LIMIT,
+        concurrency: int = SERVICE_CONCURRENCY,
+        deadline: float = None,
+        **options
+    ):
+        if cache is None:
+            cache = from_url(SERVICE_CACHE)
+
+        self.batch_limit = batch_limit
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self.options = options
+
+        self.zipcode_class = type('ZipCode', (ZipCode,), {'cache': cache, 'flights': SingleFlight()})
+
+    @property
+    def cache(self) -> AbstractCache:
+        return self.zipcode_class.cache
+
+    @property
+    def max_body(self) -> int:
+        return self.batch_limit * MAX_BODY_PER_ZIPCODE + 1024
+
+    def handle(self, method: str, path: str, body: bytes = b''):
+        '''
+        Returns the ``(status_code, payload)`` of a request.
+        '''
+        segments = path.strip('/').split('/')
+
+        if len(segments) != 2 or segments[0] != 'cep' or not segments[1]:
+            return error(404, Messages.ROUTE_NOT_FOUND)
+
+        if segments[1] == 'batch':
+            if method != 'POST':
+                return error(405, Messages.METHOD_NOT_ALLOWED)
+
+            return self.batch(body)
+
+        if method not in ('GET', 'HEAD'):
+            return error(405, Messages.METHOD_NOT_ALLOWED)
+
+        return self.lookup(segments[1])
+
+    def lookup(self, zipcode: str):
+        try:
+            return self.zipcode_class(zipcode, **self.options).search(deadline=self.deadline)
+        except ZipcodeError:
+            return invalid_result()
+
+    def batch(self, body: bytes):
+        '''
+        Answers ``{"results": [{"cep", "status", "body"}, ...]}`` in request
+        order. Each result has the status of its own lookup, the response is
+        200 whenever the request itself is valid.
+        '''
+        if len(body) > self.max_body:
+            return error(413, Messages.BATCH_TOO_LARGE)
+
+        try:
+            payload = loads(body)
+        except ValueError:
+            return error(400, Messages.INVALID_REQUEST)
+
+        zipcodes = payload.get('ceps') if isinstance(payload, dict) else payload
+
+        if not isinstance(zipcodes, list):
+            return error(400, Messages.INVALID_REQUEST)
+
+        if any(type(value) not in (str, int) for value in zipcodes):
+            return error(400, Messages.INVALID_REQUEST)
+
+        if len(zipcodes) > self.batch_limit:
+            return error(413, Messages.BATCH_TOO_LARGE)
+
+        found = {
+            key: (status_code, result)
+            for key, status_code, result in self.zipcode_class.search_many(
+                zipcodes, concurrency=self.concurrency, **self.options
+            )
+        }
+        results = []
+
+        for value in zipcodes:
+            zipcode = normalize(value)
+            status_code, result = found[zipcode if is_valid(zipcode) else value]
+            results.append({'cep': value, 'status': status_code, 'body': result})
+
+        return 200, {'results': results}
+
+    def __call__(self, environ, start_response):
+        '''
+        WSGI entry point.
+        '''
+        method = environ['REQUEST_METHOD']
+        body = b''
+
+        if method == 'POST':
+            try:
+                length = int(environ.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                length = 0
+
+            # Never read more than a full batch, larger bodies are refused.
+            body = environ['wsgi.input'].read(min(length, self.max_body + 1))
+
+        status_code, payload = self.handle(method, environ.get('PATH_INFO', ''), body)
+        data = dumps(payload).encode('utf-8')
+
+        start_response(
+            f'{status_code} {HTTPStatus(status_code).phrase}',
+            HEADERS + [('Content-Length', str(len(data)))]
+        )
+
+        return [b''] if method == 'HEAD' else [data]
+
+
+class AsgiService:
+    '''
+    ASGI entry point. Lookups are blocking, they run in the event loop's
+    default thread pool.
+    '''
+
+    def __init__(self, service: Service):
+        self.service = service
+
+    async def read_body(self, receive):
+        '''
+        Request body, ``None`` when it is larger than a full batch.
+        '''
+        chunks = []
+        size = 0
+
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+
+            if size <= self.service.max_body:
+                chunks.append(chunk)
+
+            if not message.get('more_body', False):
+                break
+
+        return b''.join(chunks) if size <= self.service.max_body else None
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        import asyncio
+
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        if scope['type'] != 'http':
+            return
+
+        method = scope['method']
+        body = await self.read_body(receive) if method == 'POST' else b''
+
+        if body is None:
+            status_code, payload = error(413, Messages.BATCH_TOO_LARGE)
+        else:
+            loop = asyncio.get_event_loop()
+            status_code, payload = await loop.run_in_executor(None, self.service.handle, method, scope['path'], body)
+
+        data = dumps(payload).encode('utf-8')
+
+        headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in HEADERS]
+        headers.append((b'content-length', str(len(data)).encode('latin-1')))
+
+        await send({'type': 'http.response.start', 'status': status_code, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if method == 'HEAD' else data})
+
+
+app = Service()
+asgi_app = AsgiService(app)
+
+
+def serve(service: Service = app, host: str = '127.0.0.1', port: int = 8000):
+    '''
+    Threaded development server.
+    '''
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+    class Server(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+
+    class Handler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    return make_server(host, port, service, server_class=Server, handler_class=Handler)
+
+
+def main(argv: list = None):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(prog='python -m hub_cep.service', description='Runs the HTTP lookup service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    httpd = serve(app, args.host, args.port)
+    print(f'Serving on http://{args.host}:{httpd.server_port}', flush=True)
+
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
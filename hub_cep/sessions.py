@@ -0,0 +1,126 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+from threading import Lock
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .consts import CONNECT_TIMEOUT, POOL_BLOCK, POOL_CONNECTIONS, POOL_MAX_RETRIES, POOL_MAXSIZE
+
+
+class SessionPool:
+    '''
+    Keeps one keep-alive ``requests.Session`` per provider host, so repeated
+    lookups reuse open TCP/TLS connections instead of handshaking every time.
+    Sessions are created lazily and shared across provider instances and threads.
+    '''
+
+    # Settings ``configure`` may change.
+    OPTIONS: tuple = ('pool_connections', 'pool_maxsize', 'pool_block', 'max_retries', 'headers')
+
+    def __init__(
+        self,
+        pool_connections: int = POOL_CONNECTIONS,
+        pool_maxsize: int = POOL_MAXSIZE,
+        pool_block: bool = POOL_BLOCK,
+        headers: dict = None,
+        max_retries: int = POOL_MAX_RETRIES
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.max_retries = max_retries
+        self.headers = headers or {}
+
+        self._sessions: dict = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def host(url: str) -> str:
+        parts = urlsplit(url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+    def build_adapter(self) -> HTTPAdapter:
+        return HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=self.max_retries
+        )
+
+    def build_session(self) -> requests.Session:
+        session = requests.Session()
+        # Lookups are stateless, never share cookies between callers.
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.headers.update({'Connection': 'keep-alive'})
+        session.headers.update(self.headers)
+
+        adapter = self.build_adapter()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+    def get(self, url: str) -> requests.Session:
+        key = self.host(url)
+        session = self._sessions.get(key)
+
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+
+                if session is None:
+                    session = self.build_session()
+                    self._sessions[key] = session
+
+        return session
+
+    def warm(self, urls, timeout: float = CONNECT_TIMEOUT) -> int:
+        '''
+        Opens a keep-alive connection to the host of each url ahead of the
+        first lookup, e.g. while a serverless container initializes. Hosts
+        are contacted in parallel and failures are ignored. Returns how many
+        hosts answered.
+        '''
+        hosts = {self.host(url) for url in urls}
+
+        def touch(host):
+            try:
+                self.get(host).head(host, timeout=timeout, allow_redirects=False).close()
+            except requests.RequestException:
+                return False
+
+            return True
+
+        if not hosts:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=len(hosts), thread_name_prefix='hub-cep-warm') as executor:
+            return sum(executor.map(touch, hosts))
+
+    def configure(self, **options):
+        '''
+        Changes the pool settings. Open sessions are closed and rebuilt on demand.
+        '''
+        for name in options:
+            if name not in self.OPTIONS:
+                raise AttributeError(f'Unknown pool option: {name}')
+
+        for name, value in options.items():
+            setattr(self, name, value)
+
+        self.close()
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+
+        for session in sessions.values():
+            session.close()
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+default_pool = SessionPool()
@@ -0,0 +1,108 @@
+from threading import Event, Lock
+
+
+class _Call:
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    '''
+    Coalesces concurrent calls with the same key: while one call is in
+    flight, other threads asking for the same key wait for it and share its
+    result instead of running the function again. A waiting thread gives up
+    with ``TimeoutError`` after ``timeout`` seconds, the call goes on.
+    '''
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+
+        self._calls: dict = {}
+        self._lock = Lock()
+
+    def do(self, key, function, *args, timeout: float = None, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            if not call.event.wait(timeout):
+                raise TimeoutError(f'Gave up waiting for the call in flight for {key!r}')
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+
+        except BaseException as e:
+            call.error = e
+            raise
+
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.event.set()
+
+    def in_flight(self, key) -> bool:
+        return key in self._calls
+
+    def stats(self) -> dict:
+        return {'in_flight': len(self._calls), 'calls': self.calls, 'shared': self.shared}
+
+
+class AsyncSingleFlight:
+    '''
+    ``SingleFlight`` for coroutines: tasks awaiting the same key share one
+    execution. Cancelling a waiting task, or its ``timeout`` running out,
+    does not cancel the shared call.
+    '''
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+
+        self._calls: dict = {}
+
+    async def do(self, key, function, *args, timeout: float = None, **kwargs):
+        # Imported here so sync callers never pay for loading asyncio.
+        import asyncio
+
+        flight = (asyncio.get_event_loop(), key)
+        future = self._calls.get(flight)
+
+        if future is not None:
+            self.shared += 1
+
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f'Gave up waiting for the call in flight for {key!r}') from None
+
+        future = self._calls[flight] = asyncio.ensure_future(function(*args, **kwargs))
+        future.add_done_callback(lambda _: self._calls.pop(flight, None))
+        self.calls += 1
+
+        return await asyncio.shield(future)
+
+    def in_flight(self, key) -> bool:
+        return any(flight_key == key for _, flight_key in self._calls)
+
+    def stats(self) -> dict:
+        return {'in_flight': len(self._calls), 'calls': self.calls, 'shared': self.shared}
@@ -0,0 +1,298 @@
+'''
+Cache snapshots, to start new processes with a warm cache. The entries of
+a cache (found addresses and not found answers, with the time they were
+stored) are exported once into a compact binary file:
+
+    header   magic, version, record count, string count, creation time
+    records  fixed width rows sorted by zip code: cep, stored_at, status
+             code, zip_code, address, district, city, state
+    offsets  string table offsets
+    strings  deduplicated utf-8 strings
+
+``SnapshotCache`` reads the file through ``mmap``, opening it costs the same
+for a thousand or a million entries, and lookups binary search the records
+(see ``hub_cep.table``).
+Put it behind a writable cache, e.g. ``from_url('?snapshot=ceps.snap')``, and
+the entries found in it are copied there as they are used. Snapshots may
+also be written as JSONL, to read or edit them, and loaded into any cache:
+
+    python -m hub_cep.snapshot export ceps.sqlite ceps.snap
+    python -m hub_cep.snapshot load ceps.snap redis://cache.internal:6379/0
+'''
+import json
+import os
+import struct
+import sys
+from time import time
+
+from .address import Address
+from .cache import AbstractCache, from_url, is_cacheable
+from .consts import CACHE_NEGATIVE_TTL, CACHE_STALE_TTL, CACHE_TTL
+from .messages import Messages
+from .table import NULL, SortedTable, write_table
+
+
+MAGIC = b'HCSN'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHHIId')
+RECORD = struct.Struct('<IdH5I')
+
+FORMATS = ('binary', 'jsonl')
+
+
+def not_found() -> dict:
+    return {'error': True, 'message': Messages.ZIPCODE_NOT_FOUND.value}
+
+
+def write_snapshot(entries, path: str) -> int:
+    '''
+    Writes ``entries``, ``(key, stored_at, status_code, body)`` tuples as
+    ``AbstractCache.items`` gives them, to the binary snapshot at ``path``.
+    Entries the format cannot hold exactly are left out: keys that are not
+    zip codes, found bodies with extra fields and transient errors. Returns
+    the number of entries written.
+    '''
+    strings: dict = {}
+    records: dict = {}
+
+    def intern(value):
+        if value is None:
+            return NULL
+
+        index = strings.get(value)
+
+        if index is None:
+            index = strings[value] = len(strings)
+
+        return index
+
+    for key, stored_at, status_code, body in entries:
+        if not (len(key) == 8 and key.isdigit()):
+            continue
+
+        if status_code == 200:
+            address = body if type(body) is Address else Address.from_body(body)
+
+            if address is None:
+                continue
+
+            fields = tuple(intern(value) for value in address)
+
+        elif is_cacheable(status_code, body):
+            fields = (NULL,) * len(Address._fields)
+
+        else:
+            continue
+
+        zipcode = int(key)
+        previous = records.get(zipcode)
+
+        if previous is None or previous[0] <= stored_at:
+            records[zipcode] = (stored_at, status_code, fields)
+
+    rows = (
+        RECORD.pack(zipcode, stored_at, status_code, *fields)
+        for zipcode, (stored_at, status_code, fields) in sorted(records.items())
+    )
+    write_table(path, HEADER.pack(MAGIC, VERSION, 0, len(records), len(strings), time()), rows, strings)
+
+    return len(records)
+
+
+def write_jsonl(entries, path: str) -> int:
+    count = 0
+    temporary = f'{path}.tmp'
+
+    with open(temporary, 'w', encoding='utf-8') as f:
+        for key, stored_at, status_code, body in entries:
+            if type(body) is Address:
+                body = body.to_body()
+
+            record = {'key': key, 'stored_at': stored_at, 'status_code': status_code, 'body': body}
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+            count += 1
+
+    os.replace(temporary, path)
+    return count
+
+
+def export_snapshot(cache: AbstractCache, path: str, format: str = 'binary') -> int:
+    '''
+    Writes the entries of ``cache`` not expired yet to ``path``. Returns the
+    number of entries written.
+    '''
+    if format not in FORMATS:
+        raise ValueError(f'Unknown snapshot format: {format}')
+
+    writer = write_snapshot if format == 'binary' else write_jsonl
+    return writer(cache.items(), path)
+
+
+def read_snapshot(path: str):
+    '''
+    Yields the ``(key, stored_at, status_code, body)`` entries of a binary
+    or JSONL snapshot, expired or not.
+    '''
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+
+    if magic == MAGIC:
+        snapshot = SnapshotCache(path)
+
+        try:
+            yield from snapshot.entries()
+        finally:
+            snapshot.close()
+
+        return
+
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record['key'], record['stored_at'], record['status_code'], record['body']
+
+
+def load_snapshot(cache: AbstractCache, path: str) -> int:
+    '''
+    Stores the entries of the snapshot at ``path`` that ``cache`` would not
+    consider expired, with their original age. Returns how many.
+    '''
+    now = time()
+    count = 0
+
+    for key, stored_at, status_code, body in read_snapshot(path):
+        if not cache.is_expired(stored_at, status_code, now):
+            cache.set(key, status_code, body, stored_at)
+            count += 1
+
+    if hasattr(cache, 'flush'):
+        cache.flush()
+
+    return count
+
+
+class SnapshotCache(SortedTable, AbstractCache):
+    '''
+    Read-only cache answering from a binary snapshot mapped in memory.
+    Writes are ignored, put it behind a writable cache with
+    ``TieredCache(MemoryCache(), SnapshotCache(path))``.
+    '''
+
+    MAGIC = MAGIC
+    VERSION = VERSION
+    HEADER = HEADER
+    RECORD = RECORD
+    KIND = 'cache snapshot'
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = CACHE_TTL,
+        negative_ttl: float = CACHE_NEGATIVE_TTL,
+        stale_ttl: float = CACHE_STALE_TTL
+    ):
+        super().__init__(ttl, negative_ttl, stale_ttl)
+        self.path = path
+
+        self.hits = 0
+        self.misses = 0
+
+        self.created_at = self.open(path)[5]
+
+    def record(self, position: int):
+        '''
+        The ``(key, stored_at, status_code, body)`` entry at ``position``.
+        '''
+        zipcode, stored_at, status_code, *fields = self.row(position)
+
+        if status_code == 200:
+            body = Address(*(self.string(index) for index in fields)).to_body()
+        else:
+            body = not_found()
+
+        return f'{zipcode:08d}', stored_at, status_code, body
+
+    def entries(self):
+        for position in range(self.count):
+            yield self.record(position)
+
+    def get(self, key: str):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[1:]
+
+    def get_entry(self, key: str):
+        position = self.find(int(key)) if len(key) == 8 and key.isdigit() else -1
+
+        if position >= 0:
+            _, stored_at, status_code, body = self.record(position)
+
+            if not self.is_expired(stored_at, status_code):
+                self.hits += 1
+                return stored_at, status_code, body
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, status_code: int, body: dict, stored_at: float = None):
+        pass
+
+    def set_many(self, entries: dict, stored_at: float = None):
+        pass
+
+    def items(self):
+        now = time()
+
+        for entry in self.entries():
+            if not self.is_expired(entry[1], entry[2], now):
+                yield entry
+
+    def stats(self) -> dict:
+        return {'size': self.count, 'hits': self.hits, 'misses': self.misses}
+
+
+def main(argv: list = None):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(prog='python -m hub_cep.snapshot', description='Cache snapshots for warm starts.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    export = commands.add_parser('export', help='write the entries of a cache to a snapshot')
+    export.add_argument('cache', help='SQLite cache file or redis:// url')
+    export.add_argument('path', help='snapshot file to write')
+    export.add_argument('--format', choices=FORMATS, default='binary')
+
+    load = commands.add_parser('load', help='store the entries of a snapshot in a cache')
+    load.add_argument('path', help='binary or JSONL snapshot')
+    load.add_argument('cache', help='SQLite cache file or redis:// url')
+
+    info = commands.add_parser('info', help='show the size and age of a binary snapshot')
+    info.add_argument('path')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        snapshot = SnapshotCache(args.path)
+        print(json.dumps({'version': VERSION, 'size': len(snapshot), 'created_at': snapshot.created_at}))
+        snapshot.close()
+        return 0
+
+    cache = from_url(args.cache)
+
+    try:
+        if args.command == 'export':
+            print(f'{export_snapshot(cache, args.path, args.format)} entries written to {args.path}.')
+        else:
+            print(f'{load_snapshot(cache, args.path)} entries loaded from {args.path}.')
+    finally:
+        if hasattr(cache, 'close'):
+            cache.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+'''
+Sorted tables of fixed width records mapped in memory, the file layout of
+the offline index and of cache snapshots:
+
+    header   magic, version, padding, record count, string count, ...
+    records  fixed width rows sorted by their first field, a uint32 key
+    offsets  string table offsets
+    strings  deduplicated utf-8 strings
+
+Records refer to strings by their index in the string table.
+'''
+import mmap
+import os
+import struct
+
+
+UINT = struct.Struct('<I')
+SPAN = struct.Struct('<II')
+
+# String index of a ``None`` field.
+NULL = 0xFFFFFFFF
+
+
+def write_table(path: str, header: bytes, rows, strings) -> None:
+    '''
+    Writes ``header``, the packed ``rows`` already sorted by key and the
+    ``strings`` in index order to ``path``. Written aside and renamed, so
+    readers never map a partial file.
+    '''
+    blob = bytearray()
+    offsets = []
+
+    for value in strings:
+        offsets.append(len(blob))
+        blob.extend(value.encode('utf-8'))
+
+    offsets.append(len(blob))
+    temporary = f'{path}.tmp'
+
+    with open(temporary, 'wb') as f:
+        f.write(header)
+
+        for row in rows:
+            f.write(row)
+
+        for offset in offsets:
+            f.write(UINT.pack(offset))
+
+        f.write(blob)
+
+    os.replace(temporary, path)
+
+
+class SortedTable:
+    '''
+    Reads a table written by ``write_table``: ``HEADER`` and ``RECORD`` are
+    the structs of the file, whose header starts with the ``MAGIC``,
+    ``VERSION``, padding, record count and string count fields.
+    '''
+
+    MAGIC: bytes = b''
+    VERSION: int = 0
+    HEADER: struct.Struct = None
+    RECORD: struct.Struct = None
+
+    # What the file is, for errors.
+    KIND: str = 'table'
+
+    def open(self, path: str) -> tuple:
+        '''
+        Maps the table at ``path``, returns its header fields. Raises
+        ``ValueError`` when the file is not such a table or is truncated.
+        '''
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        size = len(self._mm)
+
+        if size < self.HEADER.size:
+            self.reject(f'{path} is not a hub-cep {self.KIND}')
+
+        header = self.HEADER.unpack_from(self._mm, 0)
+        magic, version, _, self.count, self.string_count = header[:5]
+
+        if magic != self.MAGIC or version != self.VERSION:
+            self.reject(f'{path} is not a hub-cep {self.KIND}')
+
+        self._records = self.HEADER.size
+        self._offsets = self._records + self.count * self.RECORD.size
+        self._strings = self._offsets + (self.string_count + 1) * UINT.size
+
+        # The last offset is where the strings end.
+        if size < self._strings or size < self._strings + UINT.unpack_from(self._mm, self._strings - UINT.size)[0]:
+            self.reject(f'{path} is a truncated hub-cep {self.KIND}')
+
+        return header
+
+    def reject(self, message: str):
+        self.close()
+        raise ValueError(message)
+
+    def string(self, index: int) -> str:
+        if index == NULL:
+            return None
+
+        start, end = SPAN.unpack_from(self._mm, self._offsets + index * UINT.size)
+        return self._mm[self._strings + start:self._strings + end].decode('utf-8')
+
+    def find(self, key: int) -> int:
+        '''
+        Position of ``key`` in the records or -1.
+        '''
+        unpack, mm, base, size = UINT.unpack_from, self._mm, self._records, self.RECORD.size
+        low, high = 0, self.count - 1
+
+        while low <= high:
+            middle = (low + high) // 2
+            value = unpack(mm, base + middle * size)[0]
+
+            if value < key:
+                low = middle + 1
+            elif value > key:
+                high = middle - 1
+            else:
+                return middle
+
+        return -1
+
+    def row(self, position: int) -> tuple:
+        return self.RECORD.unpack_from(self._mm, self._records + position * self.RECORD.size)
+
+    def close(self):
+        self._mm.close()
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,94 @@
+import re
+from bisect import bisect_right
+
+from .exceptions import ZipcodeError
+from .messages import Messages
+
+
+# Zip code ranges assigned to each state by Correios, sorted by start.
+RANGES = (
+    (1000000, 19999999, 'SP'),
+    (20000000, 28999999, 'RJ'),
+    (29000000, 29999999, 'ES'),
+    (30000000, 39999999, 'MG'),
+    (40000000, 48999999, 'BA'),
+    (49000000, 49999999, 'SE'),
+    (50000000, 56999999, 'PE'),
+    (57000000, 57999999, 'AL'),
+    (58000000, 58999999, 'PB'),
+    (59000000, 59999999, 'RN'),
+    (60000000, 63999999, 'CE'),
+    (64000000, 64999999, 'PI'),
+    (65000000, 65999999, 'MA'),
+    (66000000, 68899999, 'PA'),
+    (68900000, 68999999, 'AP'),
+    (69000000, 69299999, 'AM'),
+    (69300000, 69399999, 'RR'),
+    (69400000, 69899999, 'AM'),
+    (69900000, 69999999, 'AC'),
+    (70000000, 72799999, 'DF'),
+    (72800000, 72999999, 'GO'),
+    (73000000, 73699999, 'DF'),
+    (73700000, 76799999, 'GO'),
+    (76800000, 76999999, 'RO'),
+    (77000000, 77999999, 'TO'),
+    (78000000, 78899999, 'MT'),
+    (79000000, 79999999, 'MS'),
+    (80000000, 87999999, 'PR'),
+    (88000000, 89999999, 'SC'),
+    (90000000, 99999999, 'RS'),
+)
+
+_STARTS = [start for start, _, _ in RANGES]
+_FORMATTING = str.maketrans('', '', ' -.\t')
+_DIGITS = re.compile(r'[0-9]{1,8}')
+
+
+def normalize(zipcode) -> str:
+    '''
+    Canonical form of a zip code: 8 digits without formatting, zero padded
+    when the leading zero was lost (e.g. ``1310100``). Returns an empty string
+    when the value can not be a zip code.
+    '''
+    if zipcode is None:
+        return ''
+
+    zipcode = str(zipcode).translate(_FORMATTING)
+
+    if not _DIGITS.fullmatch(zipcode):
+        return ''
+
+    return zipcode.zfill(8)
+
+
+def state(zipcode: str) -> str:
+    '''
+    State (UF) owning a normalized zip code, or an empty string when the
+    zip code is outside every known range.
+    '''
+    if not zipcode:
+        return ''
+
+    value = int(zipcode)
+    position = bisect_right(_STARTS, value) - 1
+
+    if position < 0 or value > RANGES[position][1]:
+        return ''
+
+    return RANGES[position][2]
+
+
+def is_valid(zipcode) -> bool:
+    return bool(state(normalize(zipcode)))
+
+
+def validate(zipcode) -> str:
+    '''
+    Returns the normalized zip code or raises ``ZipcodeError``.
+    '''
+    normalized = normalize(zipcode)
+
+    if not state(normalized):
+        raise ZipcodeError(Messages.ZIPCODE_INVALID.value)
+
+    return normalized
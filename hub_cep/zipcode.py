@@ -1,19 +1,122 @@
-
-from os import getenv
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from copy import copy
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from threading import Lock
+from time import monotonic, sleep
+from typing import TYPE_CHECKING
+
+from .address import Address
+from .breaker import BreakerRegistry
+from .cache import AbstractCache, Revalidator, default_revalidator, is_cacheable, replaces_stale
+from .consts import (
+    BULK_CONCURRENCY,
+    BULK_DEDUP_SIZE,
+    BULK_WORKERS,
+    CACHE_BATCH_SIZE,
+    HEDGE_DELAY,
+    MIN_ATTEMPT_TIMEOUT,
+    PROVIDERS,
+    SEARCH_STRATEGY,
+    SEARCH_WORKERS
+)
+from .deadline import Deadline
+from .exceptions import RateLimitError, ZipcodeError
+from .instrumentation import CACHE, NETWORK, OFFLINE, SHARED, STALE, AttemptEvent, SearchEvent, host, instruments
+from .messages import Messages, Outcome, classify
+from .ratelimit import FAIL, RateLimiterRegistry
+from .registry import ProviderRegistry, default_registry
+from .scheduler import ProviderScheduler
+from .singleflight import SingleFlight
+from .validators import is_valid, normalize, validate
+
+if TYPE_CHECKING:
+    from .offline import OfflineIndex
+
+
+SEQUENTIAL = 'sequential'
+RACE = 'race'
+HEDGE = 'hedge'
+
+STRATEGIES = (SEQUENTIAL, RACE, HEDGE)
+
+_executor = None
+_bulk_executor = None
+_executor_lock = Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    '''
+    Shared worker threads used by the concurrent search strategies.
+    '''
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix='hub-cep')
+
+    return _executor
+
+
+def get_bulk_executor() -> ThreadPoolExecutor:
+    '''
+    Shared worker threads of ``ZipCode.search_many``. Its lookups wait on
+    the search executor, so they never run in it.
+    '''
+    global _bulk_executor
+
+    if _bulk_executor is None:
+        with _executor_lock:
+            if _bulk_executor is None:
+                _bulk_executor = ThreadPoolExecutor(max_workers=BULK_WORKERS, thread_name_prefix='hub-cep-bulk')
+
+    return _bulk_executor
+
+
+# Answers of calls that never reached the provider.
+SKIPPED = (
+    Messages.DEADLINE_EXCEEDED.value,
+    Messages.PROVIDER_UNAVAILABLE.value,
+    Messages.RATE_LIMITED.value,
+)
+
+
+def invalid_result():
+    return 422, {'error': True, 'message': Messages.ZIPCODE_INVALID.value}
+
+
+def deadline_exceeded():
+    return 422, {'error': True, 'timeout': True, 'message': Messages.DEADLINE_EXCEEDED.value}
+
+
+class Deduplicator:
+    '''
+    Remembers the last ``maxsize`` keys, so memory stays bounded no matter
+    how large the input is.
+    '''
+
+    def __init__(self, maxsize: int = BULK_DEDUP_SIZE):
+        self.maxsize = maxsize
+        self._seen: OrderedDict = OrderedDict()
 
-from .exceptions import ZipcodeError
-from .messages import Messages
-from .providers import Viacep, Postmon, Cepaberto
+    def seen(self, key: str) -> bool:
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            return True
+
+        self._seen[key] = None
+
+        if len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+
+        return False
 
 
 class AbstractZipCode(ABC):
 
     def __init__(self, zipcode: str):
-        if zipcode is None or not zipcode:
-            raise ZipcodeError(Messages.ZIPCODE_INVALID.value)
-
-        self._zipcode = zipcode
+        self._zipcode = validate(zipcode)
 
     @property
     def zipcode(self):
@@ -30,34 +133,646 @@ class AbstractZipCode(ABC):
 
 class ZipCode(AbstractZipCode):
 
-    def __init__(self, zipcode: str):
+    # Provider classes by name, see ``hub_cep.registry``.
+    registry: ProviderRegistry = default_registry
+
+    # Cepaberto token, read from ``CEPABERTO_TOKEN`` on every lookup when unset.
+    cepaberto_token: str = None
+
+    # Shared result cache, e.g. ``ZipCode.cache = MemoryCache()``.
+    cache: AbstractCache = None
+
+    # Refreshes cache entries past their soft ttl in the background, see ``AbstractCache``.
+    revalidator: Revalidator = default_revalidator
+
+    # Local dataset consulted before the network, see ``hub_cep.offline``.
+    offline: 'OfflineIndex' = None
+
+    # Adaptive provider ordering, e.g. ``ZipCode.scheduler = ProviderScheduler()``.
+    scheduler: ProviderScheduler = None
+
+    # Circuit breakers per provider, e.g. ``ZipCode.breakers = BreakerRegistry()``.
+    breakers: BreakerRegistry = None
+
+    # Client side rate limits per provider, e.g. ``ZipCode.limiters = RateLimiterRegistry(rate=5)``.
+    limiters: RateLimiterRegistry = None
+
+    # Coalesces concurrent lookups of the same zip code, e.g. ``ZipCode.flights = SingleFlight()``.
+    flights: SingleFlight = None
+
+    # Names of the providers to use, in order, e.g. ``('postmon', 'viacep')``. ``PROVIDERS`` when unset.
+    provider_names: tuple = None
+
+    # Return found addresses as ``Address`` tuples instead of body dicts.
+    compact: bool = False
+
+    deadline: Deadline = None
+
+    # Where the last answer came from and which provider found it, see ``hub_cep.instrumentation``.
+    source: str = None
+    winner: str = None
+    # Set once a concurrent search has its answer.
+    settled: bool = False
+    # Set when the cached answer is past its soft ttl and being refreshed.
+    stale: bool = False
+
+    def __init__(
+        self,
+        zipcode: str,
+        strategy: str = SEARCH_STRATEGY,
+        hedge_delay: float = HEDGE_DELAY,
+        cache: AbstractCache = None,
+        offline: 'OfflineIndex' = None,
+        scheduler: ProviderScheduler = None,
+        breakers: BreakerRegistry = None,
+        compact: bool = None,
+        limiters: RateLimiterRegistry = None
+    ):
         super().__init__(zipcode)
 
-        self.viacep = Viacep(zipcode)
-        self.postmon = Postmon(zipcode)
-        self.cepaberto = None
+        if limiters is not None:
+            self.limiters = limiters
+
+        if compact is not None:
+            self.compact = compact
+
+        if breakers is not None:
+            self.breakers = breakers
+
+        if scheduler is not None:
+            self.scheduler = scheduler
+
+        if cache is not None:
+            self.cache = cache
+
+        if offline is not None:
+            self.offline = offline
+
+        if strategy not in STRATEGIES:
+            raise ValueError(f'Unknown search strategy: {strategy}')
+
+        self.strategy = strategy
+        self.hedge_delay = hedge_delay
+        self.attempted: list = []
+        # Built on first use, answers from the cache build none.
+        self._providers: dict = {}
+
+    @classmethod
+    def provider_classes(cls) -> list:
+        '''
+        Classes of the providers in use, including the ones that cannot
+        answer, e.g. Cepaberto without a token.
+        '''
+        names = PROVIDERS if cls.provider_names is None else cls.provider_names
+        return [cls.registry.get(name) for name in names]
+
+    def provider(self, name: str):
+        '''
+        Provider ``name`` for this search or ``None`` when it cannot answer.
+        '''
+        if name not in self._providers:
+            provider_class = self.registry.get(name)
+            arguments = provider_class.arguments(self)
+            self._providers[name] = None if arguments is None else provider_class(self.zipcode, **arguments)
+
+        return self._providers[name]
+
+    @property
+    def viacep(self):
+        return self.provider('viacep')
+
+    @property
+    def postmon(self):
+        return self.provider('postmon')
+
+    @property
+    def cepaberto(self):
+        return self.provider('cepaberto')
+
+    @property
+    def providers(self) -> list:
+        names = PROVIDERS if self.provider_names is None else self.provider_names
+        return [provider for provider in map(self.provider, names) if provider is not None]
+
+    def chain(self) -> list:
+        '''
+        Providers in the order they should be tried.
+        '''
+        if self.scheduler is None:
+            return self.providers
+
+        return self.scheduler.order(self.providers)
+
+    def throttle(self, provider) -> float:
+        '''
+        Seconds to wait for a rate limit token of ``provider``, ``None`` when
+        the provider must be skipped. Raises ``RateLimitError`` when the
+        limiter policy is to fail.
+        '''
+        if self.limiters is None:
+            return 0.0
+
+        limiter = self.limiters.get(provider.NAME)
+        max_wait = limiter.max_wait
+
+        if self.deadline is not None:
+            max_wait = min(max_wait, self.deadline.remaining())
+
+        wait = limiter.reserve(max_wait)
+
+        if wait is None and limiter.policy == FAIL:
+            raise RateLimitError(Messages.RATE_LIMITED.value)
+
+        return wait
+
+    def allow(self, provider) -> bool:
+        return self.breakers is None or self.breakers.get(provider.NAME).allow()
+
+    def release(self, provider):
+        if self.breakers is not None:
+            self.breakers.get(provider.NAME).release()
+
+    def record(self, provider, error: bool, data: dict, duration: float):
+        if self.scheduler is None and self.breakers is None and not instruments.active:
+            return
+
+        outcome = self.outcome(provider, error, data)
+
+        if instruments.active:
+            self.report(provider, outcome, data, duration)
+
+        if self.breakers is not None:
+            self.breakers.get(provider.NAME).record(outcome)
+
+        if self.scheduler is not None:
+            self.scheduler.record(provider.NAME, outcome, duration)
+
+    @staticmethod
+    def outcome(provider, error: bool, data: dict) -> Outcome:
+        # A skipped call leaves the exception of the previous one on the provider.
+        return classify(error, data, None if data.get('message') in SKIPPED else provider.timed_out())
+
+    def report(self, provider, outcome: Outcome, data: dict, duration: float):
+        self.attempted.append(provider.NAME)
+
+        if outcome == Outcome.SUCCESS and self.winner is None:
+            self.winner = provider.NAME
+
+        instruments.attempt(AttemptEvent(
+            provider.NAME, host(provider), provider.status_code, duration, outcome, data.get('message')
+        ))
+
+    def searched(self, status_code: int, duration: float):
+        instruments.search(SearchEvent(
+            self.zipcode, status_code, duration, len(self.attempted), self.winner, self.source
+        ))
+
+    def timeout(self, provider, attempts: int = 1):
+        '''
+        Timeout of an attempt within the search deadline, ``None`` without a
+        deadline and ``False`` when the provider can not answer in time.
+        '''
+        if self.deadline is None:
+            return None
+
+        timeout = self.deadline.timeout(attempts)
+
+        if timeout is None:
+            return False
+
+        if self.scheduler is not None:
+            stats = self.scheduler.snapshot().get(provider.NAME)
+
+            if stats and stats['samples'] and stats['latency'] > self.deadline.remaining():
+                return False
+
+        return timeout
+
+    def call(self, provider, attempts: int = 1):
+        '''
+        One call to ``provider``, unless its rate limit, circuit breaker or the
+        deadline rule it out.
+        '''
+        # Throttled before the breaker check, which may hand out a half open probe.
+        wait = self.throttle(provider)
+
+        if wait is None:
+            return True, {'error': True, 'message': Messages.RATE_LIMITED.value}
+
+        if wait:
+            sleep(wait)
+
+        timeout = self.timeout(provider, attempts)
+
+        if timeout is False:
+            return True, {'error': True, 'timeout': True, 'message': Messages.DEADLINE_EXCEEDED.value}
+
+        # Checked last: a half open probe handed out here must be recorded.
+        if not self.allow(provider):
+            return True, {'error': True, 'message': Messages.PROVIDER_UNAVAILABLE.value}
 
-        token = getenv('CEPABERTO_TOKEN', default='')
+        started = monotonic()
+        recorded = False
 
-        if token:
-            self.cepaberto = Cepaberto(zipcode, token)
+        try:
+            error, data = provider.search(timeout=timeout)
+            self.record(provider, error, data, monotonic() - started)
+            recorded = True
+        finally:
+            if not recorded:
+                self.release(provider)
 
-    def search(self):
+        return error, data
 
-        error, data = self.viacep.search()
+    def backoff(self, provider, tries: int, error: bool, data: dict):
+        '''
+        Seconds to wait before retrying a failed call, ``None`` when the
+        failure is not retryable, the retries are exhausted or the deadline
+        leaves no room for another try. Timeouts are only retried within a
+        deadline, each try may take the whole ``timeout`` otherwise.
+        '''
+        policy = provider.retry_policy
 
-        if not error:
-            return 200, data
+        if policy is None or data.get('message') in SKIPPED:
+            return None
 
-        error, data = self.postmon.search()
+        outcome = self.outcome(provider, error, data)
 
-        if not error:
-            return 200, data
+        if outcome == Outcome.TIMEOUT and self.deadline is None:
+            return None
 
-        if self.cepaberto:
-            error, data = self.cepaberto.search()
+        if not policy.should_retry(provider, tries, outcome):
+            return None
+
+        delay = policy.delay(tries)
+
+        if self.deadline is not None and self.deadline.remaining() - delay < MIN_ATTEMPT_TIMEOUT:
+            return None
+
+        return delay
+
+    def attempt(self, provider, attempts: int = 1):
+        error, data = self.call(provider, attempts)
+        tries = 1
+
+        while error and not self.settled:
+            delay = self.backoff(provider, tries, error, data)
+
+            if delay is None:
+                break
+
+            sleep(delay)
+
+            # A concurrent search may have been answered by another provider.
+            if self.settled:
+                break
+
+            retry = self.call(provider, attempts)
+
+            # A retry ruled out keeps the answer of the last real call.
+            if retry[1].get('message') in SKIPPED:
+                break
+
+            error, data = retry
+            tries += 1
+
+        return error, data
+
+    def settle(self, outcomes: dict, found: bool):
+        '''
+        Tells the scheduler whether the not found answers of a search agree
+        with its final result.
+        '''
+        if self.scheduler is None:
+            return
+
+        for name, outcome in outcomes.items():
+            if outcome == Outcome.NOT_FOUND:
+                self.scheduler.record_agreement(name, not found)
+
+    def search(self, deadline: Deadline = None):
+        '''
+        ``deadline`` is a ``Deadline`` or a total budget in seconds shared by
+        every provider attempt. Providers that can no longer answer in time
+        are skipped.
+        '''
+        if instruments.active:
+            started = monotonic()
+            status_code, data = self.resolve(deadline)
+            self.searched(status_code, monotonic() - started)
+        else:
+            status_code, data = self.resolve(deadline)
+
+        if self.compact and status_code == 200:
+            return status_code, Address.from_dict(data['data'])
+
+        return status_code, data
+
+    def resolve(self, deadline: Deadline = None):
+        self.deadline = Deadline.coerce(deadline)
+        cached = self.from_cache()
+
+        if cached is not None:
+            self.source = STALE if self.stale else CACHE
+            return cached
+
+        found = self.from_offline()
+
+        if found is not None:
+            self.source = OFFLINE
+            return found
+
+        if self.flights is not None:
+            self.source = SHARED
+
+            try:
+                return self.flights.do(self.zipcode, self.fetch, timeout=self.remaining())
+            except TimeoutError:
+                return deadline_exceeded()
+
+        return self.fetch()
+
+    def remaining(self):
+        '''
+        Seconds left before the deadline, ``None`` without one.
+        '''
+        return None if self.deadline is None else self.deadline.remaining()
+
+    def fetch(self):
+        self.source = NETWORK
+
+        try:
+            return self.to_cache(*self.lookup())
+        except RateLimitError as e:
+            return 422, {'error': True, 'message': str(e)}
+
+    def from_offline(self):
+        if self.offline is None:
+            return None
+
+        # Imported here, a client without a dataset never loads the providers.
+        from .offline import Offline
+
+        error, data = Offline(self.zipcode, self.offline).search()
+
+        if error:
+            return None
+
+        return 200, data
+
+    def from_cache(self):
+        if self.cache is None:
+            return None
+
+        return self.from_entry(self.cache.get_entry(self.zipcode))
+
+    def from_entry(self, entry):
+        '''
+        Answer of a cache ``entry``, refreshed in the background when stale.
+        '''
+        if entry is None:
+            return None
+
+        stored_at, status_code, data = entry
+
+        if self.cache.stale_ttl and self.cache.is_stale(stored_at, status_code):
+            self.stale = True
+            self.revalidate(status_code)
+
+        return status_code, data
+
+    def refresher(self):
+        '''
+        Copy of this search to refresh its stale cache entry, with a fresh
+        state and no deadline.
+        '''
+        clone = copy(self)
+        clone.attempted = []
+        clone._providers = {}
+        clone.deadline = None
+        clone.settled = False
+        clone.stale = False
+        return clone
+
+    def revalidate(self, stale_status_code: int) -> bool:
+        key = (id(self.cache), self.zipcode)
+        return self.revalidator.submit(key, lambda: self.refresher().refresh(stale_status_code))
+
+    def refresh(self, stale_status_code: int) -> bool:
+        '''
+        Looks the zip code up through the provider chain and replaces the
+        stale entry, which stays in place if the lookup fails.
+        '''
+        self.source = NETWORK
+
+        try:
+            status_code, data = self.lookup()
+        except RateLimitError:
+            return False
+
+        return self.keep(stale_status_code, status_code, data)
+
+    def keep(self, stale_status_code: int, status_code: int, data: dict) -> bool:
+        if not replaces_stale(stale_status_code, status_code, data):
+            return False
+
+        self.cache.set(self.zipcode, status_code, data)
+        return True
+
+    def to_cache(self, status_code: int, data: dict):
+        if self.cache is not None and is_cacheable(status_code, data):
+            self.cache.set(self.zipcode, status_code, data)
+
+        return status_code, data
+
+    def lookup(self):
+
+        if self.strategy == RACE:
+            return self.search_concurrent(delay=None)
+
+        if self.strategy == HEDGE:
+            return self.search_concurrent(delay=self.hedge_delay)
+
+        return self.search_sequential()
+
+    def search_sequential(self):
+        providers = self.chain()
+        outcomes: dict = {}
+        data = None
+
+        for position, provider in enumerate(providers):
+            error, data = self.attempt(provider, len(providers) - position)
 
             if not error:
+                self.settle(outcomes, found=True)
                 return 200, data
 
+            outcomes[provider.NAME] = self.outcome(provider, error, data)
+
+        self.settle(outcomes, found=False)
         return 422, data
+
+    def search_concurrent(self, delay: float = None):
+        '''
+        Runs the providers in worker threads and returns the first success.
+
+        With ``delay=None`` every provider starts at once (race). Otherwise the
+        next provider starts when the previous one fails or after ``delay``
+        seconds without an answer (hedge). Slower requests are cancelled when
+        still queued, or their results are ignored.
+        '''
+        providers = self.chain()
+        executor = get_executor()
+        outcomes: dict = {}
+
+        results: list = [None] * len(providers)
+        indexes: dict = {}
+        pending: set = set()
+
+        def launch():
+            index = len(indexes)
+            future = executor.submit(self.attempt, providers[index])
+            indexes[future] = index
+            pending.add(future)
+
+        launch()
+
+        while delay is None and len(indexes) < len(providers):
+            launch()
+
+        while pending:
+            timeout = delay if len(indexes) < len(providers) else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    error, data = future.result()
+                except RateLimitError:
+                    self.settled = True
+
+                    for loser in pending:
+                        loser.cancel()
+
+                    raise
+
+                if not error:
+                    # Losers still running stop retrying.
+                    self.settled = True
+
+                    for loser in pending:
+                        loser.cancel()
+
+                    self.settle(outcomes, found=True)
+                    return 200, data
+
+                results[indexes[future]] = data
+                outcomes[providers[indexes[future]].NAME] = self.outcome(providers[indexes[future]], error, data)
+
+            if len(indexes) < len(providers):
+                launch()
+
+        # Same answer as the sequential search: the last provider in the chain.
+        self.settle(outcomes, found=False)
+        return 422, results[-1]
+
+    @classmethod
+    def from_cache_many(cls, zipcodes: list, cache: AbstractCache = None, compact: bool = None) -> dict:
+        '''
+        Answers of the cached ``zipcodes`` by zip code, as ``search`` gives
+        them, with a single ``get_many`` call.
+        '''
+        cache = cache if cache is not None else cls.cache
+
+        if cache is None or not zipcodes:
+            return {}
+
+        return cls.cached_answers(cache.get_many(zipcodes), compact)
+
+    @classmethod
+    def cached_answers(cls, found: dict, compact: bool = None) -> dict:
+        if instruments.active:
+            for zipcode, (status_code, _) in found.items():
+                instruments.search(SearchEvent(zipcode, status_code, 0.0, 0, None, CACHE))
+
+        if cls.compact if compact is None else compact:
+            for zipcode, (status_code, body) in found.items():
+                if status_code == 200:
+                    found[zipcode] = (status_code, Address.from_dict(body['data']))
+
+        return found
+
+    @classmethod
+    def search_many(
+        cls,
+        zipcodes,
+        concurrency: int = BULK_CONCURRENCY,
+        dedup_size: int = BULK_DEDUP_SIZE,
+        **options
+    ):
+        '''
+        Looks up an iterable of zip codes with at most ``concurrency`` lookups
+        in flight and yields ``(zipcode, status_code, body)`` as they complete.
+        Zip codes are normalized and deduplicated, invalid ones are answered
+        locally with their original value. The input is consumed lazily.
+        ``options`` are passed to the ``ZipCode`` constructor, e.g.
+        ``compact=True`` yields found addresses as ``Address`` tuples.
+        Lookups run in threads shared by all calls, at most ``BULK_WORKERS``.
+        '''
+        def lookup(zipcode):
+            try:
+                return cls(zipcode, **options).search()
+            except ZipcodeError:
+                return invalid_result()
+
+        cache = options.get('cache')
+        cache = cls.cache if cache is None else cache
+        # Cached zip codes are answered by one get_many per batch.
+        batch_size = CACHE_BATCH_SIZE if cache is not None else 1
+        batch: list = []
+
+        deduplicator = Deduplicator(dedup_size)
+        executor = get_bulk_executor()
+        pending: dict = {}
+
+        def resolve():
+            found = cls.from_cache_many(batch, cache, options.get('compact'))
+
+            for zipcode in batch:
+                if zipcode in found:
+                    yield (zipcode, *found[zipcode])
+                    continue
+
+                pending[executor.submit(lookup, zipcode)] = zipcode
+
+                if len(pending) >= concurrency:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        yield (pending.pop(future), *future.result())
+
+            batch.clear()
+
+        try:
+            for value in zipcodes:
+                zipcode = normalize(value)
+
+                if not is_valid(zipcode):
+                    yield (value, *invalid_result())
+                    continue
+
+                if deduplicator.seen(zipcode):
+                    continue
+
+                batch.append(zipcode)
+
+                if len(batch) >= batch_size:
+                    yield from resolve()
+
+            yield from resolve()
+
+            for future in as_completed(list(pending)):
+                yield (pending.pop(future), *future.result())
+
+        finally:
+            for future in pending:
+                future.cancel()
@@ -19,7 +19,8 @@ __author_email__ = 'lucassrod@gmail.com'
 
 requirements = [
     'requests==2.21.0',
-    'requests-toolbelt==0.9.1'
+    'requests-toolbelt==0.9.1',
+    'importlib-metadata; python_version < "3.8"',
 ]
 
 test_requirements = [
@@ -32,6 +33,14 @@ testing_extras = [
     'pytest-cov',
 ]
 
+async_extras = [
+    'aiohttp>=3.6',
+]
+
+fast_extras = [
+    'orjson',
+]
+
 
 class VerifyVersionCommand(install):
     """Custom command to verify that the git tag matches our version"""
@@ -66,7 +75,7 @@ setup(
     },
     include_package_data=True,
     zip_safe=False,
-    python_requires=">=3.4",
+    python_requires=">=3.6",
     classifiers=[
         'Intended Audience :: Developers',
         'Intended Audience :: System Administrators',
@@ -74,9 +83,12 @@ setup(
         'Topic :: Software Development',
         'Natural Language :: Portuguese',
         'Environment :: Web Environment',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'License :: OSI Approved :: MIT License',
     ],
     install_requires=requirements,
@@ -84,6 +96,11 @@ setup(
     tests_require=['pytest'],
     extras_require={
         'testing': testing_extras,
+        'async': async_extras,
+        'fast': fast_extras,
+    },
+    entry_points={
+        'console_scripts': ['hub-cep=hub_cep.cli:main'],
     },
     cmdclass={
         'verify': VerifyVersionCommand,
@@ -0,0 +1,143 @@
+import asyncio
+import socketserver
+import threading
+import time
+
+import pytest
+
+from benchmarks.stub_server import StubServer
+
+
+class Clock:
+    '''
+    Stands in for ``time.monotonic``, moved by hand through ``now``.
+    '''
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def clock():
+    return Clock()
+
+
+@pytest.fixture()
+def loop():
+    '''
+    A new event loop, closed after the test: ``asyncio.run`` needs Python 3.7.
+    '''
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture()
+def patch(monkeypatch):
+    '''
+    ``patch(provider, result, seconds=0)`` makes the ``search`` of a provider
+    class answer ``result`` after ``seconds``. ``patch.calls`` holds the
+    ``(name, timeout)`` of every call.
+    '''
+    monkeypatch.setenv('CEPABERTO_TOKEN', '123')
+    calls = []
+
+    def patch(provider, result, seconds=0):
+        def search(client, timeout=None):
+            calls.append((client.NAME, timeout))
+            time.sleep(seconds)
+            return result
+
+        monkeypatch.setattr(provider, 'search', search)
+
+    patch.calls = calls
+    patch.names = lambda: [name for name, _ in calls]
+    return patch
+
+
+@pytest.fixture()
+def server(monkeypatch):
+    '''
+    A ``StubServer`` the providers are pointed at, without a CEP Aberto token.
+    '''
+    monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+
+    with StubServer() as server:
+        yield server
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    '''
+    Stand-in Redis server: the few commands ``RedisCache`` sends, kept in
+    a dict, expiration times recorded but not enforced.
+    '''
+
+    def read_command(self):
+        line = self.rfile.readline()
+
+        if not line:
+            return None
+
+        args = []
+
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+
+        return [args[0].decode().upper()] + args[1:]
+
+    @staticmethod
+    def bulk(value):
+        return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        server = self.server
+
+        while True:
+            command = self.read_command()
+
+            if command is None:
+                return
+
+            name, args = command[0], command[1:]
+            server.commands.append(name)
+
+            if name == 'GET':
+                reply = self.bulk(server.data.get(args[0]))
+            elif name == 'MGET':
+                reply = b'*%d\r\n' % len(args) + b''.join(self.bulk(server.data.get(key)) for key in args)
+            elif name == 'SET':
+                server.data[args[0]] = args[1]
+                server.expires[args[0]] = int(args[3])
+                reply = b'+OK\r\n'
+            elif name == 'SCAN':
+                pattern = args[2].rstrip(b'*')
+                names = [key for key in server.data if key.startswith(pattern)]
+                reply = b'*2\r\n' + self.bulk(b'0') + b'*%d\r\n' % len(names) + b''.join(map(self.bulk, names))
+            elif name == 'DEL':
+                reply = b':%d\r\n' % (server.data.pop(args[0], None) is not None)
+            elif name in ('AUTH', 'SELECT'):
+                reply = b'+OK\r\n' if args[0] != b'wrong' else b'-WRONGPASS invalid password\r\n'
+            else:
+                reply = b'-ERR unknown command\r\n'
+
+            self.wfile.write(reply)
+
+
+@pytest.fixture()
+def resp_server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), RespHandler)
+    server.daemon_threads = True
+    server.data, server.expires, server.commands = {}, {}, []
+
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    server.url = 'redis://127.0.0.1:{}/0'.format(server.server_address[1])
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
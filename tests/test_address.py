@@ -0,0 +1,131 @@
+import sys
+
+import pytest
+
+from hub_cep import fastjson
+from hub_cep.address import Address
+from hub_cep.cache import MemoryCache, SQLiteCache
+from hub_cep.zipcode import ZipCode
+
+from . import test_providers
+from .test_providers import ZIPCODE
+
+
+DATA = {
+    'zip_code': '78048-000',
+    'address': 'Avenida Miguel Sutil',
+    'number': '',
+    'info': '',
+    'district': 'Alvorada',
+    'city': 'Cuiabá',
+    'state': 'MT',
+    'country': 'BRA'
+}
+
+BODY = {'error': False, 'message': 'Success.', 'data': DATA}
+
+VIACEP_RESPONSE = {
+    'cep': '78048-000',
+    'logradouro': 'Avenida Miguel Sutil',
+    'bairro': 'Alvorada',
+    'localidade': 'Cuiabá',
+    'uf': 'MT',
+}
+
+
+class TestAddress:
+
+    def test_round_trip(self):
+        address = Address.from_dict(DATA)
+
+        assert address == ('78048-000', 'Avenida Miguel Sutil', 'Alvorada', 'Cuiabá', 'MT')
+        assert address.country == 'BRA'
+        assert address.to_dict() == DATA
+        assert address.to_body() == BODY
+
+    def test_interns_city_and_state(self):
+        first = Address.from_dict(dict(DATA, city=''.join(['Cuia', 'bá']), state=''.join(['M', 'T'])))
+        second = Address.from_dict(dict(DATA, city=''.join(['Cuiab', 'á']), state=''.join(['M', 'T'])))
+
+        assert first.city is second.city
+        assert first.state is second.state
+
+    def test_missing_values(self):
+        assert Address.from_dict({}).to_dict()['city'] is None
+
+    def test_smaller_than_dicts(self):
+        address = Address.from_dict(DATA)
+
+        assert sys.getsizeof(address) < sys.getsizeof(DATA)
+        assert not hasattr(address, '__dict__')
+
+    @pytest.mark.parametrize('body', [
+        {'error': True, 'message': 'Zip code not found.'},
+        dict(BODY, provider='viacep'),
+        dict(BODY, data=dict(DATA, country='ARG')),
+        dict(BODY, data=dict(DATA, latitude='-15.6')),
+    ])
+    def test_from_body_refuses_what_it_would_lose(self, body):
+        assert Address.from_body(body) is None
+
+
+class TestFastJson:
+
+    def test_stdlib(self, monkeypatch):
+        monkeypatch.setattr(fastjson, 'orjson', None)
+
+        assert fastjson.loads('{"city": "Cuiabá"}'.encode('utf-8')) == {'city': 'Cuiabá'}
+        assert fastjson.dumps({'city': 'Cuiabá', 'n': [1]}) == '{"city":"Cuiabá","n":[1]}'
+
+    def test_orjson(self):
+        orjson = pytest.importorskip('orjson')
+
+        assert fastjson.orjson is orjson
+        assert fastjson.loads(fastjson.dumps(BODY).encode('utf-8')) == BODY
+
+
+class TestCompactResults:
+
+    def test_search(self, requests_mock):
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, json=VIACEP_RESPONSE)
+
+        status_code, address = ZipCode(ZIPCODE, compact=True).search()
+
+        assert status_code == 200
+        assert address == Address.from_dict(DATA)
+        assert ZipCode(ZIPCODE).search() == (200, BODY)
+
+    def test_errors_stay_dicts(self, requests_mock, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=404)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, status_code=404)
+
+        assert ZipCode(ZIPCODE, compact=True).search() == (422, {'error': True, 'message': 'Zip code not found.'})
+
+    def test_search_many(self, requests_mock):
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, json=VIACEP_RESPONSE)
+
+        results = list(ZipCode.search_many([ZIPCODE, 'abc'], compact=True))
+
+        assert (ZIPCODE, 200, Address.from_dict(DATA)) in results
+        assert ('abc', 422, {'error': True, 'message': 'Zipcode invalid.'}) in results
+
+    def test_memory_cache(self):
+        cache = MemoryCache(compact=True)
+        cache.set(ZIPCODE, 200, BODY)
+        cache.set('01001000', 200, dict(BODY, provider='viacep'))
+
+        assert type(cache._entries[ZIPCODE][2]) is Address
+        assert cache.get(ZIPCODE) == (200, BODY)
+        assert cache.get('01001000') == (200, dict(BODY, provider='viacep'))
+
+    def test_sqlite_cache_keeps_unicode(self, tmpdir):
+        path = str(tmpdir.join('cache.db'))
+        cache = SQLiteCache(path, batch_size=1)
+        cache.set(ZIPCODE, 200, BODY)
+
+        row = cache.connection().execute('SELECT body FROM zipcodes').fetchone()
+        cache.close()
+
+        assert 'Cuiabá' in row[0]
+        assert SQLiteCache(path).get(ZIPCODE) == (200, BODY)
@@ -0,0 +1,365 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from aiohttp import web  # noqa: E402
+
+from hub_cep.aio import (  # noqa: E402
+    AsyncCepaberto,
+    AsyncPostmon,
+    AsyncViacep,
+    AsyncZipCode,
+    AsyncSessionPool,
+    default_async_pool
+)
+from hub_cep.instrumentation import MemoryCollector, instruments  # noqa: E402
+from hub_cep.providers import Viacep  # noqa: E402
+from hub_cep.ratelimit import RateLimiterRegistry  # noqa: E402
+
+from .test_providers import ZIPCODE  # noqa: E402
+
+
+VIACEP_RESPONSE = {
+    'cep': '78048-000',
+    'logradouro': 'Avenida Miguel Sutil',
+    'bairro': 'Alvorada',
+    'localidade': 'Cuiabá',
+    'uf': 'MT',
+}
+
+POSTMON_RESPONSE = {
+    'cep': '78048-000',
+    'logradouro': 'Avenida Miguel Sutil',
+    'bairro': 'Alvorada',
+    'cidade': 'Cuiabá',
+    'estado': 'MT',
+}
+
+CEPABERTO_RESPONSE = {
+    'cep': '78048-000',
+    'logradouro': 'Avenida Miguel Sutil',
+    'bairro': 'Alvorada',
+    'cidade': {'nome': 'Cuiabá'},
+    'estado': {'sigla': 'MT'},
+}
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await default_async_pool.close()
+
+    loop = asyncio.new_event_loop()
+
+    try:
+        return loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+@pytest.fixture()
+def server(monkeypatch):
+    '''
+    Local aiohttp server emulating the providers. ``routes`` maps provider name
+    to ``(status, payload, delay)``.
+    '''
+    routes = {
+        'viacep': (200, VIACEP_RESPONSE, 0),
+        'postmon': (200, POSTMON_RESPONSE, 0),
+        'cepaberto': (200, CEPABERTO_RESPONSE, 0),
+    }
+    hits = []
+
+    async def handler(request):
+        name = request.match_info['provider']
+        hits.append((name, request.headers.get('Authorization')))
+        status, payload, delay = routes[name]
+        await asyncio.sleep(delay)
+        return web.json_response(payload, status=status)
+
+    async def start():
+        app = web.Application()
+        app.router.add_get('/{provider}/{zipcode}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        return runner, runner.addresses[0][1]
+
+    class Server:
+
+        def __init__(self):
+            self.routes = routes
+            self.hits = hits
+
+        async def __aenter__(self):
+            self.runner, port = await start()
+            base = f'http://127.0.0.1:{port}'
+            monkeypatch.setattr(AsyncViacep, 'API_URL', base + '/viacep/{}')
+            monkeypatch.setattr(AsyncPostmon, 'API_URL', base + '/postmon/')
+            monkeypatch.setattr(AsyncCepaberto, 'API_URL', base + '/cepaberto/{}')
+            return self
+
+        async def __aexit__(self, *args):
+            await self.runner.cleanup()
+
+    monkeypatch.setenv('CEPABERTO_TOKEN', '123')
+    return Server()
+
+
+class TestAsyncSessionPool:
+
+    def test_reuses_session_in_the_same_loop(self):
+        pool = AsyncSessionPool(limit=5)
+
+        async def main():
+            first, second = pool.get(), pool.get()
+            connector = first.connector
+            await pool.close()
+            return first is second, connector.limit
+
+        assert run(main()) == (True, 5)
+
+    def test_one_session_per_loop(self):
+        pool = AsyncSessionPool()
+
+        async def main():
+            session = pool.get()
+            await pool.close()
+            return session
+
+        assert run(main()) is not run(main())
+
+
+class TestAsyncProviders:
+
+    def test_search_matches_sync_translation(self, server):
+        async def main():
+            async with server:
+                return await AsyncViacep(ZIPCODE).search()
+
+        error, info = run(main())
+
+        assert error is False
+        assert info == {
+            'error': False, 'message': 'Success.', 'data': Viacep(ZIPCODE).translate(VIACEP_RESPONSE)
+        }
+
+    def test_not_found(self, server):
+        server.routes['postmon'] = (404, {}, 0)
+
+        async def main():
+            async with server:
+                return await AsyncPostmon(ZIPCODE).search()
+
+        assert run(main()) == (True, {'error': True, 'message': 'Zip code not found.'})
+
+    def test_any_status_code(self, server):
+        server.routes['viacep'] = (406, {}, 0)
+
+        async def main():
+            async with server:
+                return await AsyncViacep(ZIPCODE).search()
+
+        assert run(main()) == (True, {'error': True, 'message': 'An error ocurred.'})
+
+    def test_cepaberto_sends_token(self, server):
+        async def main():
+            async with server:
+                return await AsyncCepaberto(ZIPCODE, 'abc').search()
+
+        error, info = run(main())
+
+        assert error is False
+        assert info['data']['city'] == 'Cuiabá'
+        assert server.hits == [('cepaberto', 'Token token=abc')]
+
+    def test_connection_error(self, monkeypatch):
+        monkeypatch.setattr(AsyncViacep, 'API_URL', 'http://127.0.0.1:1/{}')
+
+        error, info, res = run(AsyncViacep(ZIPCODE).call(AsyncViacep(ZIPCODE).get_url()))
+
+        assert error is True
+        assert info['timeout'] is False
+        assert res is None
+
+
+class TestAsyncZipCode:
+
+    def test_search(self, server):
+        async def main():
+            async with server:
+                return await AsyncZipCode(ZIPCODE).search()
+
+        status_code, result = run(main())
+
+        assert status_code == 200
+        assert result['data']['district'] == 'Alvorada'
+        assert server.hits == [('viacep', None)]
+
+    def test_falls_back_to_next_provider(self, server):
+        server.routes['viacep'] = (406, {}, 0)
+
+        async def main():
+            async with server:
+                return await AsyncZipCode(ZIPCODE).search()
+
+        status_code, result = run(main())
+
+        assert status_code == 200
+        assert [name for name, _ in server.hits] == ['viacep', 'postmon']
+
+    def test_returns_422_when_all_providers_fail(self, server):
+        server.routes['viacep'] = (406, {}, 0)
+        server.routes['postmon'] = (406, {}, 0)
+        server.routes['cepaberto'] = (404, {}, 0)
+
+        async def main():
+            async with server:
+                return await AsyncZipCode(ZIPCODE).search()
+
+        assert run(main()) == (422, {'error': True, 'message': 'Zip code not found.'})
+
+    def test_instrumentation(self, server):
+        server.routes['viacep'] = (406, {}, 0)
+        collector = instruments.add(MemoryCollector())
+
+        async def main():
+            async with server:
+                return await AsyncZipCode(ZIPCODE).search()
+
+        try:
+            run(main())
+        finally:
+            instruments.remove(collector)
+
+        assert collector.counter('hub_cep_attempts_total', provider='viacep', outcome='error') == 1
+        assert collector.counter('hub_cep_searches_total', provider='postmon', status_code=200, source='network') == 1
+        assert collector.counter('hub_cep_search_attempts_total') == 2
+
+    def test_rate_limit_is_shared_between_tasks(self, server):
+        limiters = RateLimiterRegistry(policy='skip')
+        limiters.configure('viacep', rate=0.001, burst=2)
+
+        async def main():
+            async with server:
+                return await asyncio.gather(*(AsyncZipCode(ZIPCODE, limiters=limiters).search() for _ in range(4)))
+
+        assert [status for status, _ in run(main())] == [200] * 4
+        assert sorted(name for name, _ in server.hits) == ['postmon', 'postmon', 'viacep', 'viacep']
+
+    def test_race_returns_fastest_provider(self, server):
+        server.routes['viacep'] = (200, VIACEP_RESPONSE, 0.5)
+        server.routes['postmon'] = (200, dict(POSTMON_RESPONSE, bairro='Postmon'), 0)
+        server.routes['cepaberto'] = (200, CEPABERTO_RESPONSE, 0.5)
+
+        async def main():
+            async with server:
+                return await AsyncZipCode(ZIPCODE, strategy='race').search()
+
+        status_code, result = run(main())
+
+        assert status_code == 200
+        assert result['data']['district'] == 'Postmon'
+
+    def test_many_lookups_share_one_loop(self, server):
+        async def main():
+            async with server:
+                return await asyncio.gather(*(AsyncZipCode(ZIPCODE).search() for _ in range(50)))
+
+        results = run(main())
+
+        assert {status_code for status_code, _ in results} == {200}
+
+    def test_search_many(self, server):
+        async def zipcodes():
+            for zipcode in ['78048-000', '78048000', '', '01310100']:
+                yield zipcode
+
+        async def main():
+            async with server:
+                return [result async for result in AsyncZipCode.search_many(zipcodes(), concurrency=2)]
+
+        results = run(main())
+
+        assert sorted(zipcode for zipcode, _, _ in results) == ['', '01310100', '78048000']
+        assert [status for zipcode, status, _ in results if not zipcode] == [422]
+        assert len(server.hits) == 2
+
+    def test_single_flight(self, server, monkeypatch):
+        from hub_cep.singleflight import AsyncSingleFlight
+
+        monkeypatch.setattr(AsyncZipCode, 'flights', AsyncSingleFlight())
+        server.routes['viacep'] = (200, VIACEP_RESPONSE, 0.05)
+
+        async def main():
+            async with server:
+                return await asyncio.gather(*(AsyncZipCode(ZIPCODE).search() for _ in range(20)))
+
+        results = run(main())
+
+        assert {status_code for status_code, _ in results} == {200}
+        assert server.hits == [('viacep', None)]
+
+    def test_stale_cache_entry_is_refreshed(self, server, monkeypatch):
+        from hub_cep import cache as cache_module
+        from hub_cep.cache import MemoryCache, Revalidator
+
+        now = [1000.0]
+        monkeypatch.setattr(cache_module, 'time', lambda: now[0])
+        revalidator = Revalidator()
+        monkeypatch.setattr(AsyncZipCode, 'revalidator', revalidator)
+        cache = MemoryCache(ttl=100, stale_ttl=1000)
+        cache.set(ZIPCODE, 200, {'error': False, 'message': 'Success.', 'data': {'district': 'Centro'}})
+        now[0] += 150
+
+        async def main():
+            async with server:
+                result = await AsyncZipCode(ZIPCODE, cache=cache).search()
+                await revalidator.drain()
+                return result
+
+        status_code, body = run(main())
+
+        assert body['data']['district'] == 'Centro'
+        assert cache.get(ZIPCODE)[1]['data']['district'] == 'Alvorada'
+        assert server.hits == [('viacep', None)]
+
+    def test_blocking_cache_runs_off_the_loop(self, server, tmpdir):
+        import threading
+
+        from hub_cep.cache import SQLiteCache
+
+        cache = SQLiteCache(str(tmpdir.join('cache.sqlite')))
+        threads = []
+
+        for name in ('get_entry', 'set', 'get_many'):
+            def record(*args, method=getattr(cache, name)):
+                threads.append(threading.current_thread())
+                return method(*args)
+
+            setattr(cache, name, record)
+
+        async def main():
+            async with server:
+                first = await AsyncZipCode(ZIPCODE, cache=cache).search()
+                second = await AsyncZipCode(ZIPCODE, cache=cache).search()
+                many = [result async for result in AsyncZipCode.search_many([ZIPCODE], cache=cache)]
+                return first, second, many
+
+        first, second, many = run(main())
+        cache.close()
+
+        assert first == second == many[0][1:]
+        assert len(threads) == 4
+        assert threading.main_thread() not in threads
+        assert server.hits == [('viacep', None)]
+
+    def test_registry_resolves_async_providers(self):
+        assert AsyncZipCode.registry.get('viacep') is AsyncViacep
+        assert AsyncZipCode.registry.get('cepaberto') is AsyncCepaberto
+        assert AsyncZipCode(ZIPCODE).postmon.__class__ is AsyncPostmon
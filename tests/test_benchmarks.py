@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from benchmarks.coldstart import main as coldstart
+from benchmarks.run import bench_search_many, compare, main, percentile
+from benchmarks.stub_server import ProviderBehavior, StubServer
+from hub_cep.providers import Postmon, Viacep
+from hub_cep.zipcode import ZipCode
+
+from .test_providers import ZIPCODE
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) == 0
+
+
+def test_compare():
+    current = {'results': {'search': {'throughput': 110, 'p50': 0.5, 'count': 1}}}
+    baseline = {'results': {'search': {'throughput': 100, 'p50': 1.0, 'count': 1}}}
+
+    assert compare(current, baseline) == {'search': {'throughput': 0.1, 'p50': -0.5}}
+
+
+class TestStubServer:
+
+    def test_emulates_providers(self, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        original = Viacep.API_URL
+
+        with StubServer() as server:
+            assert Viacep.API_URL.startswith(server.url)
+            status_code, result = ZipCode(ZIPCODE).search()
+
+        assert Viacep.API_URL == original
+        assert status_code == 200
+        assert result['data']['city'] == 'Cuiabá'
+        assert server.hits == {'viacep': 1, 'postmon': 0, 'cepaberto': 0}
+
+    def test_errors_fall_back(self, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+
+        with StubServer({'viacep': ProviderBehavior(error_rate=1)}) as server:
+            status_code, _ = ZipCode(ZIPCODE).search()
+            hits = server.hits
+
+        assert status_code == 200
+        assert hits['postmon'] == 1
+
+    def test_not_found(self, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        behaviors = {name: ProviderBehavior(not_found_rate=1) for name in ('viacep', 'postmon')}
+
+        with StubServer(behaviors):
+            assert Postmon(ZIPCODE).search() == (True, {'error': True, 'message': 'Zip code not found.'})
+
+    def test_child_process(self):
+        with StubServer(process=True) as server:
+            error, _ = Viacep(ZIPCODE).search()
+
+            assert error is False
+            assert server.hits['viacep'] == 1
+
+
+@pytest.mark.parametrize('in_process', [True, False])
+def test_writes_json_report(tmpdir, capsys, in_process):
+    output = str(tmpdir.join('bench.json'))
+    argv = ['--count', '10', '--concurrency', '2', '--viacep-latency', '0', '--scenario', 'search.sequential',
+            '--scenario', 'search_many', '--output', output]
+
+    assert main(argv + (['--in-process'] if in_process else [])) == 0
+
+    with open(output) as f:
+        report = json.load(f)
+
+    assert json.loads(capsys.readouterr().out) == report
+    assert set(report['results']) == {'search.sequential', 'search_many'}
+    assert report['results']['search.sequential']['count'] == 10
+    assert report['results']['search.sequential']['errors'] == 0
+
+
+def test_search_many_counts_every_request(server):
+    result = bench_search_many(count=10, unique=3, concurrency=2)
+
+    assert result['count'] == 10
+    assert result['errors'] == 0
+    assert server.hits['viacep'] == 3
+
+
+def test_coldstart_benchmark(tmpdir, capsys):
+    output = str(tmpdir.join('coldstart.json'))
+
+    assert coldstart(['--runs', '1', '--count', '3', '--unique', '2', '--output', output]) == 0
+
+    with open(output) as f:
+        report = json.load(f)
+
+    assert json.loads(capsys.readouterr().out) == report
+
+    for mode in ('lazy', 'prewarm'):
+        result = report['results'][mode]
+        assert set(result) == {'process', 'import', 'init', 'first', 'cold', 'warm'}
+        assert result['warm']['count'] == 2
+        assert result['warm']['errors'] == 0
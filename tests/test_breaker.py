@@ -0,0 +1,199 @@
+import pytest
+
+from hub_cep.breaker import CLOSED, HALF_OPEN, OPEN, BreakerRegistry, CircuitBreaker
+from hub_cep.messages import Outcome
+from hub_cep.providers import Postmon, Viacep
+from hub_cep.zipcode import ZipCode
+
+from . import test_providers
+from .test_providers import ZIPCODE
+
+
+class TestCircuitBreaker:
+
+    def test_starts_closed(self):
+        breaker = CircuitBreaker('viacep')
+
+        assert breaker.state == CLOSED
+        assert breaker.allow() is True
+
+    def test_opens_after_consecutive_failures(self, clock):
+        breaker = CircuitBreaker('viacep', failure_threshold=3, clock=clock)
+
+        for outcome in (Outcome.TIMEOUT, Outcome.NETWORK_ERROR):
+            breaker.record(outcome)
+
+        assert breaker.state == CLOSED
+
+        breaker.record(Outcome.ERROR)
+
+        assert breaker.state == OPEN
+        assert breaker.allow() is False
+
+    def test_not_found_is_not_a_failure(self):
+        breaker = CircuitBreaker('viacep', failure_threshold=2, min_calls=2)
+
+        for _ in range(10):
+            breaker.record(Outcome.NOT_FOUND)
+
+        assert breaker.state == CLOSED
+
+    def test_success_resets_consecutive_failures(self):
+        breaker = CircuitBreaker('viacep', failure_threshold=2, min_calls=100)
+        breaker.record(Outcome.TIMEOUT)
+        breaker.record(Outcome.SUCCESS)
+        breaker.record(Outcome.TIMEOUT)
+
+        assert breaker.state == CLOSED
+
+    def test_opens_on_error_rate(self):
+        breaker = CircuitBreaker('viacep', failure_threshold=100, error_rate=0.5, window=4, min_calls=4)
+
+        for outcome in (Outcome.TIMEOUT, Outcome.SUCCESS, Outcome.TIMEOUT):
+            breaker.record(outcome)
+
+        assert breaker.state == CLOSED
+
+        breaker.record(Outcome.SUCCESS)
+
+        assert breaker.state == OPEN
+
+    def test_half_open_after_cooldown(self, clock):
+        breaker = CircuitBreaker('viacep', failure_threshold=1, cooldown=10, probes=1, clock=clock)
+        breaker.record(Outcome.TIMEOUT)
+
+        clock.now = 9.9
+        assert breaker.allow() is False
+
+        clock.now = 10
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is True
+        assert breaker.allow() is False
+
+    def test_successful_probe_closes(self, clock):
+        breaker = CircuitBreaker('viacep', failure_threshold=1, cooldown=10, clock=clock)
+        breaker.record(Outcome.TIMEOUT)
+        clock.now = 10
+        breaker.allow()
+        breaker.record(Outcome.SUCCESS)
+
+        assert breaker.state == CLOSED
+
+    def test_failed_probe_reopens(self, clock):
+        breaker = CircuitBreaker('viacep', failure_threshold=1, cooldown=10, clock=clock)
+        breaker.record(Outcome.TIMEOUT)
+        clock.now = 10
+        breaker.allow()
+        breaker.record(Outcome.TIMEOUT)
+
+        assert breaker.state == OPEN
+
+        clock.now = 19
+        assert breaker.allow() is False
+
+    def test_snapshot(self):
+        breaker = CircuitBreaker('viacep', failure_threshold=5)
+        breaker.record(Outcome.TIMEOUT)
+        breaker.record(Outcome.SUCCESS)
+
+        assert breaker.snapshot() == {'state': CLOSED, 'consecutive_failures': 0, 'error_rate': 0.5, 'calls': 2}
+
+    def test_release_gives_back_the_probe(self, clock):
+        breaker = CircuitBreaker('viacep', failure_threshold=1, cooldown=10, probes=1, clock=clock)
+        breaker.record(Outcome.TIMEOUT)
+        clock.now = 10
+
+        assert breaker.allow() is True
+        breaker.release()
+
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is True
+
+    def test_reset(self):
+        breaker = CircuitBreaker('viacep', failure_threshold=1)
+        breaker.record(Outcome.TIMEOUT)
+        breaker.reset()
+
+        assert breaker.state == CLOSED
+
+
+class TestBreakerRegistry:
+
+    def test_one_breaker_per_provider(self):
+        registry = BreakerRegistry()
+
+        assert registry.get('viacep') is registry.get('viacep')
+        assert registry.get('viacep') is not registry.get('postmon')
+
+    def test_defaults_and_overrides(self):
+        registry = BreakerRegistry(cooldown=5)
+        registry.configure('postmon', cooldown=60, failure_threshold=1)
+
+        assert registry.get('viacep').cooldown == 5
+        assert registry.get('postmon').cooldown == 60
+        assert registry.get('postmon').failure_threshold == 1
+
+    def test_snapshot(self):
+        registry = BreakerRegistry(failure_threshold=1)
+        registry.get('viacep').record(Outcome.TIMEOUT)
+
+        assert registry.snapshot()['viacep']['state'] == OPEN
+
+
+class TestZipCodeBreakers:
+
+    POSTMON_RESPONSE = {'cep': '78048-000', 'bairro': 'Alvorada', 'cidade': 'Cuiabá', 'estado': 'MT'}
+
+    def test_skips_open_provider(self, requests_mock, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=503)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, json=self.POSTMON_RESPONSE)
+        breakers = BreakerRegistry(failure_threshold=2)
+
+        for _ in range(5):
+            status_code, _ = ZipCode(ZIPCODE, breakers=breakers).search()
+            assert status_code == 200
+
+        assert viacep.call_count == 2
+        assert breakers.snapshot()['viacep']['state'] == OPEN
+        assert breakers.snapshot()['postmon']['state'] == CLOSED
+
+    def test_all_providers_open(self, requests_mock, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        breakers = BreakerRegistry(failure_threshold=1)
+        breakers.get(Viacep.NAME).record(Outcome.TIMEOUT)
+        breakers.get(Postmon.NAME).record(Outcome.TIMEOUT)
+
+        status_code, result = ZipCode(ZIPCODE, breakers=breakers).search()
+
+        assert status_code == 422
+        assert result == {'error': True, 'message': 'Provider unavailable.'}
+        assert requests_mock.call_count == 0
+
+    def test_deadline_skip_does_not_take_the_probe(self, clock, monkeypatch):
+        from hub_cep.deadline import Deadline
+
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        breakers = BreakerRegistry(failure_threshold=1, cooldown=10, probes=1, clock=clock)
+        breakers.get(Viacep.NAME).record(Outcome.TIMEOUT)
+        clock.now = 10
+
+        ZipCode(ZIPCODE, breakers=breakers).search(deadline=Deadline(0))
+
+        assert breakers.get(Viacep.NAME).allow() is True
+
+    def test_probe_that_raises_is_released(self, clock, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+
+        def search(client, timeout=None):
+            raise ValueError('Expecting value')
+
+        monkeypatch.setattr(Viacep, 'search', search)
+        breakers = BreakerRegistry(failure_threshold=1, cooldown=10, probes=1, clock=clock)
+        breakers.get(Viacep.NAME).record(Outcome.TIMEOUT)
+        clock.now = 10
+
+        with pytest.raises(ValueError):
+            ZipCode(ZIPCODE, breakers=breakers).search()
+
+        assert breakers.get(Viacep.NAME).allow() is True
@@ -0,0 +1,628 @@
+import gc
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import weakref
+
+import pytest
+
+from hub_cep import cache as cache_module
+from hub_cep.cache import (
+    MemoryCache,
+    RedisCache,
+    Revalidator,
+    SQLiteCache,
+    TieredCache,
+    from_url,
+    is_cacheable,
+    replaces_stale
+)
+from hub_cep.instrumentation import MemoryCollector, instruments
+from hub_cep.providers import AbstractProvider
+from hub_cep.zipcode import ZipCode
+
+from . import test_providers
+from .test_providers import ZIPCODE
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FOUND = {'error': False, 'message': 'Success.', 'data': {'zip_code': '78048-000'}}
+NOT_FOUND = {'error': True, 'message': 'Zip code not found.'}
+STRANGE = {'error': True, 'message': 'An error ocurred.'}
+TIMEOUT = {'error': True, 'timeout': True, 'message': 'Read timed out.'}
+NETWORK = {'error': True, 'timeout': False, 'message': 'Network error.'}
+
+
+@pytest.fixture()
+def wall_clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, 'time', lambda: now[0])
+    return now
+
+
+def test_is_cacheable():
+    assert is_cacheable(200, FOUND) is True
+    assert is_cacheable(422, NOT_FOUND) is True
+    assert is_cacheable(422, STRANGE) is False
+    assert is_cacheable(422, TIMEOUT) is False
+    assert is_cacheable(422, NETWORK) is False
+    assert is_cacheable(422, None) is False
+
+
+class TestMemoryCache:
+
+    def test_get_and_set(self):
+        cache = MemoryCache()
+        cache.set(ZIPCODE, 200, FOUND)
+
+        assert cache.get(ZIPCODE) == (200, FOUND)
+        assert ZIPCODE in cache
+        assert len(cache) == 1
+
+    def test_miss(self):
+        cache = MemoryCache()
+
+        assert cache.get(ZIPCODE) is None
+        assert cache.stats()['misses'] == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set('1', 200, FOUND)
+        cache.set('2', 200, FOUND)
+        cache.get('1')
+        cache.set('3', 200, FOUND)
+
+        assert '1' in cache
+        assert '2' not in cache
+        assert '3' in cache
+        assert cache.stats()['evictions'] == 1
+
+    def test_found_entries_expire_after_ttl(self, wall_clock):
+        cache = MemoryCache(ttl=10, negative_ttl=1)
+        cache.set(ZIPCODE, 200, FOUND)
+
+        wall_clock[0] += 9
+        assert cache.get(ZIPCODE) == (200, FOUND)
+
+        wall_clock[0] += 1
+        assert cache.get(ZIPCODE) is None
+        assert cache.stats()['expirations'] == 1
+        assert ZIPCODE not in cache
+
+    def test_not_found_entries_use_negative_ttl(self, wall_clock):
+        cache = MemoryCache(ttl=10, negative_ttl=1)
+        cache.set(ZIPCODE, 422, NOT_FOUND)
+
+        assert cache.get(ZIPCODE) == (422, NOT_FOUND)
+
+        wall_clock[0] += 1
+        assert cache.get(ZIPCODE) is None
+
+    def test_stats(self):
+        cache = MemoryCache(maxsize=10)
+        cache.set(ZIPCODE, 200, FOUND)
+        cache.get(ZIPCODE)
+        cache.get('00000000')
+
+        assert cache.stats() == {
+            'size': 1, 'maxsize': 10, 'hits': 1, 'misses': 1, 'evictions': 0, 'expirations': 0
+        }
+
+    def test_get_many_and_set_many(self, wall_clock):
+        cache = MemoryCache(ttl=10, negative_ttl=1)
+        cache.set_many({'1': (200, FOUND), '2': (422, NOT_FOUND)})
+
+        assert cache.get_many(['1', '2', '3']) == {'1': (200, FOUND), '2': (422, NOT_FOUND)}
+
+        wall_clock[0] += 1
+
+        assert cache.get_many(['1', '2']) == {'1': (200, FOUND)}
+        assert cache.stats()['misses'] == 2
+
+    def test_delete_and_clear(self):
+        cache = MemoryCache()
+        cache.set('1', 200, FOUND)
+        cache.set('2', 200, FOUND)
+        cache.delete('1')
+
+        assert '1' not in cache
+
+        cache.clear()
+        assert len(cache) == 0
+
+
+class TestZipCodeCache:
+
+    VIACEP_RESPONSE = {'cep': '78048-000', 'bairro': 'Alvorada', 'localidade': 'Cuiabá', 'uf': 'MT'}
+
+    def test_second_search_is_served_from_cache(self, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, json=self.VIACEP_RESPONSE)
+        cache = MemoryCache()
+
+        first = ZipCode(ZIPCODE, cache=cache).search()
+        second = ZipCode(ZIPCODE, cache=cache).search()
+
+        assert first == second
+        assert first[0] == 200
+        assert viacep.call_count == 1
+        assert cache.stats()['hits'] == 1
+
+    def test_class_level_cache(self, requests_mock, monkeypatch):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, json=self.VIACEP_RESPONSE)
+        monkeypatch.setattr(ZipCode, 'cache', MemoryCache())
+
+        ZipCode(ZIPCODE).search()
+        ZipCode(ZIPCODE).search()
+
+        assert viacep.call_count == 1
+
+    def test_caches_not_found(self, requests_mock, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=400)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, status_code=404)
+        cache = MemoryCache()
+
+        assert ZipCode(ZIPCODE, cache=cache).search() == (422, NOT_FOUND)
+        assert ZipCode(ZIPCODE, cache=cache).search() == (422, NOT_FOUND)
+        assert viacep.call_count == 1
+
+    def test_does_not_cache_transient_errors(self, requests_mock, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        monkeypatch.setattr(AbstractProvider, 'retry_policy', None)
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=503)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, status_code=503)
+        cache = MemoryCache()
+
+        ZipCode(ZIPCODE, cache=cache).search()
+        ZipCode(ZIPCODE, cache=cache).search()
+
+        assert viacep.call_count == 2
+        assert len(cache) == 0
+
+
+class TestSQLiteCache:
+
+    @pytest.fixture()
+    def path(self, tmpdir):
+        return str(tmpdir.join('zipcodes.sqlite3'))
+
+    @pytest.fixture()
+    def cache(self, path):
+        cache = SQLiteCache(path, ttl=10, negative_ttl=1, batch_size=2, flush_interval=60)
+        yield cache
+        cache.close()
+
+    def test_uses_wal_mode(self, cache):
+        assert cache.connection().execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+    def test_get_and_set(self, cache):
+        cache.set(ZIPCODE, 200, FOUND)
+
+        assert cache.get(ZIPCODE) == (200, FOUND)
+        assert cache.get('00000000') is None
+
+    def test_writes_are_batched(self, cache, path):
+        other = SQLiteCache(path)
+        cache.set('1', 200, FOUND)
+
+        assert other.get('1') is None
+
+        cache.set('2', 422, NOT_FOUND)
+
+        assert other.get('1') == (200, FOUND)
+        assert other.get('2') == (422, NOT_FOUND)
+        other.close()
+
+    def test_idle_writes_are_flushed(self, path):
+        cache = SQLiteCache(path, batch_size=100, flush_interval=0.1)
+        other = SQLiteCache(path)
+        cache.set('1', 200, FOUND)
+
+        assert other.get('1') is None
+
+        deadline = time.monotonic() + 2
+
+        while other.get('1') is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        assert other.get('1') == (200, FOUND)
+        cache.close()
+        other.close()
+
+    def test_closed_caches_are_released(self, path):
+        cache = SQLiteCache(path)
+        cache.set('1', 200, FOUND)
+        reference = weakref.ref(cache)
+        cache.close()
+        del cache
+        gc.collect()
+
+        assert reference() is None
+
+    def test_shared_between_processes(self, cache, path):
+        cache.set(ZIPCODE, 200, FOUND)
+        cache.flush()
+
+        code = (
+            'import sys, json; from hub_cep.cache import SQLiteCache; '
+            f'print(json.dumps(SQLiteCache({path!r}).get({ZIPCODE!r})))'
+        )
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT)
+
+        assert json.loads(output) == [200, FOUND]
+
+    def test_entries_expire(self, cache, wall_clock):
+        cache.set('1', 200, FOUND)
+        cache.set('2', 422, NOT_FOUND)
+
+        wall_clock[0] += 1
+        assert cache.get('1') == (200, FOUND)
+        assert cache.get('2') is None
+
+        wall_clock[0] += 9
+        assert cache.get('1') is None
+
+    def test_compact_removes_expired_entries(self, cache, wall_clock):
+        cache.set('1', 200, FOUND)
+        cache.set('2', 422, NOT_FOUND)
+
+        wall_clock[0] += 1
+
+        assert cache.compact() == 1
+        assert len(cache) == 1
+
+    def test_compact_command(self, cache, path, wall_clock, capsys):
+        cache.set('1', 422, NOT_FOUND)
+        cache.close()
+
+        wall_clock[0] += 3600
+
+        assert cache_module.main(['compact', path]) == 0
+        assert capsys.readouterr().out == '1 expired entries removed.\n'
+
+    def test_get_many(self, cache, path, wall_clock):
+        other = SQLiteCache(path, ttl=10, negative_ttl=1)
+        other.set_many({str(key): (200, FOUND) for key in range(1000)})
+        other.set('expired', 422, NOT_FOUND)
+        other.flush()
+        cache.set('pending', 200, FOUND)
+        wall_clock[0] += 1
+
+        found = cache.get_many([str(key) for key in range(1000)] + ['pending', 'expired', 'missing'])
+
+        assert len(found) == 1001
+        assert found['999'] == found['pending'] == (200, FOUND)
+        assert cache.stats()['misses'] == 2
+        other.close()
+
+    def test_zipcode_uses_persistent_cache(self, cache, requests_mock):
+        viacep = requests_mock.get(
+            test_providers.TestViacep.FAKE_URL, json=TestZipCodeCache.VIACEP_RESPONSE
+        )
+
+        first = ZipCode(ZIPCODE, cache=cache).search()
+        cache.flush()
+        second = ZipCode(ZIPCODE, cache=cache).search()
+
+        assert first == second
+        assert viacep.call_count == 1
+
+
+class TestRedisCache:
+
+    @pytest.fixture()
+    def cache(self, resp_server):
+        cache = RedisCache(resp_server.url, ttl=10, negative_ttl=1)
+        yield cache
+        cache.close()
+
+    def test_get_and_set(self, cache, resp_server):
+        cache.set(ZIPCODE, 200, FOUND)
+        cache.set('00000000', 422, NOT_FOUND)
+
+        assert cache.get(ZIPCODE) == (200, FOUND)
+        assert cache.get('00000000') == (422, NOT_FOUND)
+        assert cache.get('11111111') is None
+        expires = resp_server.expires
+        assert 9900 < expires[b'hub_cep:' + ZIPCODE.encode()] <= 10000
+        assert 900 < expires[b'hub_cep:00000000'] <= 1000
+
+    def test_get_many_is_one_command(self, cache, resp_server):
+        cache.set_many({'1': (200, FOUND), '2': (422, NOT_FOUND)})
+        resp_server.commands.clear()
+
+        assert cache.get_many(['1', '2', '3']) == {'1': (200, FOUND), '2': (422, NOT_FOUND)}
+        assert resp_server.commands == ['MGET']
+        assert cache.stats() == {'hits': 2, 'misses': 1, 'errors': 0}
+
+    def test_delete(self, cache):
+        cache.set('1', 200, FOUND)
+        cache.delete('1')
+
+        assert cache.get('1') is None
+
+    def test_authenticates_and_selects_database(self, resp_server):
+        url = 'redis://:secret@127.0.0.1:{}/2'.format(resp_server.server_address[1])
+        cache = RedisCache(url)
+        cache.get('1')
+
+        assert (cache.password, cache.db) == ('secret', 2)
+        assert resp_server.commands == ['AUTH', 'SELECT', 'MGET']
+        cache.close()
+
+    def test_fails_open(self, resp_server):
+        cache = RedisCache('redis://:wrong@127.0.0.1:{}/0'.format(resp_server.server_address[1]))
+
+        assert cache.get('1') is None
+        assert cache.stats()['errors'] == 1
+
+        down = RedisCache('redis://127.0.0.1:1/0', timeout=0.1, retry_after=0)
+        down.set('1', 200, FOUND)
+
+        assert down.get('1') is None
+        assert down.stats()['errors'] == 2
+
+    def test_waits_before_reconnecting(self, resp_server, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(cache_module, 'monotonic', lambda: now[0])
+        cache = RedisCache('redis://127.0.0.1:1/0', timeout=0.1, retry_after=5)
+
+        cache.set('1', 200, FOUND)
+        cache.get('1')
+
+        assert cache.stats()['errors'] == 1
+
+        cache.port = resp_server.server_address[1]
+        now[0] += 5
+        cache.set('1', 200, FOUND)
+
+        assert cache.get('1') == (200, FOUND)
+        assert cache.stats()['errors'] == 1
+
+    def test_rejects_other_urls(self):
+        with pytest.raises(ValueError):
+            RedisCache('memcached://localhost')
+
+    def test_zipcode_uses_shared_cache(self, cache, resp_server, requests_mock):
+        viacep = requests_mock.get(
+            test_providers.TestViacep.FAKE_URL, json=TestZipCodeCache.VIACEP_RESPONSE
+        )
+
+        first = ZipCode(ZIPCODE, cache=cache).search()
+        second = ZipCode(ZIPCODE, cache=RedisCache(resp_server.url)).search()
+
+        assert first == second
+        assert viacep.call_count == 1
+
+
+class TestTieredCache:
+
+    def test_local_hits_skip_the_shared_cache(self, resp_server):
+        cache = TieredCache(MemoryCache(), RedisCache(resp_server.url))
+        cache.set('1', 200, FOUND)
+        resp_server.commands.clear()
+
+        assert cache.get('1') == (200, FOUND)
+        assert resp_server.commands == []
+
+    def test_shared_hits_fill_the_local_cache(self, resp_server):
+        RedisCache(resp_server.url).set_many({'1': (200, FOUND), '2': (422, NOT_FOUND)})
+        local = MemoryCache()
+        local.set('3', 200, FOUND)
+        cache = TieredCache(local, RedisCache(resp_server.url))
+        resp_server.commands.clear()
+
+        assert cache.get_many(['1', '2', '3', '4']) == {'1': (200, FOUND), '2': (422, NOT_FOUND), '3': (200, FOUND)}
+        assert resp_server.commands == ['MGET']
+        assert '1' in local and '2' in local
+
+    def test_shared_cache_is_required(self):
+        with pytest.raises(TypeError):
+            TieredCache(MemoryCache())
+
+        cache = TieredCache(None, MemoryCache(ttl=60))
+
+        assert isinstance(cache.local, MemoryCache)
+        assert cache.ttl == 60
+
+    def test_from_url(self, resp_server, tmpdir):
+        assert isinstance(from_url(''), MemoryCache)
+        assert isinstance(from_url(resp_server.url), RedisCache)
+        assert isinstance(from_url(str(tmpdir.join('cache.sqlite'))), SQLiteCache)
+
+        tiered = from_url(resp_server.url + '?local=10')
+
+        assert isinstance(tiered, TieredCache)
+        assert tiered.local.maxsize == 10
+        assert tiered.shared.port == resp_server.server_address[1]
+
+
+class TestSearchManyCache:
+
+    class Counting(MemoryCache):
+        calls = 0
+
+        def get_many(self, keys):
+            self.calls += 1
+            return super().get_many(keys)
+
+    def test_cached_zipcodes_in_one_call(self, requests_mock):
+        viacep = requests_mock.get(
+            test_providers.TestViacep.FAKE_URL, json=TestZipCodeCache.VIACEP_RESPONSE
+        )
+        cache = self.Counting()
+        cache.set('01001000', 200, FOUND)
+        cache.set('00000000', 422, NOT_FOUND)
+
+        results = sorted(ZipCode.search_many(['01001000', '00000000', ZIPCODE], cache=cache))
+
+        assert [(zipcode, status_code) for zipcode, status_code, _ in results] == [
+            ('00000000', 422), ('01001000', 200), (ZIPCODE, 200)
+        ]
+        assert cache.calls == 1
+        assert viacep.call_count == 1
+
+    def test_compact(self):
+        cache = MemoryCache()
+        cache.set(ZIPCODE, 200, FOUND)
+
+        (_, _, address), = ZipCode.search_many([ZIPCODE], cache=cache, compact=True)
+
+        assert address.zip_code == '78048-000'
+
+
+class TestStaleWhileRevalidate:
+
+    REFRESHED = dict(TestZipCodeCache.VIACEP_RESPONSE, bairro='Centro')
+
+    @pytest.fixture()
+    def revalidator(self, monkeypatch):
+        now = [0.0]
+        revalidator = Revalidator(workers=2, backoff=60, clock=lambda: now[0])
+        revalidator.now = now
+        monkeypatch.setattr(ZipCode, 'revalidator', revalidator)
+        yield revalidator
+        revalidator.join()
+
+    @pytest.fixture()
+    def cache(self, wall_clock):
+        cache = MemoryCache(ttl=100, negative_ttl=10, stale_ttl=1000)
+        cache.set(ZIPCODE, 200, FOUND)
+        wall_clock[0] += 150
+        return cache
+
+    def test_replaces_stale(self):
+        assert replaces_stale(200, 200, FOUND)
+        assert replaces_stale(422, 200, FOUND)
+        assert replaces_stale(422, 422, NOT_FOUND)
+        assert not replaces_stale(200, 422, NOT_FOUND)
+        assert not replaces_stale(200, 422, TIMEOUT)
+        assert not replaces_stale(422, 422, NETWORK)
+
+    def test_stale_entry_is_served_and_refreshed(self, cache, revalidator, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, json=self.REFRESHED)
+        client = ZipCode(ZIPCODE, cache=cache)
+
+        assert client.search() == (200, FOUND)
+        assert client.source == 'stale'
+
+        revalidator.join()
+
+        status_code, body = cache.get(ZIPCODE)
+
+        assert viacep.call_count == 1
+        assert body['data']['district'] == 'Centro'
+        assert not cache.is_stale(cache.get_entry(ZIPCODE)[0], status_code)
+        assert revalidator.stats() == {'running': 0, 'refreshes': 1, 'failures': 0}
+
+    def test_fresh_entry_is_not_refreshed(self, wall_clock, revalidator, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, json=self.REFRESHED)
+        cache = MemoryCache(ttl=100, stale_ttl=1000)
+        cache.set(ZIPCODE, 200, FOUND)
+        client = ZipCode(ZIPCODE, cache=cache)
+
+        assert client.search() == (200, FOUND)
+        assert client.source == 'cache'
+        assert viacep.call_count == 0
+
+    def test_past_the_hard_ttl_is_a_miss(self, cache, wall_clock, revalidator, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, json=self.REFRESHED)
+        wall_clock[0] += 1000
+        client = ZipCode(ZIPCODE, cache=cache)
+
+        status_code, body = client.search()
+
+        assert body['data']['district'] == 'Centro'
+        assert client.source == 'network'
+        assert viacep.call_count == 1
+        assert revalidator.refreshes == 0
+
+    def test_failed_refresh_keeps_the_stale_entry(self, cache, revalidator, requests_mock, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        monkeypatch.setattr(AbstractProvider, 'retry_policy', None)
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=503)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, status_code=503)
+
+        assert ZipCode(ZIPCODE, cache=cache).search() == (200, FOUND)
+        revalidator.join()
+
+        assert cache.get(ZIPCODE) == (200, FOUND)
+        assert revalidator.failures == 1
+
+        # Backing off: served stale without another refresh.
+        assert ZipCode(ZIPCODE, cache=cache).search() == (200, FOUND)
+        revalidator.join()
+        assert viacep.call_count == 1
+
+        revalidator.now[0] += 60
+        ZipCode(ZIPCODE, cache=cache).search()
+        revalidator.join()
+        assert viacep.call_count == 2
+
+    def test_not_found_does_not_replace_a_found_address(self, cache, revalidator, requests_mock, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=400)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, status_code=404)
+
+        ZipCode(ZIPCODE, cache=cache).search()
+        revalidator.join()
+
+        assert cache.get(ZIPCODE) == (200, FOUND)
+
+    def test_one_refresh_per_key(self, revalidator):
+        started = threading.Event()
+        release = threading.Event()
+
+        def refresh():
+            started.set()
+            release.wait(5)
+            return True
+
+        assert revalidator.submit('key', refresh)
+        started.wait(5)
+        assert not revalidator.submit('key', refresh)
+        assert revalidator.submit('other', lambda: True)
+
+        release.set()
+        revalidator.join()
+
+        assert revalidator.refreshes == 2
+        assert revalidator.submit('key', lambda: True)
+
+    def test_exceptions_count_as_failures(self, revalidator):
+        def refresh():
+            raise RuntimeError('boom')
+
+        revalidator.submit('key', refresh)
+        revalidator.join()
+
+        assert revalidator.failures == 1
+        assert not revalidator.submit('key', refresh)
+
+    def test_disabled_without_stale_ttl(self, wall_clock, revalidator, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, json=self.REFRESHED)
+        cache = MemoryCache(ttl=100)
+        cache.set(ZIPCODE, 200, FOUND)
+        wall_clock[0] += 150
+
+        status_code, body = ZipCode(ZIPCODE, cache=cache).search()
+
+        assert body['data']['district'] == 'Centro'
+        assert viacep.call_count == 1
+        assert revalidator.refreshes == 0
+
+    def test_instrumentation(self, cache, revalidator, requests_mock):
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, json=self.REFRESHED)
+        collector = instruments.add(MemoryCollector())
+
+        try:
+            ZipCode(ZIPCODE, cache=cache).search()
+            revalidator.join()
+        finally:
+            instruments.remove(collector)
+
+        assert 'source="stale"' in collector.render()
@@ -0,0 +1,172 @@
+import io
+import json
+import time
+
+import pytest
+
+from benchmarks.stub_server import ProviderBehavior, StubServer
+from hub_cep.cli import Progress, main, ordered_map
+
+
+CSV = 'id,cep\n1,78048-000\n2,abc\n3,01001000\n'
+
+
+def run(argv, text):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    assert main(argv, stdin=io.StringIO(text), stdout=stdout, stderr=stderr) == 0
+    return stdout.getvalue(), stderr.getvalue()
+
+
+class TestOrderedMap:
+
+    def test_keeps_input_order(self):
+        def slow(value):
+            time.sleep(0.01 * (5 - value))
+            return value * 2
+
+        assert list(ordered_map(slow, range(5), concurrency=5, window=5)) == [(n, n * 2) for n in range(5)]
+
+    def test_reads_at_most_window_items_ahead(self):
+        read = []
+
+        def items():
+            for value in range(100):
+                read.append(value)
+                yield value
+
+        results = ordered_map(lambda value: value, items(), concurrency=2, window=4)
+
+        assert next(results) == (0, 0)
+        assert len(read) == 4
+
+
+class TestCli:
+
+    def test_csv(self, server):
+        output, _ = run(['--format', 'csv', '--concurrency', '2'], CSV)
+        lines = output.splitlines()
+
+        assert lines[0] == 'id,cep,status,message,zip_code,address,number,info,district,city,state,country'
+        assert lines[1] == '1,78048-000,200,Success.,78048-000,Avenida Miguel Sutil,,,Alvorada,Cuiabá,MT,BRA'
+        assert lines[2] == '2,abc,422,Zipcode invalid.,,,,,,,,'
+        assert lines[3].startswith('3,01001000,200,')
+
+    def test_jsonl(self, server):
+        text = '{"order": 1, "shipping": "78048000"}\n\n{"order": 2, "shipping": null}\n'
+        output, _ = run(['--format', 'jsonl', '--field', 'shipping', '--prefix', 'cep_'], text)
+        records = [json.loads(line) for line in output.splitlines()]
+
+        assert [record['order'] for record in records] == [1, 2]
+        assert records[0]['cep_city'] == 'Cuiabá'
+        assert records[0]['cep_status'] == 200
+        assert records[1]['cep_status'] == 422
+        assert records[1]['cep_city'] is None
+
+    def test_converts_formats(self, server):
+        output, _ = run(['--format', 'csv', '--output-format', 'jsonl'], CSV)
+
+        assert json.loads(output.splitlines()[0])['city'] == 'Cuiabá'
+
+    def test_duplicates_are_looked_up_once(self, server):
+        run(['--format', 'csv'], 'cep\n' + '78048000\n' * 20)
+
+        assert server.hits['viacep'] == 1
+
+    def test_provider_selection(self, server):
+        run(['--format', 'csv', '--providers', 'postmon'], CSV)
+
+        assert server.hits['viacep'] == 0
+        assert server.hits['postmon'] == 2
+
+    def test_rate_limit(self, server):
+        run(['--format', 'csv', '--rate-limit', 'viacep=0.001:1', '--rate-limit-policy', 'skip'], CSV)
+
+        assert server.hits == {'viacep': 1, 'postmon': 1, 'cepaberto': 0}
+
+    def test_sqlite_cache(self, server, tmpdir):
+        path = str(tmpdir.join('cache.db'))
+
+        first, _ = run(['--format', 'csv', '--cache', path], CSV)
+        second, _ = run(['--format', 'csv', '--cache', path], CSV)
+
+        assert first == second
+        assert server.hits['viacep'] == 2
+
+    def test_reads_file(self, server, tmpdir):
+        source = tmpdir.join('input.jsonl')
+        source.write('{"cep": "78048000"}\n')
+
+        output, _ = run([str(source)], '')
+
+        assert json.loads(output)['state'] == 'MT'
+
+    def test_progress(self, server):
+        _, report = run(['--format', 'csv', '--progress'], CSV)
+
+        assert report.startswith('done: 3 rows, 2 found, 1 failed')
+
+    def test_output_is_not_flushed_row_by_row(self, server):
+        class Output(io.StringIO):
+            flushes = 0
+
+            def flush(self):
+                self.flushes += 1
+
+        stdout = Output()
+
+        assert main(['--format', 'csv'], stdin=io.StringIO(CSV), stdout=stdout) == 0
+        assert len(stdout.getvalue().splitlines()) == 4
+        assert stdout.flushes == 1
+
+    def test_not_found(self, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        behaviors = {name: ProviderBehavior(not_found_rate=1) for name in ('viacep', 'postmon')}
+
+        with StubServer(behaviors):
+            output, _ = run(['--format', 'jsonl'], '{"cep": "78048000"}\n')
+
+        assert json.loads(output)['message'] == 'Zip code not found.'
+
+    def test_missing_column(self):
+        with pytest.raises(SystemExit) as e:
+            run(['--format', 'csv', '--column', 'zip'], CSV)
+
+        assert 'zip' in str(e.value)
+
+    def test_malformed_jsonl(self, server):
+        with pytest.raises(SystemExit) as e:
+            run(['--format', 'jsonl'], '{"cep": "78048000"}\n{"cep": \n')
+
+        assert 'line 2 is not valid JSON' in str(e.value)
+
+    @pytest.mark.parametrize('argv', [
+        ['--providers', 'correios'],
+        ['--concurrency', '8', '--window', '2'],
+        ['--rate-limit', 'viacep=fast'],
+    ])
+    def test_invalid_arguments(self, argv, capsys):
+        with pytest.raises(SystemExit):
+            main(argv)
+
+
+def test_progress_reports_every_interval():
+    now = [0.0]
+    stream = io.StringIO()
+    progress = Progress(stream, interval=1.0, clock=lambda: now[0])
+
+    progress.update(200)
+    now[0] = 1.0
+    progress.update(422)
+
+    assert stream.getvalue() == '2 rows, 1 found, 1 failed, 2.0 rows/s, 1.0s\n'
+
+
+def test_progress_flushes_the_output_before_reporting():
+    output = io.StringIO()
+    output.flush = lambda: output.write('flushed\n')
+    progress = Progress(io.StringIO(), interval=1.0, clock=lambda: 0.0, output=output)
+
+    progress.update(200)
+    progress.report(final=True)
+
+    assert output.getvalue() == 'flushed\n'
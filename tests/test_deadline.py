@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+from hub_cep.deadline import Deadline
+from hub_cep.messages import Outcome
+from hub_cep.providers import Cepaberto, Postmon, Viacep
+from hub_cep.scheduler import ProviderScheduler
+from hub_cep.zipcode import ZipCode
+
+from .test_providers import ZIPCODE
+
+
+class TestDeadline:
+
+    def test_remaining(self, clock):
+        deadline = Deadline(2, clock=clock)
+        clock.now += 0.5
+
+        assert deadline.remaining() == 1.5
+        assert deadline.expired is False
+
+        clock.now += 2
+        assert deadline.remaining() == 0
+        assert deadline.expired is True
+
+    def test_splits_budget_between_attempts(self, clock):
+        deadline = Deadline(1.5, clock=clock)
+
+        assert deadline.timeout(3, connect=1, read=3) == (0.5, 0.5)
+        assert deadline.timeout(1, connect=1, read=3) == (1, 1.5)
+
+    def test_caps_with_per_call_timeouts(self, clock):
+        deadline = Deadline(30, clock=clock)
+
+        assert deadline.timeout(2, connect=0.5, read=3) == (0.5, 3)
+
+    def test_no_time_left(self, clock):
+        deadline = Deadline(1, clock=clock)
+        clock.now += 0.99
+
+        assert deadline.timeout(1) is None
+
+    def test_from_lambda_context(self):
+        class Context:
+            def get_remaining_time_in_millis(self):
+                return 1500
+
+        assert Deadline.from_lambda_context(Context(), margin=0.5).budget == 1.0
+
+    def test_coerce(self):
+        deadline = Deadline(1)
+
+        assert Deadline.coerce(None) is None
+        assert Deadline.coerce(deadline) is deadline
+        assert Deadline.coerce(0.25).budget == 0.25
+
+
+class TestZipCodeDeadline:
+
+    STRANGE = (True, {'error': True, 'message': 'An error ocurred.'})
+    FOUND = (False, {'error': False, 'message': 'Success.', 'data': {}})
+
+    def test_without_deadline_uses_default_timeouts(self, patch):
+        patch(Viacep, self.FOUND)
+
+        ZipCode(ZIPCODE).search()
+
+        assert patch.calls == [('viacep', None)]
+
+    def test_budget_is_split_between_providers(self, patch):
+        patch(Viacep, self.STRANGE)
+        patch(Postmon, self.STRANGE)
+        patch(Cepaberto, self.FOUND)
+
+        status_code, _ = ZipCode(ZIPCODE).search(deadline=0.9)
+        (_, first), (_, second), (_, third) = patch.calls
+
+        assert status_code == 200
+        assert first[1] == pytest.approx(0.3, abs=0.01)
+        assert second[1] == pytest.approx(0.45, abs=0.01)
+        assert third[1] == pytest.approx(0.9, abs=0.01)
+
+    def test_skips_providers_once_budget_is_spent(self, patch):
+        patch(Viacep, self.STRANGE, 0.2)
+        patch(Postmon, self.FOUND)
+        patch(Cepaberto, self.FOUND)
+
+        started = time.monotonic()
+        status_code, result = ZipCode(ZIPCODE).search(deadline=0.2)
+
+        assert time.monotonic() - started < 0.3
+        assert status_code == 422
+        assert result == {'error': True, 'timeout': True, 'message': 'Deadline exceeded.'}
+        assert patch.names() == ['viacep']
+
+    def test_skips_providers_slower_than_remaining_time(self, patch):
+        patch(Viacep, self.FOUND)
+        patch(Postmon, self.FOUND)
+        patch(Cepaberto, self.FOUND)
+
+        scheduler = ProviderScheduler(exploration=0)
+        scheduler.record('viacep', Outcome.SUCCESS, 2.0)
+        scheduler.record('postmon', Outcome.SUCCESS, 2.5)
+
+        status_code, _ = ZipCode(ZIPCODE, scheduler=scheduler).search(deadline=1)
+
+        assert status_code == 200
+        assert patch.names() == ['cepaberto']
+
+    def test_deadline_results_are_not_cached(self, patch):
+        from hub_cep.cache import MemoryCache
+
+        patch(Viacep, self.STRANGE, 0.1)
+        cache = MemoryCache()
+
+        ZipCode(ZIPCODE, cache=cache).search(deadline=0.1)
+
+        assert len(cache) == 0
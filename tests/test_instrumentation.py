@@ -0,0 +1,182 @@
+import pytest
+
+from hub_cep.cache import MemoryCache
+from hub_cep.instrumentation import (
+    CACHE,
+    NETWORK,
+    Instrument,
+    Instruments,
+    MemoryCollector,
+    SearchEvent,
+    instruments
+)
+from hub_cep.messages import Outcome
+from hub_cep.zipcode import ZipCode
+
+from . import test_providers
+from .test_providers import ZIPCODE
+
+
+VIACEP_RESPONSE = {
+    'cep': '78048-000',
+    'logradouro': 'Avenida Miguel Sutil',
+    'bairro': 'Alvorada',
+    'localidade': 'Cuiabá',
+    'uf': 'MT',
+}
+
+
+class Recorder(Instrument):
+
+    def __init__(self):
+        self.attempts = []
+        self.searches = []
+
+    def on_attempt(self, event):
+        self.attempts.append(event)
+
+    def on_search(self, event):
+        self.searches.append(event)
+
+
+@pytest.fixture()
+def recorder():
+    recorder = instruments.add(Recorder())
+    yield recorder
+    instruments.remove(recorder)
+
+
+@pytest.fixture()
+def collector():
+    collector = instruments.add(MemoryCollector())
+    yield collector
+    instruments.remove(collector)
+
+
+class TestInstruments:
+
+    def test_inactive_without_instruments(self):
+        registry = Instruments()
+
+        assert registry.active is False
+
+        instrument = registry.add(Instrument())
+        assert registry.active is True
+        assert len(registry) == 1
+
+        registry.remove(instrument)
+        assert registry.active is False
+
+    def test_broken_instrument_does_not_break_others(self):
+        class Broken(Instrument):
+            def on_search(self, event):
+                raise RuntimeError('boom')
+
+        registry = Instruments()
+        registry.add(Broken())
+        recorder = registry.add(Recorder())
+
+        registry.search(SearchEvent(ZIPCODE, 200, 0.1, 1, 'viacep', NETWORK))
+
+        assert len(recorder.searches) == 1
+
+    def test_search_does_not_build_events_when_disabled(self, requests_mock, monkeypatch):
+        def fail(*args, **kwargs):
+            raise AssertionError('event built')
+
+        monkeypatch.setattr('hub_cep.zipcode.AttemptEvent', fail)
+        monkeypatch.setattr('hub_cep.zipcode.SearchEvent', fail)
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, json=VIACEP_RESPONSE)
+
+        assert ZipCode(ZIPCODE).search()[0] == 200
+
+
+class TestSearchEvents:
+
+    def test_fallback_attempts(self, recorder, requests_mock):
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=404)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, json={'cep': '78048000'})
+
+        status_code, _ = ZipCode(ZIPCODE).search()
+
+        assert status_code == 200
+        assert [event.provider for event in recorder.attempts] == ['viacep', 'postmon']
+        assert [event.outcome for event in recorder.attempts] == [Outcome.NOT_FOUND, Outcome.SUCCESS]
+        assert [event.status_code for event in recorder.attempts] == [404, 200]
+        assert recorder.attempts[0].host == 'viacep.com.br'
+        assert recorder.attempts[0].message == 'Zip code not found.'
+
+        search, = recorder.searches
+        assert (search.status_code, search.attempts, search.provider, search.source) == (200, 2, 'postmon', NETWORK)
+        assert search.duration >= sum(event.duration for event in recorder.attempts)
+
+    def test_transport_failure_has_no_status_code(self, recorder, requests_mock, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, exc=test_providers.ConnectTimeout)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, status_code=404)
+
+        status_code, _ = ZipCode(ZIPCODE).search()
+
+        assert status_code == 422
+        assert recorder.attempts[0].outcome == Outcome.TIMEOUT
+        assert recorder.attempts[0].status_code is None
+        assert recorder.searches[0].provider is None
+
+    def test_cache_hit(self, recorder, requests_mock):
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, json=VIACEP_RESPONSE)
+        cache = MemoryCache()
+
+        ZipCode(ZIPCODE, cache=cache).search()
+        ZipCode(ZIPCODE, cache=cache).search()
+
+        assert [event.source for event in recorder.searches] == [NETWORK, CACHE]
+        assert recorder.searches[1].attempts == 0
+        assert len(recorder.attempts) == 1
+
+
+class TestMemoryCollector:
+
+    def test_counts_attempts_and_searches(self, collector, requests_mock):
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=404)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, json={'cep': '78048000'})
+
+        ZipCode(ZIPCODE).search()
+        ZipCode(ZIPCODE).search()
+
+        assert collector.counter('hub_cep_attempts_total', provider='viacep', outcome='not_found') == 2
+        assert collector.counter('hub_cep_attempts_total', outcome='success') == 2
+        assert collector.counter('hub_cep_searches_total', provider='postmon', status_code=200) == 2
+        assert collector.counter('hub_cep_search_attempts_total') == 4
+        assert collector.histogram('hub_cep_search_duration_seconds', source=NETWORK)['count'] == 2
+
+    def test_histogram_buckets_are_cumulative(self):
+        collector = MemoryCollector(buckets=(0.1, 1.0))
+
+        for duration in (0.05, 0.5, 5.0):
+            collector.on_search(SearchEvent(ZIPCODE, 200, duration, 1, 'viacep', NETWORK))
+
+        histogram = collector.histogram('hub_cep_search_duration_seconds', source=NETWORK)
+
+        assert histogram['buckets'] == [(0.1, 1), (1.0, 2), (float('inf'), 3)]
+        assert histogram['sum'] == pytest.approx(5.55)
+
+    def test_render_prometheus_text(self):
+        collector = MemoryCollector(buckets=(0.1,))
+        collector.on_search(SearchEvent(ZIPCODE, 200, 0.05, 1, 'viacep', NETWORK))
+
+        text = collector.render()
+
+        assert '# TYPE hub_cep_searches_total counter' in text
+        assert 'hub_cep_searches_total{source="network",provider="viacep",status_code="200"} 1' in text
+        assert '# TYPE hub_cep_search_duration_seconds histogram' in text
+        assert 'hub_cep_search_duration_seconds_bucket{source="network",le="0.1"} 1' in text
+        assert 'hub_cep_search_duration_seconds_bucket{source="network",le="+Inf"} 1' in text
+        assert 'hub_cep_search_duration_seconds_count{source="network"} 1' in text
+        assert text.endswith('\n')
+
+    def test_reset(self):
+        collector = MemoryCollector()
+        collector.on_search(SearchEvent(ZIPCODE, 200, 0.05, 1, 'viacep', NETWORK))
+        collector.reset()
+
+        assert collector.counter('hub_cep_searches_total') == 0
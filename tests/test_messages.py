@@ -1,6 +1,26 @@
 from hub_cep.messages import Messages
 
 
+def test_batch_too_large():
+    assert Messages.BATCH_TOO_LARGE.name == 'BATCH_TOO_LARGE'
+    assert Messages.BATCH_TOO_LARGE.value == 'Too many zip codes.'
+
+
+def test_deadline_exceeded():
+    assert Messages.DEADLINE_EXCEEDED.name == 'DEADLINE_EXCEEDED'
+    assert Messages.DEADLINE_EXCEEDED.value == 'Deadline exceeded.'
+
+
+def test_invalid_request():
+    assert Messages.INVALID_REQUEST.name == 'INVALID_REQUEST'
+    assert Messages.INVALID_REQUEST.value == 'Invalid request.'
+
+
+def test_method_not_allowed():
+    assert Messages.METHOD_NOT_ALLOWED.name == 'METHOD_NOT_ALLOWED'
+    assert Messages.METHOD_NOT_ALLOWED.value == 'Method not allowed.'
+
+
 def test_network_error():
     assert Messages.NETWORK_ERROR.name == 'NETWORK_ERROR'
     assert Messages.NETWORK_ERROR.value == 'Network error.'
@@ -11,6 +31,21 @@ def test_not_implemented():
     assert Messages.NOT_IMPLEMENTED.value == 'Should implement.'
 
 
+def test_provider_unavailable():
+    assert Messages.PROVIDER_UNAVAILABLE.name == 'PROVIDER_UNAVAILABLE'
+    assert Messages.PROVIDER_UNAVAILABLE.value == 'Provider unavailable.'
+
+
+def test_rate_limited():
+    assert Messages.RATE_LIMITED.name == 'RATE_LIMITED'
+    assert Messages.RATE_LIMITED.value == 'Rate limited.'
+
+
+def test_route_not_found():
+    assert Messages.ROUTE_NOT_FOUND.name == 'ROUTE_NOT_FOUND'
+    assert Messages.ROUTE_NOT_FOUND.value == 'Route not found.'
+
+
 def test_strange_error():
     assert Messages.STRANGE_ERROR.name == 'STRANGE_ERROR'
     assert Messages.STRANGE_ERROR.value == 'An error ocurred.'
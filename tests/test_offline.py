@@ -0,0 +1,144 @@
+import os
+
+import pytest
+
+from hub_cep.offline import HEADER, RECORD, Offline, OfflineIndex, build_index, main
+from hub_cep.zipcode import ZipCode
+
+from . import test_providers
+from .test_providers import ZIPCODE
+
+
+CSV = '''cep,logradouro,bairro,cidade,uf
+78048-000,Avenida Miguel Sutil,Alvorada,Cuiabá,MT
+01310-100,Avenida Paulista,Bela Vista,São Paulo,SP
+01310-200,Avenida Paulista,Bela Vista,São Paulo,SP
+20040-002,Rua da Assembleia,Centro,Rio de Janeiro,RJ
+invalid,Rua,Bairro,Cidade,UF
+'''
+
+
+@pytest.fixture()
+def index(tmpdir):
+    source = tmpdir.join('dne.csv')
+    source.write_text(CSV, encoding='utf-8')
+    path = str(tmpdir.join('dne.idx'))
+
+    build_index(str(source), path)
+    index = OfflineIndex(path)
+    yield index
+    index.close()
+
+
+class TestBuildIndex:
+
+    def test_skips_invalid_rows(self, index):
+        assert len(index) == 4
+
+    def test_deduplicates_strings(self, index):
+        # '' plus 3 distinct addresses, districts, cities and states
+        assert index.string_count == 1 + 3 + 3 + 3 + 3
+
+    def test_fixed_width_layout(self, index):
+        strings = os.path.getsize(index.path) - index._strings
+
+        assert index._offsets == HEADER.size + 4 * RECORD.size
+        assert strings == len('Avenida Miguel SutilAlvoradaCuiabáMTAvenida PaulistaBela VistaSão PauloSP'
+                              'Rua da AssembleiaCentroRio de JaneiroRJ'.encode('utf-8'))
+
+    def test_custom_columns(self, tmpdir):
+        source = tmpdir.join('custom.csv')
+        source.write_text('CEP;RUA;BAIRRO;CIDADE;ESTADO\n78048000;Rua;Centro;Cuiabá;MT\n', encoding='utf-8')
+        path = str(tmpdir.join('custom.idx'))
+
+        count = build_index(
+            str(source), path, {'cep': 'CEP', 'address': 'RUA', 'district': 'BAIRRO', 'city': 'CIDADE',
+                                'state': 'ESTADO'}, delimiter=';'
+        )
+        index = OfflineIndex(path)
+
+        assert count == 1
+        assert index.lookup(ZIPCODE)['address'] == 'Rua'
+        index.close()
+
+    def test_command(self, tmpdir, capsys):
+        source = tmpdir.join('dne.csv')
+        source.write_text(CSV, encoding='utf-8')
+        path = str(tmpdir.join('dne.idx'))
+
+        assert main([str(source), path]) == 0
+        assert capsys.readouterr().out == f'4 zip codes written to {path}.\n'
+
+    def test_raises_value_error_on_unknown_file(self, tmpdir):
+        path = tmpdir.join('other.idx')
+        path.write_binary(b'\0' * 64)
+
+        with pytest.raises(ValueError):
+            OfflineIndex(str(path))
+
+
+class TestOfflineIndex:
+
+    def test_lookup(self, index):
+        assert index.lookup('01310100') == {
+            'cep': '01310-100', 'address': 'Avenida Paulista', 'district': 'Bela Vista',
+            'city': 'São Paulo', 'state': 'SP'
+        }
+
+    def test_lookup_formatted_zipcode(self, index):
+        assert index.lookup('78048-000')['city'] == 'Cuiabá'
+
+    @pytest.mark.parametrize('zipcode', ['01310150', '00000000', '99999999', 'abc', ''])
+    def test_lookup_missing(self, index, zipcode):
+        assert index.lookup(zipcode) is None
+
+    def test_contains(self, index):
+        assert '20040002' in index
+        assert '20040003' not in index
+
+    @pytest.mark.parametrize('keep', [0.5, 0.9, -1])
+    def test_rejects_truncated_files(self, index, tmpdir, keep):
+        with open(index.path, 'rb') as f:
+            data = f.read()
+
+        path = tmpdir.join('truncated.idx')
+        path.write_binary(data[:int(len(data) * keep)] if keep > 0 else data[:keep])
+
+        with pytest.raises(ValueError, match='truncated'):
+            OfflineIndex(str(path))
+
+
+class TestOffline:
+
+    def test_search(self, index):
+        error, info = Offline(ZIPCODE, index).search()
+
+        assert error is False
+        assert info == {
+            'error': False, 'message': 'Success.',
+            'data': {
+                'zip_code': '78048-000', 'address': 'Avenida Miguel Sutil', 'number': '', 'info': '',
+                'district': 'Alvorada', 'city': 'Cuiabá', 'state': 'MT', 'country': 'BRA'
+            }
+        }
+
+    def test_search_not_found(self, index):
+        assert Offline('01310150', index).search() == (True, {'error': True, 'message': 'Zip code not found.'})
+
+    def test_zipcode_consults_offline_index_first(self, index, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=500)
+
+        status_code, result = ZipCode(ZIPCODE, offline=index).search()
+
+        assert status_code == 200
+        assert result['data']['district'] == 'Alvorada'
+        assert viacep.call_count == 0
+
+    def test_zipcode_falls_back_to_network(self, index, requests_mock):
+        url = test_providers.TestViacep.FAKE_BASE_URL.format('01310150')
+        viacep = requests_mock.get(url, json={'cep': '01310-150', 'uf': 'SP'})
+
+        status_code, result = ZipCode('01310150', offline=index).search()
+
+        assert status_code == 200
+        assert viacep.call_count == 1
@@ -0,0 +1,101 @@
+import io
+import os
+
+import pytest
+
+from hub_cep.cli import main
+from hub_cep.parallel import ProcessBatch, share_limits
+from hub_cep.providers import Viacep
+from hub_cep.registry import BUILTIN, ProviderRegistry
+from hub_cep.zipcode import ZipCode
+
+
+ZIPCODES = ['78048-000', 'abc', '01001000', '78048000', '01310100', '20040002', 78048000, '01001-000']
+
+
+class Mirror(Viacep):
+
+    NAME = 'mirror'
+
+
+def test_share_limits():
+    assert share_limits({'viacep': {'rate': 10, 'burst': 4}}, 4) == {'viacep': {'rate': 2.5, 'burst': 1.0}}
+
+
+class TestProcessBatch:
+
+    def test_results_in_input_order(self, server):
+        with ProcessBatch(processes=2, chunk_size=2) as batch:
+            results = list(batch.search(ZIPCODES))
+
+        assert [value for value, _, _ in results] == ZIPCODES
+        assert [status_code for _, status_code, _ in results] == [200, 422, 200, 200, 200, 200, 200, 200]
+        assert results[0][2]['data']['city'] == 'Cuiabá'
+        assert results[1][2] == {'error': True, 'message': 'Zipcode invalid.'}
+
+    def test_each_zipcode_is_fetched_once(self, server):
+        with ProcessBatch(processes=2, chunk_size=2) as batch:
+            list(batch.search(ZIPCODES * 3))
+
+        assert server.hits['viacep'] == 4
+
+    def test_key(self, server):
+        rows = [{'id': 1, 'cep': '78048000'}, {'id': 2, 'cep': None}]
+
+        with ProcessBatch(processes=1) as batch:
+            results = list(batch.search(rows, key=lambda row: row['cep']))
+
+        assert [(row['id'], status_code) for row, status_code, _ in results] == [(1, 200), (2, 422)]
+
+    def test_cache_is_shared_between_batches(self, server, tmp_path):
+        path = str(tmp_path / 'cache.sqlite')
+
+        with ProcessBatch(processes=2, chunk_size=1, cache_path=path) as batch:
+            list(batch.search(ZIPCODES))
+
+        with ProcessBatch(processes=2, chunk_size=1, cache_path=path) as batch:
+            assert [status_code for _, status_code, _ in batch.search(ZIPCODES)][0] == 200
+
+        assert server.hits['viacep'] == 4
+
+    def test_registered_providers_reach_the_workers(self, server, monkeypatch):
+        registry = ProviderRegistry(BUILTIN)
+        registry.register('mirror', Mirror, retry_policy=None)
+        monkeypatch.setattr(ZipCode, 'registry', registry)
+
+        with ProcessBatch(processes=1, provider_names=('mirror',)) as batch:
+            assert [status_code for _, status_code, _ in batch.search(['78048000'])] == [200]
+
+        assert server.hits['viacep'] == 1
+
+    def test_close_drops_pending_chunks(self, server):
+        batch = ProcessBatch(processes=1, chunk_size=1)
+        results = batch.search(ZIPCODES * 4)
+        next(results)
+        pool = batch.pool
+        batch.close()
+
+        assert batch._pool is None
+
+        with pytest.raises(ValueError):
+            pool.apply_async(len, ([],))
+
+    def test_temporary_cache_is_removed(self, server):
+        batch = ProcessBatch(processes=1)
+        list(batch.search(['78048000']))
+        batch.close()
+
+        assert not os.path.exists(batch.cache_path)
+
+
+def test_cli_processes(server):
+    stdout = io.StringIO()
+    text = 'id,cep\n1,78048-000\n2,abc\n3,78048000\n'
+
+    assert main(['--processes', '2', '--chunk-size', '1'], stdin=io.StringIO(text), stdout=stdout) == 0
+
+    lines = stdout.getvalue().splitlines()
+    assert [line.split(',')[:3] for line in lines[1:]] == [
+        ['1', '78048-000', '200'], ['2', 'abc', '422'], ['3', '78048000', '200'],
+    ]
+    assert server.hits['viacep'] == 1
@@ -124,6 +124,15 @@ class TestViacep:
         assert info == {'error': True, 'timeout': False, 'message': 'Network error.'}
         assert res is None
 
+    def test_raises_connection_error_with_reason_on_request(self, requests_mock):
+        client = Viacep(ZIPCODE)
+        requests_mock._adapter.register_uri('GET', TestViacep.FAKE_URL, exc=ConnectionError(OSError('refused')))
+        error, info, res = client.call(TestViacep.FAKE_URL)
+
+        assert error is True
+        assert info == {'error': True, 'timeout': False, 'message': 'Network error.'}
+        assert res is None
+
     def test_raises_exception_on_request(self, requests_mock):
         client = Viacep(ZIPCODE)
         requests_mock._adapter.register_uri('GET', TestViacep.FAKE_URL, exc=Exception('Some error'))
@@ -0,0 +1,168 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hub_cep.cache import MemoryCache
+from hub_cep.ratelimit import FAIL, SKIP, WAIT, RateLimiter, RateLimiterRegistry
+from hub_cep.zipcode import ZipCode
+
+from . import test_providers
+from .test_providers import ZIPCODE
+
+
+VIACEP_RESPONSE = {'cep': '78048-000', 'localidade': 'Cuiabá', 'uf': 'MT'}
+POSTMON_RESPONSE = {'cep': '78048-000', 'cidade': 'Cuiabá', 'estado': 'MT'}
+
+
+class TestRateLimiter:
+
+    def test_unlimited_by_default(self):
+        limiter = RateLimiter('viacep', rate=0)
+
+        assert all(limiter.reserve() == 0.0 for _ in range(1000))
+
+    def test_burst_then_rate(self, clock):
+        limiter = RateLimiter('viacep', rate=2, burst=3, policy=SKIP, clock=clock)
+
+        assert [limiter.reserve() for _ in range(4)] == [0.0, 0.0, 0.0, None]
+
+        clock.now = 0.5
+        assert limiter.reserve() == 0.0
+        assert limiter.reserve() is None
+
+    def test_refill_is_capped_by_burst(self, clock):
+        limiter = RateLimiter('viacep', rate=10, burst=2, policy=SKIP, clock=clock)
+        limiter.reserve()
+        clock.now = 60
+
+        assert limiter.snapshot()['tokens'] == 2
+
+    def test_waiters_reserve_in_order(self, clock):
+        limiter = RateLimiter('viacep', rate=4, burst=1, policy=WAIT, max_wait=1, clock=clock)
+
+        assert limiter.reserve() == 0.0
+        assert limiter.reserve() == pytest.approx(0.25)
+        assert limiter.reserve() == pytest.approx(0.5)
+        assert limiter.reserve(max_wait=0.5) is None
+        assert limiter.reserve() == pytest.approx(0.75)
+
+    def test_skip_and_fail_never_wait(self):
+        assert RateLimiter('viacep', rate=1, policy=SKIP, max_wait=5).max_wait == 0
+        assert RateLimiter('viacep', rate=1, policy=FAIL, max_wait=5).max_wait == 0
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            RateLimiter('viacep', policy='retry')
+
+    def test_acquire(self, monkeypatch):
+        slept = []
+        monkeypatch.setattr('hub_cep.ratelimit.sleep', slept.append)
+        limiter = RateLimiter('viacep', rate=10, burst=1, max_wait=1)
+
+        assert limiter.acquire() is True
+        assert limiter.acquire() is True
+        assert limiter.acquire(max_wait=0) is False
+        assert len(slept) == 1
+
+    def test_shared_between_threads(self):
+        limiter = RateLimiter('viacep', rate=0.001, burst=5, policy=SKIP)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            granted = list(executor.map(lambda _: limiter.reserve() is not None, range(100)))
+
+        assert sum(granted) == 5
+
+
+class TestRateLimiterRegistry:
+
+    def test_one_limiter_per_provider(self):
+        registry = RateLimiterRegistry(rate=5)
+
+        assert registry.get('viacep') is registry.get('viacep')
+        assert registry.get('viacep') is not registry.get('postmon')
+        assert registry.get('postmon').rate == 5
+
+    def test_configure_overrides_defaults(self):
+        registry = RateLimiterRegistry(rate=5, policy=SKIP)
+        registry.get('viacep')
+        registry.configure('viacep', rate=1, burst=2)
+
+        assert registry.get('viacep').rate == 1
+        assert registry.get('viacep').burst == 2
+        assert registry.get('viacep').policy == SKIP
+        assert set(registry.snapshot()) == {'viacep'}
+
+
+class TestZipcodeRateLimit:
+
+    @pytest.fixture()
+    def providers(self, requests_mock, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, json=VIACEP_RESPONSE)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, json=POSTMON_RESPONSE)
+        return requests_mock
+
+    @staticmethod
+    def hits(requests_mock):
+        return [request.hostname.split('.')[-3] for request in requests_mock.request_history]
+
+    def test_skips_to_next_provider(self, providers):
+        limiters = RateLimiterRegistry(policy=SKIP)
+        limiters.configure('viacep', rate=0.001, burst=1)
+
+        results = [ZipCode(ZIPCODE, limiters=limiters).search()[0] for _ in range(3)]
+
+        assert results == [200, 200, 200]
+        assert self.hits(providers) == ['viacep', 'postmon', 'postmon']
+
+    def test_all_providers_limited(self, providers):
+        limiters = RateLimiterRegistry(rate=0.001, burst=1, policy=SKIP)
+        cache = MemoryCache()
+        ZipCode(ZIPCODE, limiters=limiters).search()
+        ZipCode(ZIPCODE, limiters=limiters).search()
+
+        status_code, body = ZipCode(ZIPCODE, limiters=limiters, cache=cache).search()
+
+        assert (status_code, body) == (422, {'error': True, 'message': 'Rate limited.'})
+        assert len(cache) == 0
+
+    def test_fail_fast(self, providers):
+        limiters = RateLimiterRegistry(policy=FAIL)
+        limiters.configure('viacep', rate=0.001, burst=1)
+        ZipCode(ZIPCODE, limiters=limiters).search()
+
+        assert ZipCode(ZIPCODE, limiters=limiters).search() == (422, {'error': True, 'message': 'Rate limited.'})
+        assert self.hits(providers) == ['viacep']
+
+    def test_fail_fast_concurrent(self, providers):
+        limiters = RateLimiterRegistry(rate=0.001, burst=1, policy=FAIL)
+
+        for name in ('viacep', 'postmon'):
+            limiters.get(name).reserve(0)
+
+        status_code, body = ZipCode(ZIPCODE, strategy='race', limiters=limiters).search()
+
+        assert (status_code, body['message']) == (422, 'Rate limited.')
+        assert self.hits(providers) == []
+
+    def test_waits_for_a_token(self, providers, monkeypatch):
+        slept = []
+        monkeypatch.setattr('hub_cep.zipcode.sleep', slept.append)
+        limiters = RateLimiterRegistry(rate=10, burst=1, policy=WAIT, max_wait=1)
+
+        for _ in range(3):
+            ZipCode(ZIPCODE, limiters=limiters).search()
+
+        assert self.hits(providers) == ['viacep'] * 3
+        assert len(slept) == 2
+        assert all(0 < wait <= 0.2 for wait in slept)
+
+    def test_wait_is_bounded_by_the_deadline(self, providers, monkeypatch):
+        monkeypatch.setattr('hub_cep.zipcode.sleep', lambda wait: None)
+        limiters = RateLimiterRegistry(policy=WAIT, max_wait=10)
+        limiters.configure('viacep', rate=0.5, burst=1)
+        ZipCode(ZIPCODE, limiters=limiters).search()
+
+        ZipCode(ZIPCODE, limiters=limiters).search(deadline=1)
+
+        assert self.hits(providers) == ['viacep', 'postmon']
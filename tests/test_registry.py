@@ -0,0 +1,182 @@
+import subprocess
+import sys
+try:
+    from importlib.metadata import EntryPoint
+except ImportError:
+    from importlib_metadata import EntryPoint
+
+import pytest
+
+from hub_cep import registry as registry_module
+from hub_cep.cache import MemoryCache
+from hub_cep.messages import Messages
+from hub_cep.providers import AbstractProvider, Cepaberto, Postmon, Viacep
+from hub_cep.registry import BUILTIN, ProviderRegistry, default_registry, load
+from hub_cep.zipcode import ZipCode
+
+from .test_providers import ZIPCODE
+
+
+class InHouse(AbstractProvider):
+
+    NAME = 'inhouse'
+    API_URL = 'http://cep.internal/{}'
+
+    def get_url(self):
+        return self.API_URL.format(self.zipcode)
+
+    def search(self, timeout=None):
+        return False, {'error': False, 'message': Messages.SUCCESS.value, 'data': self.translate({})}
+
+    def translate(self, info: dict):
+        return {'zip_code': self.zipcode, 'city': 'Cuiabá', 'url': self.get_url()}
+
+
+@pytest.fixture()
+def registry(monkeypatch):
+    scans = []
+
+    def entry_points(group):
+        scans.append(group)
+        return {'inhouse': EntryPoint('inhouse', 'tests.test_registry:InHouse', group)}
+
+    monkeypatch.setattr(registry_module, 'entry_points', entry_points)
+    registry = ProviderRegistry(BUILTIN)
+    registry.scans = scans
+    return registry
+
+
+class TestProviderRegistry:
+
+    def test_load(self):
+        assert load('hub_cep.providers:Viacep') is Viacep
+        assert load('hub_cep.registry:ProviderRegistry.get') is ProviderRegistry.get
+        assert load(Postmon) is Postmon
+
+    def test_builtin_providers(self, registry):
+        assert registry.get('viacep') is Viacep
+        assert registry.get('cepaberto') is Cepaberto
+        assert registry.scans == []
+
+    def test_classes_are_resolved_once(self, registry, monkeypatch):
+        calls = []
+        monkeypatch.setattr(registry_module, 'load', lambda target: calls.append(target) or Viacep)
+
+        registry.get('viacep')
+        registry.get('viacep')
+
+        assert calls == ['hub_cep.providers:Viacep']
+
+    def test_entry_points(self, registry):
+        assert registry.names() == ('viacep', 'postmon', 'cepaberto', 'inhouse')
+        assert 'inhouse' in registry
+        assert registry.get('inhouse') is InHouse
+
+        registry.get('inhouse')
+
+        assert registry.scans == ['hub_cep.providers']
+
+    def test_unknown_provider(self, registry):
+        assert 'correios' not in registry
+
+        with pytest.raises(ValueError):
+            registry.get('correios')
+
+    def test_register(self, registry):
+        registry.register('viacep', InHouse)
+        registry.register('backup', 'hub_cep.providers:Postmon')
+
+        assert registry.get('viacep') is InHouse
+        assert registry.get('backup') is Postmon
+        assert registry.names() == ('viacep', 'postmon', 'cepaberto', 'backup', 'inhouse')
+
+    def test_configure(self, registry):
+        registry.get('viacep')
+        registry.configure('viacep', API_URL='http://viacep.internal/{}', retry_policy=None)
+        viacep = registry.get('viacep')
+
+        assert issubclass(viacep, Viacep)
+        assert viacep.API_URL == 'http://viacep.internal/{}'
+        assert viacep.retry_policy is None
+        assert Viacep.API_URL != viacep.API_URL
+        assert registry.get('viacep') is viacep
+        assert registry.snapshot()['viacep'] == {
+            'class': 'hub_cep.providers.Viacep',
+            'options': {'API_URL': 'http://viacep.internal/{}', 'retry_policy': None}
+        }
+
+    def test_state_and_restore(self, registry):
+        registry.register('inhouse', InHouse, API_URL='http://cep.acme/{}')
+        registry.configure('viacep', retry_policy=None)
+        state = registry.state()
+
+        other = ProviderRegistry(BUILTIN)
+        other.get('viacep')
+        other.restore(state)
+
+        assert issubclass(other.get('inhouse'), InHouse)
+        assert other.get('inhouse').API_URL == 'http://cep.acme/{}'
+        assert other.get('viacep').retry_policy is None
+        assert state == {
+            'targets': {'inhouse': InHouse},
+            'options': {'inhouse': {'API_URL': 'http://cep.acme/{}'}, 'viacep': {'retry_policy': None}},
+        }
+
+
+class TestZipCodeProviders:
+
+    @pytest.fixture()
+    def client(self, registry):
+        registry.configure('inhouse', API_URL='http://cep.acme/{}')
+
+        return type('ZipCode', (ZipCode,), {'registry': registry, 'provider_names': ('inhouse', 'viacep')})
+
+    def test_plugin_in_the_chain(self, client):
+        client = client(ZIPCODE)
+        status_code, body = client.search()
+
+        assert status_code == 200
+        assert body['data']['url'] == f'http://cep.acme/{ZIPCODE}'
+        assert [provider.NAME for provider in client.providers] == ['inhouse', 'viacep']
+
+    def test_providers_are_built_on_first_use(self, client):
+        cache = MemoryCache()
+        cache.set(ZIPCODE, 200, {'error': False, 'message': 'Success.', 'data': {}})
+        client = client(ZIPCODE, cache=cache)
+
+        client.search()
+
+        assert client._providers == {}
+        assert client.provider('viacep') is client.provider('viacep')
+
+    def test_cepaberto_needs_a_token(self, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+
+        assert ZipCode(ZIPCODE).cepaberto is None
+        assert [provider.NAME for provider in ZipCode(ZIPCODE).providers] == ['viacep', 'postmon']
+
+        monkeypatch.setenv('CEPABERTO_TOKEN', '123')
+
+        assert ZipCode(ZIPCODE).cepaberto.token == '123'
+
+    def test_provider_classes(self, client):
+        inhouse, viacep = client.provider_classes()
+
+        assert issubclass(inhouse, InHouse)
+        assert inhouse.API_URL == 'http://cep.acme/{}'
+        assert viacep is Viacep
+
+    def test_unknown_provider_in_the_chain(self, client):
+        client.provider_names = ('correios',)
+
+        with pytest.raises(ValueError):
+            client(ZIPCODE).search()
+
+    def test_default_registry(self):
+        assert ZipCode.registry is default_registry
+
+    def test_importing_the_client_loads_no_provider(self):
+        code = 'import sys, hub_cep.cli; print("requests" in sys.modules, "hub_cep.providers" in sys.modules)'
+        output = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True)
+
+        assert output.split() == ['False', 'False']
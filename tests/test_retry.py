@@ -0,0 +1,162 @@
+import random
+
+import pytest
+from requests.exceptions import ConnectionError, ReadTimeout, SSLError, TooManyRedirects
+
+from hub_cep.messages import Outcome
+from hub_cep.providers import Cepaberto, Postmon, Viacep
+from hub_cep.retry import RetryPolicy
+from hub_cep.zipcode import ZipCode
+
+from . import test_providers
+from .test_providers import ZIPCODE
+
+
+VIACEP_RESPONSE = {'cep': '78048-000', 'localidade': 'Cuiabá', 'uf': 'MT'}
+
+
+class MaxRandom(random.Random):
+
+    def uniform(self, low, high):
+        return high
+
+
+class TestRetryPolicy:
+
+    def test_exponential_backoff_is_capped(self):
+        policy = RetryPolicy(backoff=0.1, max_backoff=0.3, rng=MaxRandom())
+
+        assert [policy.delay(retry) for retry in (1, 2, 3, 4)] == [0.1, 0.2, 0.3, 0.3]
+
+    def test_full_jitter(self):
+        policy = RetryPolicy(backoff=0.1, rng=random.Random(1))
+        delays = [policy.delay(1) for _ in range(100)]
+
+        assert all(0 <= delay <= 0.1 for delay in delays)
+        assert len(set(delays)) == 100
+
+    def test_should_retry(self):
+        provider = Viacep(ZIPCODE)
+        provider.status_code = 503
+        policy = RetryPolicy(attempts=3)
+
+        assert policy.should_retry(provider, 1, Outcome.ERROR) is True
+        assert policy.should_retry(provider, 3, Outcome.ERROR) is False
+        assert policy.should_retry(provider, 1, Outcome.NOT_FOUND) is False
+        assert policy.should_retry(provider, 1, Outcome.SUCCESS) is False
+
+
+class TestRetryable:
+
+    @pytest.mark.parametrize('exception, expected', [
+        (ConnectionError('Connection reset by peer'), True),
+        (ReadTimeout('Read timed out.'), True),
+        (SSLError('certificate verify failed'), False),
+        (TooManyRedirects('Exceeded 30 redirects.'), False),
+    ])
+    def test_exceptions(self, exception, expected):
+        provider = Viacep(ZIPCODE)
+        provider.exception = exception
+
+        assert provider.retryable() is expected
+
+    @pytest.mark.parametrize('provider, status_code, expected', [
+        (Viacep(ZIPCODE), 503, True),
+        (Viacep(ZIPCODE), 500, True),
+        (Viacep(ZIPCODE), 406, False),
+        (Postmon(ZIPCODE), 405, False),
+        (Cepaberto(ZIPCODE, '123'), 500, False),
+        (Viacep(ZIPCODE), None, False),
+    ])
+    def test_status_codes(self, provider, status_code, expected):
+        provider.status_code = status_code
+
+        assert provider.retryable() is expected
+
+
+class TestZipcodeRetries:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        self.slept = []
+        monkeypatch.setattr('hub_cep.zipcode.sleep', self.slept.append)
+
+    def test_retries_server_errors(self, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, [
+            {'status_code': 503}, {'json': VIACEP_RESPONSE},
+        ])
+        postmon = requests_mock.get(test_providers.TestPostmon.FAKE_URL, status_code=404)
+
+        assert ZipCode(ZIPCODE).search()[0] == 200
+        assert (viacep.call_count, postmon.call_count) == (2, 0)
+        assert len(self.slept) == 1
+
+    def test_retries_dropped_connections(self, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, [
+            {'exc': ConnectionError('Connection reset by peer')}, {'json': VIACEP_RESPONSE},
+        ])
+
+        assert ZipCode(ZIPCODE).search()[0] == 200
+        assert viacep.call_count == 2
+
+    def test_retries_timeouts_within_a_deadline(self, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, [
+            {'exc': ReadTimeout('Read timed out')}, {'json': VIACEP_RESPONSE},
+        ])
+
+        assert ZipCode(ZIPCODE).search(deadline=5)[0] == 200
+        assert viacep.call_count == 2
+
+    def test_no_timeout_retry_without_a_deadline(self, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, exc=ReadTimeout('Read timed out'))
+        postmon = requests_mock.get(test_providers.TestPostmon.FAKE_URL, json={'cep': '78048000'})
+
+        assert ZipCode(ZIPCODE).search()[0] == 200
+        assert (viacep.call_count, postmon.call_count) == (1, 1)
+        assert self.slept == []
+
+    def test_never_retries_not_found(self, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=404)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, status_code=404)
+
+        assert ZipCode(ZIPCODE).search() == (422, {'error': True, 'message': 'Zip code not found.'})
+        assert viacep.call_count == 1
+        assert self.slept == []
+
+    def test_attempts_are_capped(self, requests_mock, monkeypatch):
+        monkeypatch.setattr(Viacep, 'retry_policy', RetryPolicy(attempts=3))
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=503)
+        postmon = requests_mock.get(test_providers.TestPostmon.FAKE_URL, status_code=503)
+
+        ZipCode(ZIPCODE).search()
+
+        assert viacep.call_count == 3
+        assert postmon.call_count == 2
+
+    def test_disabled_per_provider(self, requests_mock, monkeypatch):
+        monkeypatch.setattr(Viacep, 'retry_policy', None)
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=503)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, json={'cep': '78048000'})
+
+        assert ZipCode(ZIPCODE).search()[0] == 200
+        assert viacep.call_count == 1
+
+    def test_respects_the_deadline(self, requests_mock, monkeypatch):
+        monkeypatch.setattr(Viacep, 'retry_policy', RetryPolicy(backoff=5, max_backoff=5, rng=MaxRandom()))
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=503)
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, json={'cep': '78048000'})
+
+        assert ZipCode(ZIPCODE).search(deadline=2)[0] == 200
+        assert viacep.call_count == 1
+        assert self.slept == []
+
+    def test_stops_once_a_concurrent_search_is_answered(self, requests_mock):
+        viacep = requests_mock.get(test_providers.TestViacep.FAKE_URL, status_code=503)
+        zipcode = ZipCode(ZIPCODE)
+        zipcode.settled = True
+
+        error, _ = zipcode.attempt(Viacep(ZIPCODE))
+
+        assert error is True
+        assert viacep.call_count == 1
@@ -0,0 +1,147 @@
+import random
+
+import pytest
+from requests.exceptions import ReadTimeout, SSLError
+
+from hub_cep.messages import Outcome, classify
+from hub_cep.providers import Cepaberto, Postmon, Viacep
+from hub_cep.scheduler import ProviderScheduler
+from hub_cep.zipcode import ZipCode
+
+from . import test_providers
+from .test_providers import ZIPCODE
+
+
+FOUND = (False, {'error': False, 'message': 'Success.', 'data': {}})
+NOT_FOUND = (True, {'error': True, 'message': 'Zip code not found.'})
+STRANGE = (True, {'error': True, 'message': 'An error ocurred.'})
+
+
+@pytest.mark.parametrize('result, expected', [
+    (FOUND, Outcome.SUCCESS),
+    (NOT_FOUND, Outcome.NOT_FOUND),
+    (STRANGE, Outcome.ERROR),
+    ((True, {'error': True, 'timeout': True, 'message': 'Read timed out.'}), Outcome.TIMEOUT),
+    ((True, {'error': True, 'timeout': False, 'message': 'Network error.'}), Outcome.NETWORK_ERROR),
+])
+def test_classify(result, expected):
+    assert classify(*result) == expected
+
+
+@pytest.mark.parametrize('exception, expected', [
+    (ReadTimeout('Read timed out.'), Outcome.TIMEOUT),
+    (SSLError('certificate verify failed'), Outcome.NETWORK_ERROR),
+])
+def test_outcome_follows_the_exception(exception, expected, requests_mock):
+    requests_mock.get(test_providers.TestViacep.FAKE_URL, exc=exception)
+    provider = Viacep(ZIPCODE)
+    error, data = provider.search()
+
+    assert data['timeout'] is True
+    assert ZipCode.outcome(provider, error, data) == expected
+
+
+class TestProviderScheduler:
+
+    @pytest.fixture()
+    def providers(self):
+        return [Viacep(ZIPCODE), Postmon(ZIPCODE), Cepaberto(ZIPCODE, '123')]
+
+    @staticmethod
+    def names(providers):
+        return [provider.NAME for provider in providers]
+
+    def test_keeps_configured_order_without_samples(self, providers):
+        scheduler = ProviderScheduler(exploration=0)
+
+        assert self.names(scheduler.order(providers)) == ['viacep', 'postmon', 'cepaberto']
+
+    def test_measured_providers_go_first(self, providers):
+        scheduler = ProviderScheduler(exploration=0)
+        scheduler.record('cepaberto', Outcome.SUCCESS, 0.1)
+
+        assert self.names(scheduler.order(providers)) == ['cepaberto', 'viacep', 'postmon']
+
+    def test_orders_by_latency(self, providers):
+        scheduler = ProviderScheduler(exploration=0)
+        scheduler.record('viacep', Outcome.SUCCESS, 0.9)
+        scheduler.record('postmon', Outcome.SUCCESS, 0.1)
+        scheduler.record('cepaberto', Outcome.NOT_FOUND, 0.5)
+
+        assert self.names(scheduler.order(providers)) == ['postmon', 'cepaberto', 'viacep']
+
+    def test_failures_push_provider_back(self, providers):
+        scheduler = ProviderScheduler(exploration=0, alpha=0.5, penalty=3)
+        scheduler.record('viacep', Outcome.SUCCESS, 0.1)
+        scheduler.record('postmon', Outcome.SUCCESS, 0.2)
+
+        assert self.names(scheduler.order(providers))[0] == 'viacep'
+
+        scheduler.record('viacep', Outcome.TIMEOUT, 0.1)
+
+        assert self.names(scheduler.order(providers))[0] == 'postmon'
+
+    def test_disagreeing_not_found_pushes_provider_back(self, providers):
+        scheduler = ProviderScheduler(exploration=0, alpha=0.5, penalty=3)
+        scheduler.record('viacep', Outcome.NOT_FOUND, 0.1)
+        scheduler.record('postmon', Outcome.SUCCESS, 0.2)
+        scheduler.record_agreement('viacep', False)
+
+        assert self.names(scheduler.order(providers))[0] == 'postmon'
+
+    def test_ewma(self):
+        scheduler = ProviderScheduler(alpha=0.5)
+        scheduler.record('viacep', Outcome.SUCCESS, 1.0)
+        scheduler.record('viacep', Outcome.NETWORK_ERROR, 0.0)
+
+        assert scheduler.snapshot() == {
+            'viacep': {'latency': 0.5, 'availability': 0.5, 'agreement': 1.0, 'samples': 2}
+        }
+
+    def test_exploration_puts_another_provider_first(self, providers):
+        scheduler = ProviderScheduler(exploration=1, rng=random.Random(1))
+        firsts = {scheduler.order(providers)[0].NAME for _ in range(50)}
+
+        assert firsts == {'postmon', 'cepaberto'}
+
+
+class TestZipCodeScheduler:
+
+    def test_search_follows_scheduler_order(self, patch):
+        patch(Viacep, FOUND)
+        patch(Postmon, FOUND)
+        patch(Cepaberto, FOUND)
+
+        scheduler = ProviderScheduler(exploration=0)
+        scheduler.record('postmon', Outcome.SUCCESS, 0.01)
+        scheduler.record('viacep', Outcome.SUCCESS, 0.5)
+
+        status_code, _ = ZipCode(ZIPCODE, scheduler=scheduler).search()
+
+        assert status_code == 200
+        assert patch.names() == ['postmon']
+
+    def test_search_records_attempts_and_agreement(self, patch):
+        patch(Viacep, STRANGE)
+        patch(Postmon, NOT_FOUND)
+        patch(Cepaberto, FOUND)
+
+        scheduler = ProviderScheduler(exploration=0, alpha=0.5)
+        ZipCode(ZIPCODE, scheduler=scheduler).search()
+        stats = scheduler.snapshot()
+
+        assert stats['viacep']['availability'] == 0.0
+        assert stats['postmon']['availability'] == 1.0
+        assert stats['postmon']['agreement'] == 0.5
+        assert stats['cepaberto']['samples'] == 1
+
+    def test_not_found_agreement(self, patch):
+        patch(Viacep, NOT_FOUND)
+        patch(Postmon, NOT_FOUND)
+        patch(Cepaberto, NOT_FOUND)
+
+        scheduler = ProviderScheduler(exploration=0)
+        status_code, _ = ZipCode(ZIPCODE, scheduler=scheduler).search()
+
+        assert status_code == 422
+        assert {stats['agreement'] for stats in scheduler.snapshot().values()} == {1.0}
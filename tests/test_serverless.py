@@ -0,0 +1,70 @@
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.stub_server import StubServer
+from hub_cep import serverless
+from hub_cep.cache import MemoryCache
+from hub_cep.zipcode import ZipCode
+
+from .test_providers import ZIPCODE
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    monkeypatch.setattr(serverless, '_client', None)
+    monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+    return serverless.get_client
+
+
+def event(zipcode):
+    return {'path': {'cep': zipcode}}
+
+
+def test_import_does_not_load_the_http_stack():
+    code = 'import sys, hub_cep.serverless; print("requests" in sys.modules, "asyncio" in sys.modules)'
+    output = subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.PIPE).stdout
+
+    assert output.split() == [b'False', b'False']
+
+
+def test_invalid_zipcode(client):
+    result = serverless.get_address(event('abc'), None)
+
+    assert result == {'statusCode': 422, 'body': {'error': True, 'message': 'Zipcode invalid.'}}
+    assert serverless._client is None
+
+
+def test_client_is_built_once(client):
+    assert client() is client()
+    assert client().cache is not ZipCode.cache
+    assert issubclass(client().zipcode_class, ZipCode)
+
+
+def test_reads_token_once(client, monkeypatch):
+    monkeypatch.setenv('CEPABERTO_TOKEN', '123')
+    zipcode_class = client().zipcode_class
+    monkeypatch.delenv('CEPABERTO_TOKEN')
+
+    assert zipcode_class(ZIPCODE).cepaberto.token == '123'
+    assert ZipCode(ZIPCODE).cepaberto is None
+
+
+def test_warm_cache_between_invocations(client):
+    with StubServer() as server:
+        serverless.init()
+        first = serverless.get_address(event('78048-000'), None)
+        second = serverless.get_address(event(ZIPCODE), None)
+        hits = server.hits
+
+    assert first == second
+    assert first['statusCode'] == 200
+    assert hits == {'viacep': 1, 'postmon': 0, 'cepaberto': 0}
+    assert len(client().cache) == 1
+
+
+def test_warm_opens_provider_connections(client):
+    # Every emulated provider is served by the same host.
+    with StubServer():
+        assert serverless.Client(cache=MemoryCache()).warm() == 1
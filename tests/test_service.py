@@ -0,0 +1,177 @@
+import io
+import json
+from threading import Thread
+
+import pytest
+import requests
+
+from hub_cep.cache import MemoryCache
+from hub_cep.service import AsgiService, Service, serve
+
+from .test_providers import ZIPCODE
+
+
+@pytest.fixture()
+def service():
+    return Service(cache=MemoryCache(), batch_limit=5, concurrency=2)
+
+
+def batch(service, payload):
+    return service.handle('POST', '/cep/batch', json.dumps(payload).encode('utf-8'))
+
+
+class TestService:
+
+    def test_lookup(self, server, service):
+        status_code, body = service.handle('GET', f'/cep/{ZIPCODE}')
+
+        assert status_code == 200
+        assert body['data']['city'] == 'Cuiabá'
+
+    def test_invalid_zipcode(self, service):
+        assert service.handle('GET', '/cep/abc') == (422, {'error': True, 'message': 'Zipcode invalid.'})
+
+    def test_shares_the_cache(self, server, service):
+        service.handle('GET', '/cep/78048-000')
+        service.handle('GET', f'/cep/{ZIPCODE}')
+
+        assert server.hits['viacep'] == 1
+        assert ZIPCODE in service.cache
+
+    @pytest.mark.parametrize('method, path, expected', [
+        ('GET', '/', 404),
+        ('GET', '/cep/', 404),
+        ('GET', '/cep/78048000/extra', 404),
+        ('POST', f'/cep/{ZIPCODE}', 405),
+        ('GET', '/cep/batch', 405),
+    ])
+    def test_routes(self, service, method, path, expected):
+        assert service.handle(method, path)[0] == expected
+
+    def test_batch(self, server, service):
+        status_code, body = batch(service, {'ceps': ['78048-000', 'abc', ZIPCODE, 1001000]})
+        results = body['results']
+
+        assert status_code == 200
+        assert [result['cep'] for result in results] == ['78048-000', 'abc', ZIPCODE, 1001000]
+        assert [result['status'] for result in results] == [200, 422, 200, 200]
+        assert results[0]['body'] == results[2]['body']
+        assert server.hits['viacep'] == 2
+
+    def test_batch_accepts_a_list(self, server, service):
+        assert batch(service, [ZIPCODE])[1]['results'][0]['status'] == 200
+
+    @pytest.mark.parametrize('body', [b'not json', b'{"ceps": "78048000"}', b'[["78048000"]]', b'[true]'])
+    def test_batch_invalid_request(self, service, body):
+        assert service.handle('POST', '/cep/batch', body) == (400, {'error': True, 'message': 'Invalid request.'})
+
+    def test_batch_limit(self, service):
+        assert batch(service, [ZIPCODE] * 6) == (413, {'error': True, 'message': 'Too many zip codes.'})
+        assert service.handle('POST', '/cep/batch', b' ' * (service.max_body + 1))[0] == 413
+
+
+class TestWsgi:
+
+    def call(self, service, method, path, body=b''):
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        }
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        data = b''.join(service(environ, start_response))
+        return response['status'], response['headers'], data
+
+    def test_get(self, server, service):
+        status, headers, data = self.call(service, 'GET', f'/cep/{ZIPCODE}')
+
+        assert status == '200 OK'
+        assert headers['Content-Type'] == 'application/json; charset=utf-8'
+        assert headers['Content-Length'] == str(len(data))
+        assert json.loads(data)['data']['state'] == 'MT'
+
+    def test_unprocessable(self, service):
+        status, _, data = self.call(service, 'GET', '/cep/abc')
+
+        assert status == '422 Unprocessable Entity'
+        assert json.loads(data)['message'] == 'Zipcode invalid.'
+
+    def test_post(self, server, service):
+        status, _, data = self.call(service, 'POST', '/cep/batch', b'{"ceps": ["78048000"]}')
+
+        assert status == '200 OK'
+        assert json.loads(data)['results'][0]['status'] == 200
+
+    def test_http_server(self, server, service):
+        httpd = serve(service, port=0)
+        Thread(target=httpd.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{httpd.server_port}'
+
+        try:
+            response = requests.post(f'{url}/cep/batch', json={'ceps': [ZIPCODE, 'abc']})
+            missing = requests.get(f'{url}/nope')
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+        assert response.status_code == 200
+        assert [result['status'] for result in response.json()['results']] == [200, 422]
+        assert missing.status_code == 404
+
+
+class TestAsgi:
+
+    def call(self, loop, app, scope, chunks=(b'',)):
+        messages = [{'type': 'http.request', 'body': chunk, 'more_body': index < len(chunks) - 1}
+                    for index, chunk in enumerate(chunks)]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        loop.run_until_complete(app(scope, receive, send))
+        return sent
+
+    def test_get(self, loop, server, service):
+        scope = {'type': 'http', 'method': 'GET', 'path': f'/cep/{ZIPCODE}'}
+        start, body = self.call(loop, AsgiService(service), scope)
+
+        assert start['status'] == 200
+        assert (b'content-type', b'application/json; charset=utf-8') in start['headers']
+        assert json.loads(body['body'])['data']['city'] == 'Cuiabá'
+
+    def test_post_in_chunks(self, loop, server, service):
+        scope = {'type': 'http', 'method': 'POST', 'path': '/cep/batch'}
+        start, body = self.call(loop, AsgiService(service), scope, [b'{"ceps": ', b'["abc"]}'])
+
+        assert start['status'] == 200
+        assert json.loads(body['body'])['results'][0]['status'] == 422
+
+    def test_refuses_large_bodies(self, loop, service):
+        scope = {'type': 'http', 'method': 'POST', 'path': '/cep/batch'}
+        start, _ = self.call(loop, AsgiService(service), scope, [b' ' * service.max_body, b' '])
+
+        assert start['status'] == 413
+
+    def test_lifespan(self, loop, service):
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        loop.run_until_complete(AsgiService(service)({'type': 'lifespan'}, receive, send))
+
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from hub_cep.providers import AbstractProvider, Postmon, Viacep
+from hub_cep.sessions import SessionPool, default_pool
+
+from . import test_providers
+from .test_providers import ZIPCODE
+
+
+class TestSessionPool:
+
+    @pytest.fixture()
+    def pool(self):
+        pool = SessionPool(pool_maxsize=4)
+        yield pool
+        pool.close()
+
+    def test_host(self):
+        assert SessionPool.host('http://viacep.com.br/ws/78048000/json/') == 'http://viacep.com.br'
+        assert SessionPool.host('https://www.cepaberto.com/api/v3/cep?cep=1') == 'https://www.cepaberto.com'
+
+    def test_reuses_session_per_host(self, pool):
+        first = pool.get('http://viacep.com.br/ws/1/json/')
+        second = pool.get('http://viacep.com.br/ws/2/json/')
+        other = pool.get('http://api.postmon.com.br/v1/cep/1')
+
+        assert first is second
+        assert first is not other
+        assert isinstance(first, requests.Session)
+        assert len(pool) == 2
+
+    def test_mounts_adapter_with_pool_settings(self, pool):
+        session = pool.get('http://viacep.com.br/')
+        adapter = session.get_adapter('http://viacep.com.br/')
+
+        assert adapter._pool_maxsize == 4
+        assert adapter.max_retries.total == 0
+        assert session.get_adapter('https://viacep.com.br/') is adapter
+
+    def test_shared_between_threads(self, pool):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            sessions = list(executor.map(lambda _: pool.get('http://viacep.com.br/'), range(32)))
+
+        assert len({id(session) for session in sessions}) == 1
+
+    def test_configure_rebuilds_sessions(self, pool):
+        session = pool.get('http://viacep.com.br/')
+        pool.configure(pool_maxsize=20)
+
+        assert len(pool) == 0
+        assert pool.get('http://viacep.com.br/') is not session
+        assert pool.pool_maxsize == 20
+
+    def test_configure_raises_on_unknown_option(self, pool):
+        with pytest.raises(AttributeError):
+            pool.configure(unknown=1)
+
+        with pytest.raises(AttributeError):
+            pool.configure(pool_maxsize=20, get=1)
+
+        assert pool.pool_maxsize == 4
+        assert pool.get('http://viacep.com.br/') is not None
+
+    def test_max_retries(self, pool):
+        pool.configure(max_retries=2)
+        adapter = pool.get('http://viacep.com.br/').get_adapter('http://viacep.com.br/')
+
+        assert adapter.max_retries.total == 2
+
+    def test_does_not_keep_cookies(self, pool, requests_mock):
+        requests_mock.get('http://viacep.com.br/', headers={'Set-Cookie': 'session=1; Path=/'})
+        session = pool.get('http://viacep.com.br/')
+        session.get('http://viacep.com.br/')
+
+        assert len(session.cookies) == 0
+
+    def test_warm_opens_one_connection_per_host(self, pool, requests_mock):
+        requests_mock.head('http://viacep.com.br/')
+        requests_mock.head('http://api.postmon.com.br/', exc=requests.exceptions.ConnectTimeout)
+
+        warmed = pool.warm([
+            'http://viacep.com.br/ws/{}/json/unicode/',
+            'http://viacep.com.br/ws/1/json/',
+            'http://api.postmon.com.br/v1/cep/',
+        ])
+
+        assert warmed == 1
+        assert len(pool) == 2
+        assert [request.url for request in requests_mock.request_history].count('http://viacep.com.br/') == 1
+
+    def test_warm_without_urls(self, pool):
+        assert pool.warm([]) == 0
+
+
+class TestProvidersShareThePool:
+
+    def test_default_pool(self):
+        assert AbstractProvider.pool is default_pool
+        assert Viacep(ZIPCODE).pool is Postmon(ZIPCODE).pool
+
+    def test_call_uses_pooled_session(self, requests_mock):
+        requests_mock.get(test_providers.TestViacep.FAKE_URL, json={'uf': 'MT'})
+        requests_mock.get(test_providers.TestPostmon.FAKE_URL, json={'estado': 'MT'})
+
+        Viacep(ZIPCODE).search()
+        Viacep(ZIPCODE).search()
+        Postmon(ZIPCODE).search()
+
+        assert requests_mock.call_count == 3
+        assert default_pool.get(test_providers.TestViacep.FAKE_URL) is default_pool.get(Viacep.API_URL)
@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hub_cep.providers import Viacep
+from hub_cep.singleflight import AsyncSingleFlight, SingleFlight
+from hub_cep.zipcode import ZipCode
+
+from .test_providers import ZIPCODE
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_share_one_execution(self):
+        flights = SingleFlight()
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'result'
+
+        def call(_):
+            barrier.wait()
+            return flights.do('key', slow)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(call, range(8)))
+
+        assert results == ['result'] * 8
+        assert len(calls) == 1
+        assert flights.stats() == {'in_flight': 0, 'calls': 1, 'shared': 7}
+
+    def test_different_keys_do_not_share(self):
+        flights = SingleFlight()
+
+        assert flights.do('a', lambda: 1) == 1
+        assert flights.do('b', lambda: 2) == 2
+        assert flights.stats()['calls'] == 2
+
+    def test_sequential_calls_run_again(self):
+        flights = SingleFlight()
+        calls = []
+
+        flights.do('key', calls.append, 1)
+        flights.do('key', calls.append, 2)
+
+        assert calls == [1, 2]
+        assert flights.in_flight('key') is False
+
+    def test_errors_are_shared(self):
+        flights = SingleFlight()
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError('boom')
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(flights.do, 'key', failing)
+            started.wait()
+            follower = executor.submit(flights.do, 'key', failing)
+
+            for future in (leader, follower):
+                with pytest.raises(ValueError):
+                    future.result()
+
+    def test_followers_give_up_after_their_timeout(self, loop):
+        flights = SingleFlight()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            time.sleep(0.3)
+            return 'result'
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(flights.do, 'key', slow)
+            started.wait()
+
+            with pytest.raises(TimeoutError):
+                flights.do('key', slow, timeout=0.05)
+
+            assert leader.result() == 'result'
+
+
+class TestAsyncSingleFlight:
+
+    def test_concurrent_tasks_share_one_execution(self, loop):
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'result'
+
+        async def main():
+            return await asyncio.gather(*(flights.do('key', slow) for _ in range(10)))
+
+        assert loop.run_until_complete(main()) == ['result'] * 10
+        assert len(calls) == 1
+        assert flights.stats() == {'in_flight': 0, 'calls': 1, 'shared': 9}
+
+    def test_cancelled_follower_does_not_cancel_the_call(self, loop):
+        flights = AsyncSingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return 'result'
+
+        async def main():
+            leader = asyncio.ensure_future(flights.do('key', slow))
+            follower = asyncio.ensure_future(flights.do('key', slow))
+            await asyncio.sleep(0)
+            follower.cancel()
+            return await leader
+
+        assert loop.run_until_complete(main()) == 'result'
+
+    def test_followers_give_up_after_their_timeout(self, loop):
+        flights = AsyncSingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.1)
+            return 'result'
+
+        async def main():
+            leader = asyncio.ensure_future(flights.do('key', slow))
+            await asyncio.sleep(0)
+
+            with pytest.raises(TimeoutError):
+                await flights.do('key', slow, timeout=0.01)
+
+            return await leader
+
+        assert loop.run_until_complete(main()) == 'result'
+
+
+class TestZipCodeSingleFlight:
+
+    def test_concurrent_searches_issue_one_lookup(self, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        monkeypatch.setattr(ZipCode, 'flights', SingleFlight())
+        calls = []
+        barrier = threading.Barrier(6)
+
+        def search(client, timeout=None):
+            calls.append(client.zipcode)
+            time.sleep(0.1)
+            return False, {'error': False, 'message': 'Success.', 'data': {}}
+
+        monkeypatch.setattr(Viacep, 'search', search)
+
+        def lookup(zipcode):
+            client = ZipCode(zipcode)
+            barrier.wait()
+            return client.search()
+
+        zipcodes = [ZIPCODE, '78048-000', '78.048-000', ZIPCODE, ZIPCODE, '01310100']
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(executor.map(lookup, zipcodes))
+
+        assert {status_code for status_code, _ in results} == {200}
+        assert sorted(calls) == ['01310100', ZIPCODE]
+
+    def test_followers_keep_their_deadline(self, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        monkeypatch.setattr(ZipCode, 'flights', SingleFlight())
+        started = threading.Event()
+
+        def search(client, timeout=None):
+            started.set()
+            time.sleep(0.3)
+            return False, {'error': False, 'message': 'Success.', 'data': {}}
+
+        monkeypatch.setattr(Viacep, 'search', search)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            leader = executor.submit(ZipCode(ZIPCODE).search)
+            started.wait()
+
+            assert ZipCode(ZIPCODE).search(deadline=0.05) == (
+                422, {'error': True, 'timeout': True, 'message': 'Deadline exceeded.'}
+            )
+            assert leader.result()[0] == 200
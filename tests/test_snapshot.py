@@ -0,0 +1,246 @@
+import json
+import os
+import re
+
+import pytest
+
+from hub_cep import cache as cache_module, serverless, snapshot as snapshot_module
+from hub_cep.address import Address
+from hub_cep.cache import MemoryCache, RedisCache, SQLiteCache, TieredCache, from_url
+from hub_cep.snapshot import (
+    HEADER,
+    RECORD,
+    SnapshotCache,
+    export_snapshot,
+    load_snapshot,
+    main,
+    read_snapshot,
+    write_snapshot
+)
+from hub_cep.zipcode import ZipCode
+
+from .test_cache import NOT_FOUND, TIMEOUT
+
+
+PAULISTA = Address('01310-100', 'Avenida Paulista', 'Bela Vista', 'São Paulo', 'SP').to_body()
+SUTIL = Address('78048-000', 'Avenida Miguel Sutil', None, 'Cuiabá', 'MT').to_body()
+
+
+@pytest.fixture()
+def wall_clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, 'time', lambda: now[0])
+    monkeypatch.setattr(snapshot_module, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture()
+def cache(wall_clock):
+    cache = MemoryCache()
+    cache.set('01310100', 200, PAULISTA)
+    cache.set('78048000', 200, SUTIL, stored_at=wall_clock[0] - 10)
+    cache.set('00000000', 422, NOT_FOUND)
+    return cache
+
+
+@pytest.fixture()
+def path(cache, tmpdir):
+    path = str(tmpdir.join('ceps.snap'))
+    export_snapshot(cache, path)
+    return path
+
+
+@pytest.fixture()
+def snapshot(path):
+    snapshot = SnapshotCache(path)
+    yield snapshot
+    snapshot.close()
+
+
+class TestWriteSnapshot:
+
+    def test_sorted_fixed_width_records(self, snapshot):
+        assert len(snapshot) == 3
+        assert snapshot._offsets == HEADER.size + 3 * RECORD.size
+        assert [entry[0] for entry in snapshot.entries()] == ['00000000', '01310100', '78048000']
+
+    def test_deduplicates_strings(self, tmpdir):
+        path = str(tmpdir.join('ceps.snap'))
+        other = Address('01310-200', 'Avenida Paulista', 'Bela Vista', 'São Paulo', 'SP').to_body()
+
+        write_snapshot([('01310100', 1.0, 200, PAULISTA), ('01310200', 1.0, 200, other)], path)
+        snapshot = SnapshotCache(path)
+
+        # Both zip codes, plus one address, district, city and state.
+        assert snapshot.string_count == 2 + 4
+        snapshot.close()
+
+    def test_skips_what_it_cannot_hold(self, tmpdir):
+        path = str(tmpdir.join('ceps.snap'))
+        extra = dict(PAULISTA, cached=True)
+
+        count = write_snapshot([
+            ('01310100', 1.0, 200, extra),
+            ('78048000', 1.0, 422, TIMEOUT),
+            ('not-a-cep', 1.0, 200, PAULISTA),
+            ('00000000', 1.0, 422, NOT_FOUND),
+        ], path)
+
+        assert count == 1
+
+    def test_keeps_the_newest_entry(self, tmpdir):
+        path = str(tmpdir.join('ceps.snap'))
+
+        write_snapshot([('01310100', 2.0, 200, PAULISTA), ('01310100', 1.0, 422, NOT_FOUND)], path)
+
+        assert list(read_snapshot(path)) == [('01310100', 2.0, 200, PAULISTA)]
+
+    def test_compact_entries(self, tmpdir, wall_clock):
+        cache = MemoryCache(compact=True)
+        cache.set('01310100', 200, PAULISTA)
+        path = str(tmpdir.join('ceps.snap'))
+
+        assert export_snapshot(cache, path) == 1
+        assert list(read_snapshot(path)) == [('01310100', wall_clock[0], 200, PAULISTA)]
+
+    def test_rejects_other_files(self, tmpdir):
+        path = tmpdir.join('other.snap')
+        path.write_binary(b'not a snapshot at all, just some bytes')
+
+        with pytest.raises(ValueError):
+            SnapshotCache(str(path))
+
+    @pytest.mark.parametrize('keep', [0.5, -1])
+    def test_rejects_truncated_files(self, path, tmpdir, keep):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        truncated = tmpdir.join('truncated.snap')
+        truncated.write_binary(data[:len(data) // 2] if keep > 0 else data[:keep])
+
+        with pytest.raises(ValueError, match='truncated'):
+            SnapshotCache(str(truncated))
+
+        with pytest.raises(ValueError):
+            from_url(f'?snapshot={truncated}')
+
+
+class TestSnapshotCache:
+
+    def test_get_entry(self, snapshot, wall_clock):
+        assert snapshot.get('01310100') == (200, PAULISTA)
+        assert snapshot.get_entry('78048000') == (wall_clock[0] - 10, 200, SUTIL)
+        assert snapshot.get('00000000') == (422, NOT_FOUND)
+        assert snapshot.get('20040002') is None
+        assert snapshot.get('bogus') is None
+        assert snapshot.stats() == {'size': 3, 'hits': 3, 'misses': 2}
+
+    def test_entries_expire(self, path, wall_clock):
+        snapshot = SnapshotCache(path, ttl=100, negative_ttl=10)
+        wall_clock[0] += 50
+
+        assert snapshot.get('01310100') == (200, PAULISTA)
+        assert snapshot.get('00000000') is None
+        assert [entry[0] for entry in snapshot.items()] == ['01310100', '78048000']
+
+        snapshot.close()
+
+    def test_is_read_only(self, snapshot):
+        snapshot.set('20040002', 200, PAULISTA)
+
+        assert snapshot.get('20040002') is None
+
+    def test_behind_a_writable_cache(self, path, wall_clock):
+        cache = from_url(f'?snapshot={path}')
+
+        assert isinstance(cache, TieredCache)
+        assert cache.get_entry('78048000') == (wall_clock[0] - 10, 200, SUTIL)
+        # Copied to the memory cache with its age.
+        assert cache.local.get_entry('78048000') == (wall_clock[0] - 10, 200, SUTIL)
+
+        cache.set('20040002', 422, NOT_FOUND)
+
+        assert cache.get('20040002') == (422, NOT_FOUND)
+        assert len(list(cache.items())) == 4
+
+    def test_zipcode_is_answered_from_the_snapshot(self, path, requests_mock):
+        provider = requests_mock.get(re.compile('.*'), status_code=500)
+        client = ZipCode('01310100', cache=from_url(f'?snapshot={path}'))
+
+        assert client.search() == (200, PAULISTA)
+        assert client.source == 'cache'
+        assert provider.call_count == 0
+
+    def test_serverless_client(self, path, monkeypatch):
+        monkeypatch.setattr(serverless, 'CACHE_SNAPSHOT', path)
+
+        cache = serverless.Client(token='').cache
+
+        assert isinstance(cache.shared, SnapshotCache)
+        assert cache.get('01310100') == (200, PAULISTA)
+
+
+class TestExportAndLoad:
+
+    def test_jsonl(self, cache, tmpdir, wall_clock):
+        path = str(tmpdir.join('ceps.jsonl'))
+
+        assert export_snapshot(cache, path, format='jsonl') == 3
+
+        with open(path, encoding='utf-8') as f:
+            first = json.loads(f.readline())
+
+        assert first == {'key': '01310100', 'stored_at': wall_clock[0], 'status_code': 200, 'body': PAULISTA}
+
+        target = MemoryCache()
+
+        assert load_snapshot(target, path) == 3
+        assert target.get_entry('78048000') == (wall_clock[0] - 10, 200, SUTIL)
+
+    def test_load_skips_expired_entries(self, path, wall_clock):
+        target = MemoryCache(ttl=100, negative_ttl=5)
+        wall_clock[0] += 50
+
+        assert load_snapshot(target, path) == 2
+        assert target.get('00000000') is None
+
+    def test_sqlite_round_trip(self, path, tmpdir, wall_clock):
+        target = SQLiteCache(str(tmpdir.join('cache.sqlite')))
+
+        assert load_snapshot(target, path) == 3
+        assert sorted(target.items()) == sorted(read_snapshot(path))
+
+        target.close()
+
+    def test_redis_round_trip(self, path, resp_server, tmpdir):
+        target = RedisCache(resp_server.url)
+        load_snapshot(target, path)
+        copy = str(tmpdir.join('copy.snap'))
+
+        assert export_snapshot(target, copy) == 3
+        assert list(read_snapshot(copy)) == list(read_snapshot(path))
+
+    def test_redis_export_does_not_fail_open(self, tmpdir):
+        cache = RedisCache('redis://127.0.0.1:1/0', timeout=0.1)
+
+        with pytest.raises(OSError):
+            export_snapshot(cache, str(tmpdir.join('ceps.snap')))
+
+    def test_commands(self, cache, tmpdir, capsys):
+        source = str(tmpdir.join('cache.sqlite'))
+        target = str(tmpdir.join('target.sqlite'))
+        path = str(tmpdir.join('ceps.snap'))
+        sqlite = SQLiteCache(source)
+        sqlite.set_many({key: (status_code, body) for key, _, status_code, body in cache.items()})
+        sqlite.close()
+
+        assert main(['export', source, path]) == 0
+        assert main(['info', path]) == 0
+        assert main(['load', path, target]) == 0
+
+        lines = capsys.readouterr().out.splitlines()
+
+        assert lines[0] == f'3 entries written to {path}.'
+        assert json.loads(lines[1])['size'] == 3
+        assert lines[2] == f'3 entries loaded from {path}.'
+        assert not os.path.exists(path + '.tmp')
@@ -0,0 +1,53 @@
+import struct
+
+import pytest
+
+from hub_cep.table import NULL, SortedTable, write_table
+
+
+class Table(SortedTable):
+
+    MAGIC = b'TEST'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHII')
+    RECORD = struct.Struct('<II')
+    KIND = 'test table'
+
+    def __init__(self, path: str):
+        self.open(path)
+
+
+@pytest.fixture()
+def path(tmpdir):
+    path = str(tmpdir.join('table.bin'))
+    strings = ['Cuiabá', 'São Paulo']
+    rows = [Table.RECORD.pack(key, index) for key, index in ((1310100, 1), (78048000, 0), (99999999, NULL))]
+    write_table(path, Table.HEADER.pack(Table.MAGIC, Table.VERSION, 0, len(rows), len(strings)), rows, strings)
+    return path
+
+
+class TestSortedTable:
+
+    def test_find(self, path):
+        table = Table(path)
+
+        assert len(table) == 3
+        assert table.find(78048000) == 1
+        assert table.find(20040002) == -1
+        assert table.find(0) == -1
+
+        table.close()
+
+    def test_strings(self, path):
+        table = Table(path)
+
+        assert [table.string(table.row(position)[1]) for position in range(3)] == ['São Paulo', 'Cuiabá', None]
+
+        table.close()
+
+    def test_rejects_other_files(self, tmpdir):
+        path = tmpdir.join('other.bin')
+        path.write_binary(b'TEST')
+
+        with pytest.raises(ValueError, match='not a hub-cep test table'):
+            Table(str(path))
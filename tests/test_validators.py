@@ -0,0 +1,83 @@
+import pytest
+
+from hub_cep.exceptions import ZipcodeError
+from hub_cep.providers import Viacep
+from hub_cep.validators import RANGES, is_valid, normalize, state, validate
+from hub_cep.zipcode import ZipCode
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('78048000', '78048000'),
+    ('78048-000', '78048000'),
+    ('78.048-000', '78048000'),
+    (' 1310100', '01310100'),
+    ('01310-100 ', '01310100'),
+    (1310100, '01310100'),
+    ('12345', '00012345'),
+    ('abc', ''),
+    ('7804800a', ''),
+    ('780480000', ''),
+    ('７８０４８０００', ''),
+    ('', ''),
+    (None, ''),
+])
+def test_normalize(value, expected):
+    assert normalize(value) == expected
+
+
+@pytest.mark.parametrize('zipcode, expected', [
+    ('01000000', 'SP'),
+    ('19999999', 'SP'),
+    ('20040002', 'RJ'),
+    ('68900000', 'AP'),
+    ('69400000', 'AM'),
+    ('73000000', 'DF'),
+    ('78048000', 'MT'),
+    ('99999999', 'RS'),
+    ('00999999', ''),
+    ('00000000', ''),
+    ('', ''),
+])
+def test_state(zipcode, expected):
+    assert state(zipcode) == expected
+
+
+def test_ranges_are_sorted_and_do_not_overlap():
+    for (_, end, _), (start, _, _) in zip(RANGES, RANGES[1:]):
+        assert end < start
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('78048-000', True),
+    (' 1310100', True),
+    ('12345', False),
+    ('abc', False),
+    (None, False),
+])
+def test_is_valid(value, expected):
+    assert is_valid(value) is expected
+
+
+def test_validate_returns_normalized_zipcode():
+    assert validate('01310-100') == '01310100'
+
+
+@pytest.mark.parametrize('value', ['', None, 'abc', '12345', '00000000', '123456789'])
+def test_validate_raises_zipcode_error(value):
+    with pytest.raises(ZipcodeError) as e:
+        validate(value)
+
+    assert e.value.args[0] == 'Zipcode invalid.'
+
+
+@pytest.mark.parametrize('klass', [Viacep, ZipCode])
+def test_clients_normalize_zipcode(klass):
+    assert klass('01310-100').zipcode == '01310100'
+
+
+@pytest.mark.parametrize('klass', [Viacep, ZipCode])
+def test_clients_reject_impossible_zipcode_without_network(klass, requests_mock):
+    with pytest.raises(ZipcodeError):
+        klass('00012-345')
+
+    assert requests_mock.call_count == 0
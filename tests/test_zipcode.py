@@ -1,6 +1,10 @@
+import threading
+import time
+
 import pytest
 
 
+from hub_cep.providers import Viacep, Postmon, Cepaberto
 from hub_cep.zipcode import ZipCode, AbstractZipCode
 from hub_cep.exceptions import ZipcodeError
 
@@ -103,3 +107,166 @@ class TestZipcode:
 
         assert status_code == 200
         assert result == TestZipcode.FAKE_SUCCESS_RESPONSE
+
+
+class TestZipcodeConcurrentSearch:
+    # requests-mock serializes requests, so providers are patched directly here.
+
+    VIACEP_RESULT = (False, {'error': False, 'message': 'Success.', 'data': {'district': 'Viacep'}})
+    POSTMON_RESULT = (False, {'error': False, 'message': 'Success.', 'data': {'district': 'Postmon'}})
+    NOT_FOUND_RESULT = (True, {'error': True, 'message': 'Zip code not found.'})
+    STRANGE_RESULT = (True, {'error': True, 'message': 'An error ocurred.'})
+
+    def test_raises_value_error_when_strategy_is_unknown(self):
+        with pytest.raises(ValueError):
+            ZipCode(ZIPCODE, strategy='unknown')
+
+    def test_sequential_is_the_default_strategy(self):
+        assert ZipCode(ZIPCODE).strategy == 'sequential'
+
+    def test_race_returns_fastest_provider(self, patch):
+        patch(Viacep, self.VIACEP_RESULT, 0.3)
+        patch(Postmon, self.POSTMON_RESULT)
+        patch(Cepaberto, self.STRANGE_RESULT)
+
+        client = ZipCode(ZIPCODE, strategy='race')
+        started = time.monotonic()
+        status_code, result = client.search()
+
+        assert status_code == 200
+        assert result['data']['district'] == 'Postmon'
+        assert time.monotonic() - started < 0.3
+
+    def test_hedge_starts_next_provider_after_delay(self, patch):
+        patch(Viacep, self.VIACEP_RESULT, 0.3)
+        patch(Postmon, self.POSTMON_RESULT)
+
+        client = ZipCode(ZIPCODE, strategy='hedge', hedge_delay=0.05)
+        started = time.monotonic()
+        status_code, result = client.search()
+
+        assert status_code == 200
+        assert result['data']['district'] == 'Postmon'
+        assert time.monotonic() - started < 0.3
+
+    def test_hedge_does_not_call_fallback_when_first_provider_answers(self, patch):
+        patch(Viacep, self.VIACEP_RESULT)
+        patch(Postmon, self.POSTMON_RESULT)
+
+        client = ZipCode(ZIPCODE, strategy='hedge', hedge_delay=1)
+        status_code, result = client.search()
+
+        assert status_code == 200
+        assert result['data']['district'] == 'Viacep'
+        assert patch.names() == ['viacep']
+
+    def test_hedge_starts_next_provider_as_soon_as_one_fails(self, patch):
+        patch(Viacep, self.STRANGE_RESULT)
+        patch(Postmon, self.POSTMON_RESULT)
+
+        client = ZipCode(ZIPCODE, strategy='hedge', hedge_delay=5)
+        started = time.monotonic()
+        status_code, result = client.search()
+
+        assert status_code == 200
+        assert time.monotonic() - started < 1
+
+    @pytest.mark.parametrize('strategy', ['race', 'hedge'])
+    def test_returns_last_provider_error_when_all_fail(self, strategy, patch):
+        patch(Viacep, self.STRANGE_RESULT)
+        patch(Postmon, self.STRANGE_RESULT, 0.05)
+        patch(Cepaberto, self.NOT_FOUND_RESULT)
+
+        client = ZipCode(ZIPCODE, strategy=strategy, hedge_delay=0.01)
+        status_code, result = client.search()
+
+        assert status_code == 422
+        assert result == {'error': True, 'message': 'Zip code not found.'}
+        assert sorted(patch.names()) == ['cepaberto', 'postmon', 'viacep']
+
+
+class TestZipcodeSearchMany:
+
+    @pytest.fixture()
+    def viacep(self, monkeypatch):
+        monkeypatch.delenv('CEPABERTO_TOKEN', raising=False)
+        lock = threading.Lock()
+        state = {'calls': [], 'running': 0, 'peak': 0}
+        not_found = (True, {'error': True, 'message': 'Zip code not found.'})
+
+        def search(client, timeout=None):
+            with lock:
+                state['calls'].append(client.zipcode)
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+
+            time.sleep(0.01)
+
+            with lock:
+                state['running'] -= 1
+
+            if client.zipcode.startswith('0'):
+                return not_found
+
+            return False, {'error': False, 'message': 'Success.', 'data': {'zip_code': client.zipcode}}
+
+        monkeypatch.setattr(Viacep, 'search', search)
+        monkeypatch.setattr(Postmon, 'search', lambda client, timeout=None: not_found)
+        return state
+
+    def test_yields_every_zipcode(self, viacep):
+        results = list(ZipCode.search_many(['78048000', '01310100', '20040002']))
+
+        assert sorted(results) == sorted([
+            ('78048000', 200, {'error': False, 'message': 'Success.', 'data': {'zip_code': '78048000'}}),
+            ('01310100', 422, {'error': True, 'message': 'Zip code not found.'}),
+            ('20040002', 200, {'error': False, 'message': 'Success.', 'data': {'zip_code': '20040002'}}),
+        ])
+
+    def test_normalizes_and_deduplicates(self, viacep):
+        results = list(ZipCode.search_many(['78048-000', ' 78048000 ', '78.048-000', '20040002']))
+
+        assert sorted(zipcode for zipcode, _, _ in results) == ['20040002', '78048000']
+        assert sorted(viacep['calls']) == ['20040002', '78048000']
+
+    def test_invalid_zipcodes(self, viacep):
+        zipcodes = ['', None, '  ', 'abc', '00012345', '123456789']
+        results = list(ZipCode.search_many(zipcodes))
+
+        assert results == [(zipcode, 422, {'error': True, 'message': 'Zipcode invalid.'}) for zipcode in zipcodes]
+        assert viacep['calls'] == []
+
+    def test_bounded_concurrency(self, viacep):
+        zipcodes = (str(10000000 + index) for index in range(40))
+        results = list(ZipCode.search_many(zipcodes, concurrency=4))
+
+        assert len(results) == 40
+        assert 1 < viacep['peak'] <= 4
+
+    def test_calls_share_the_bulk_threads(self, viacep):
+        list(ZipCode.search_many(['78048000', '20040002'], concurrency=2))
+        threads = threading.active_count()
+
+        for index in range(5):
+            list(ZipCode.search_many([str(10000000 + index)], concurrency=2))
+
+        assert threading.active_count() == threads
+
+    def test_consumes_input_lazily(self, viacep):
+        consumed = []
+
+        def zipcodes():
+            for index in range(1000):
+                consumed.append(index)
+                yield str(10000000 + index)
+
+        results = ZipCode.search_many(zipcodes(), concurrency=2)
+        next(results)
+        results.close()
+
+        assert len(consumed) < 10
+
+    def test_bounded_deduplication_window(self, viacep):
+        list(ZipCode.search_many(['11111111', '22222222', '33333333', '11111111'], concurrency=1, dedup_size=2))
+
+        assert viacep['calls'].count('11111111') == 2